@@ -0,0 +1 @@
+# 推送agent模块
\ No newline at end of file
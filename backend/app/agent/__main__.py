@@ -0,0 +1,3 @@
+from app.agent.push_agent import main
+
+main()
@@ -0,0 +1,290 @@
+"""
+推送agent的本机采集
+只依赖psutil与标准库（不加载后端配置、NumPy、prometheus_client），保持agent常驻内存小；
+快照结构与SystemCollector一致，后端的 /api/v1/monitoring/system/*?host= 接口可直接使用。
+与后端收集器相比省略了cgroup统计，套接字只统计sockstat汇总，磁盘只采集本地文件系统。
+"""
+
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from app.monitoring.collectors.rates import CounterRateTracker
+
+logger = logging.getLogger("agent")
+
+PROC_STAT_PATH = "/proc/stat"
+SOCKSTAT_PATHS = ("/proc/net/sockstat", "/proc/net/sockstat6")
+# 与socket_collector相同的字段改名（其余字段保持原名）
+_SOCKSTAT_FIELDS = {'tw': 'time_wait', 'mem': 'mem_pages'}
+
+# 与cpu_collector相同的/proc/stat列
+CPU_MODES = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+
+# 快照中的子系统：(快照字段, 日志中的名称, 采集方法)
+SUBSYSTEMS = (
+    ('cpu', 'CPU', '_collect_cpu'),
+    ('memory', '内存', '_collect_memory'),
+    ('disk', '磁盘', '_collect_disk'),
+    ('network', '网络', '_collect_network'),
+    ('processes', '进程', '_collect_processes'),
+    ('system_info', '系统信息', '_collect_system_info'),
+)
+
+
+def read_cpu_times(path: str = PROC_STAT_PATH) -> Tuple[List[str], List[List[float]]]:
+    """各核CPU时间：(核名称列表, 每核按CPU_MODES排列的时间)；非Linux平台使用psutil"""
+    if os.path.exists(path):
+        with open(path) as f:
+            rows = [line.split() for line in f if line.startswith('cpu') and line[3:4].isdigit()]
+        if rows:
+            width = len(CPU_MODES)
+            return [row[0] for row in rows], [
+                [float(value) for value in row[1:width + 1]] + [0.0] * (width + 1 - len(row)) for row in rows
+            ]
+    times = psutil.cpu_times(percpu=True)
+    return [f'cpu{i}' for i in range(len(times))], [[getattr(t, mode, 0.0) for mode in CPU_MODES] for t in times]
+
+
+class ProcStatCpu:
+    """基于相邻两次CPU时间差的各核使用率（与CpuTimesCollector结果相同，逐核循环计算）"""
+
+    def __init__(self, path: str = PROC_STAT_PATH):
+        self.path = path
+        self._cpus: Optional[List[str]] = None
+        self._previous: Optional[List[List[float]]] = None
+
+    def collect(self) -> Dict[str, Any]:
+        cpus, times = read_cpu_times(self.path)
+        previous = self._previous if cpus == self._cpus else [[0.0] * len(CPU_MODES) for _ in cpus]
+        self._cpus, self._previous = cpus, times
+
+        idle, iowait = CPU_MODES.index('idle'), CPU_MODES.index('iowait')
+        per_cpu: List[float] = []
+        per_cpu_modes: Dict[str, List[float]] = {mode: [] for mode in CPU_MODES}
+        mode_totals = [0.0] * len(CPU_MODES)
+        for current, last in zip(times, previous):
+            # iowait等计数器可能回退，负增量按0处理
+            deltas = [max(0.0, now - before) for now, before in zip(current, last)]
+            total = sum(deltas)
+            for i, mode in enumerate(CPU_MODES):
+                per_cpu_modes[mode].append(round(deltas[i] / total * 100.0, 1) if total else 0.0)
+                mode_totals[i] += deltas[i]
+            per_cpu.append(round(100.0 - (deltas[idle] + deltas[iowait]) / total * 100.0, 1) if total else 0.0)
+
+        overall = sum(mode_totals) or 1.0
+        return {
+            'cpus': cpus,
+            'per_cpu': per_cpu,
+            'per_cpu_modes': per_cpu_modes,
+            'modes': {mode: round(mode_totals[i] / overall * 100.0, 1) for i, mode in enumerate(CPU_MODES)},
+            'usage_percent': round(sum(per_cpu) / len(per_cpu), 1) if per_cpu else 0
+        }
+
+
+def read_sockstat() -> Dict[str, Any]:
+    """sockstat汇总（字段与SocketStatsCollector未启用netlink时相同）"""
+    sockstat: Dict[str, Dict[str, int]] = {}
+    for path in SOCKSTAT_PATHS:
+        try:
+            with open(path) as f:
+                for line in f:
+                    protocol, _, rest = line.partition(':')
+                    values = rest.split()
+                    if protocol and not len(values) % 2:
+                        sockstat[protocol.strip().lower()] = {
+                            _SOCKSTAT_FIELDS.get(values[i], values[i]): int(values[i + 1])
+                            for i in range(0, len(values), 2)
+                        }
+        except OSError:
+            continue
+    # sockstat中tw为IPv4/IPv6共用的TIME_WAIT计数
+    tcp = sum(sockstat.get(p, {}).get('inuse', 0) for p in ('tcp', 'tcp6')) \
+        + sockstat.get('tcp', {}).get('time_wait', 0)
+    udp = sum(sockstat.get(p, {}).get('inuse', 0) for p in ('udp', 'udp6', 'udplite', 'udplite6'))
+    return {'sockstat': sockstat, 'tcp_states': {}, 'total': tcp + udp}
+
+
+class AgentCollector:
+    """agent本机快照采集"""
+
+    def __init__(self, interval: float, disk_io_exclude: str = ""):
+        self.interval = interval
+        self.cpu = ProcStatCpu()
+        self._disk_io_exclude = re.compile(disk_io_exclude) if disk_io_exclude else None
+        self._disk_io_tracker = CounterRateTracker()
+        self._network_tracker = CounterRateTracker()
+        self._stats: Dict[str, Any] = {'cycles': 0, 'overruns': 0, 'skipped_cycles': 0, 'errors': {}}
+        self._last_success_at: Optional[float] = None
+        self._pending_skipped = 0
+
+    def record_cycle(self, cycle_seconds: float):
+        """按整个周期（采集与推送）的耗时统计跳过的周期，随下一份快照上报"""
+        skipped = int(cycle_seconds // self.interval)
+        if skipped:
+            self._stats['overruns'] += 1
+            self._stats['skipped_cycles'] += skipped
+            self._pending_skipped += skipped
+            logger.warning(f"⚠️ 采集周期耗时 {cycle_seconds:.2f}s 超过采集间隔 {self.interval}s，跳过 {skipped} 个周期")
+
+    def collect_snapshot(self) -> Dict[str, Any]:
+        """执行一次完整采集；单个子系统失败时记录错误并以空字典代替"""
+        timestamp = time.time()
+        started = time.perf_counter()
+        snapshot: Dict[str, Any] = {'generation': int(timestamp * 1000), 'timestamp': timestamp}
+        durations: Dict[str, float] = {}
+        errors = []
+        for subsystem, name, method in SUBSYSTEMS:
+            subsystem_started = time.perf_counter()
+            try:
+                snapshot[subsystem] = getattr(self, method)()
+            except Exception as e:
+                logger.error(f"❌ 收集{name}指标失败: {e}")
+                snapshot[subsystem] = {}
+                errors.append(subsystem)
+            durations[subsystem] = time.perf_counter() - subsystem_started
+
+        cycle_seconds = time.perf_counter() - started
+        stats = self._stats
+        stats['cycles'] += 1
+        for subsystem in errors:
+            stats['errors'][subsystem] = stats['errors'].get(subsystem, 0) + 1
+        if not errors:
+            self._last_success_at = timestamp + cycle_seconds
+        skipped, self._pending_skipped = self._pending_skipped, 0
+        snapshot['collector'] = {
+            'completed_at': timestamp + cycle_seconds,
+            'last_success_at': self._last_success_at,
+            'cycle_seconds': cycle_seconds,
+            'durations': durations,
+            'errors': errors,
+            'skipped_cycles': skipped,
+            'totals': {**stats, 'errors': dict(stats['errors'])}
+        }
+        return snapshot
+
+    def _collect_cpu(self) -> Dict[str, Any]:
+        cpu = self.cpu.collect()
+        cpu['load_avg'] = psutil.getloadavg()
+        cpu['count'] = psutil.cpu_count()
+        return cpu
+
+    def _collect_memory(self) -> Dict[str, Any]:
+        return {
+            'virtual': psutil.virtual_memory()._asdict(),
+            'swap': psutil.swap_memory()._asdict()
+        }
+
+    def _collect_disk(self) -> Dict[str, Any]:
+        # all=False只返回本地块设备上的文件系统，不会对网络挂载执行可能卡住的statfs
+        partitions = []
+        for partition in psutil.disk_partitions(all=False):
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)._asdict()
+            except OSError:
+                continue
+            partitions.append({
+                'device': partition.device,
+                'mountpoint': partition.mountpoint,
+                'fstype': partition.fstype,
+                'usage': usage,
+                'stale': False
+            })
+        root = next((p['usage'] for p in partitions if p['mountpoint'] == '/'), {})
+
+        io_counters = {
+            device: {
+                'read_count': io.read_count,
+                'write_count': io.write_count,
+                'read_bytes': io.read_bytes,
+                'write_bytes': io.write_bytes,
+                'read_time': io.read_time,
+                'write_time': io.write_time,
+                'busy_time': getattr(io, 'busy_time', 0)
+            }
+            for device, io in (psutil.disk_io_counters(perdisk=True) or {}).items()
+            if not (self._disk_io_exclude and self._disk_io_exclude.match(device))
+        }
+        deltas, elapsed = self._disk_io_tracker.update(io_counters)
+        io_rates = {
+            device: {
+                'read_bytes_per_sec': delta['read_bytes'] / elapsed,
+                'write_bytes_per_sec': delta['write_bytes'] / elapsed,
+                'read_ops_per_sec': delta['read_count'] / elapsed,
+                'write_ops_per_sec': delta['write_count'] / elapsed,
+                'utilization_percent': min(100.0, delta['busy_time'] / (elapsed * 1000) * 100),
+                'read_latency_ms': delta['read_time'] / delta['read_count'] if delta['read_count'] else 0.0,
+                'write_latency_ms': delta['write_time'] / delta['write_count'] if delta['write_count'] else 0.0
+            }
+            for device, delta in deltas.items()
+        }
+        return {'root': root, 'partitions': partitions, 'io_counters': io_counters, 'io_rates': io_rates}
+
+    def _collect_network(self) -> Dict[str, Any]:
+        interfaces = {
+            interface: {
+                'bytes_sent': io.bytes_sent,
+                'bytes_recv': io.bytes_recv,
+                'packets_sent': io.packets_sent,
+                'packets_recv': io.packets_recv
+            }
+            for interface, io in psutil.net_io_counters(pernic=True).items()
+        }
+        deltas, elapsed = self._network_tracker.update(interfaces)
+        rates = {
+            interface: {f'{key}_per_sec': value / elapsed for key, value in delta.items()}
+            for interface, delta in deltas.items()
+        }
+        rates_total: Dict[str, float] = {}
+        for rate in rates.values():
+            for key, value in rate.items():
+                rates_total[key] = rates_total.get(key, 0.0) + value
+
+        sockets = read_sockstat()
+        return {
+            'io_counters': psutil.net_io_counters()._asdict(),
+            'interfaces': interfaces,
+            'rates': rates,
+            'rates_total': rates_total,
+            'connections': sockets['total'],
+            'sockets': sockets
+        }
+
+    def _collect_processes(self) -> Dict[str, Any]:
+        states = {'running': 0, 'sleeping': 0, 'zombie': 0}
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent']):
+            info = proc.info
+            status = info['status']
+            if status == psutil.STATUS_RUNNING:
+                states['running'] += 1
+            elif status == psutil.STATUS_SLEEPING:
+                states['sleeping'] += 1
+            elif status == psutil.STATUS_ZOMBIE:
+                states['zombie'] += 1
+            processes.append(info)
+
+        top_cpu = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:10]
+        return {
+            'count': len(processes),
+            'states': states,
+            'top_cpu': [{'pid': p['pid'], 'name': p['name'], 'cpu_percent': p['cpu_percent']} for p in top_cpu]
+        }
+
+    def _collect_system_info(self) -> Dict[str, Any]:
+        uname = os.uname()
+        return {
+            'system': uname.sysname,
+            'node': uname.nodename,
+            'release': uname.release,
+            'version': uname.version,
+            'machine': uname.machine,
+            'processor': uname.machine,
+            'boot_time': str(psutil.boot_time()),
+            'cpu_count': str(psutil.cpu_count()),
+            'cpu_count_logical': str(psutil.cpu_count(logical=True))
+        }
@@ -0,0 +1,49 @@
+"""
+推送agent配置
+只读取agent用到的几项配置（环境变量优先，其次为当前目录的.env文件），不加载后端的pydantic配置，
+名称与默认值与 app.core.config.Settings 中的同名配置保持一致
+"""
+
+import os
+from typing import Any, Dict
+
+DEFAULTS: Dict[str, Any] = {
+    "AGENT_SERVER_URL": "http://localhost:8000",
+    "AGENT_INGEST_TOKEN": "",
+    "AGENT_HOST_NAME": "",
+    "AGENT_KEYFRAME_INTERVAL": 30,
+    "AGENT_BUFFER_MAX_BYTES": 2 * 1024 * 1024,
+    "AGENT_MAX_BATCH_BYTES": 256 * 1024,
+    "AGENT_TIMEOUT": 10.0,
+    "COLLECTION_INTERVAL": 10,
+    "DISK_IO_DEVICE_EXCLUDE": r"^(loop|ram|zram|fd|sr)\d+$",
+    "LOG_LEVEL": "INFO",
+}
+
+
+def read_env_file(path: str) -> Dict[str, str]:
+    """解析.env文件中的 KEY=VALUE 行（忽略注释与空行，去掉值两侧的引号）"""
+    values: Dict[str, str] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep and key and not key.startswith("#"):
+                    values[key.strip()] = value.strip().strip("'\"")
+    except OSError:
+        pass
+    return values
+
+
+class AgentSettings:
+    """agent配置，属性名与DEFAULTS中的键相同，取值按默认值的类型转换"""
+
+    def __init__(self, env_file: str = ".env"):
+        values = {**read_env_file(env_file), **os.environ}
+        for name, default in DEFAULTS.items():
+            value = values.get(name)
+            setattr(self, name, default if value is None else type(default)(value))
+
+
+# 全局agent配置实例
+settings = AgentSettings()
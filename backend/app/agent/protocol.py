@@ -0,0 +1,127 @@
+"""
+推送agent与后端之间的上报协议
+一次上报（HTTP POST请求体）是连续的msgpack对象流：第一个对象为批次头部，其后每个对象为一帧
+
+    头部: {"v": 版本, "host": 主机名, "session": agent启动时生成的会话ID, "interval": 采集间隔, ...}
+    帧:   [seq, kind, timestamp, payload]
+
+seq在同一会话内从1开始连续递增；kind为KEYFRAME时payload是完整快照，
+为DELTA时payload是相对上一帧快照的增量（见diff）。后端按seq顺序应用，重复的帧直接忽略，
+出现缺口（丢帧、后端重启、换到另一个worker）时丢弃后续增量帧，直到收到下一个完整帧。
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+import msgpack
+
+PROTOCOL_VERSION = 1
+CONTENT_TYPE = "application/x-msgpack"
+TOKEN_HEADER = "X-Agent-Token"
+
+KEYFRAME = 0
+DELTA = 1
+
+# 帧: (seq, kind, timestamp, payload)
+Frame = Tuple[int, int, float, Dict[str, Any]]
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """计算两个快照之间的增量
+
+    只包含发生变化的部分：s为整体替换的键，d为递归增量的子字典，r为被删除的键。
+    """
+    sets: Dict[str, Any] = {}
+    nested: Dict[str, Any] = {}
+    for key, value in new.items():
+        if key in old:
+            previous = old[key]
+            if previous == value:
+                continue
+            if isinstance(previous, dict) and isinstance(value, dict):
+                nested[key] = diff(previous, value)
+                continue
+        sets[key] = value
+
+    delta: Dict[str, Any] = {}
+    if sets:
+        delta['s'] = sets
+    if nested:
+        delta['d'] = nested
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta['r'] = removed
+    return delta
+
+
+def apply(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """将增量应用到快照上，返回新快照（不修改base）；增量结构不合法时抛出ValueError"""
+    removed, sets, nested_deltas = delta.get('r', []), delta.get('s', {}), delta.get('d', {})
+    if not isinstance(removed, list) or not isinstance(sets, dict) or not isinstance(nested_deltas, dict):
+        raise ValueError("增量格式错误")
+    if not all(isinstance(nested, dict) for nested in nested_deltas.values()):
+        raise ValueError("增量格式错误")
+    result = dict(base)
+    for key in removed:
+        if isinstance(key, (list, dict)):
+            raise ValueError("增量格式错误")
+        result.pop(key, None)
+    result.update(sets)
+    for key, nested in nested_deltas.items():
+        previous = result.get(key)
+        result[key] = apply(previous if isinstance(previous, dict) else {}, nested)
+    return result
+
+
+def encode_header(host: str, session: str, interval: float, **extra: Any) -> bytes:
+    return msgpack.packb({"v": PROTOCOL_VERSION, "host": host, "session": session, "interval": interval, **extra})
+
+
+def encode_frame(seq: int, kind: int, timestamp: float, payload: Dict[str, Any]) -> bytes:
+    # 快照中的元组（如load_avg）编码为数组，未知类型按str()输出
+    return msgpack.packb([seq, kind, timestamp, payload], default=str)
+
+
+def decode_batch(body: bytes) -> Tuple[Dict[str, Any], Iterator[Frame]]:
+    """解析上报请求体，返回头部与帧迭代器；格式错误时抛出ValueError"""
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False, max_buffer_size=max(len(body), 1))
+    unpacker.feed(body)
+    try:
+        header = next(unpacker)
+    except (StopIteration, msgpack.UnpackException, ValueError) as e:
+        raise ValueError(f"无法解析批次头部: {e}")
+    if not isinstance(header, dict) or header.get("v") != PROTOCOL_VERSION:
+        raise ValueError("不支持的协议版本")
+    if not isinstance(header.get("host"), str) or not isinstance(header.get("session"), str):
+        raise ValueError("批次头部缺少host或session")
+    if "interval" in header and not _is_number(header["interval"]):
+        raise ValueError("批次头部的interval不是数值")
+
+    def frames() -> Iterator[Frame]:
+        try:
+            for frame in unpacker:
+                if not isinstance(frame, list) or len(frame) != 4 or not isinstance(frame[3], dict):
+                    raise ValueError("帧格式错误")
+                seq, kind, timestamp, payload = frame
+                if not _is_int(seq) or seq < 1:
+                    raise ValueError(f"非法的seq: {seq!r}")
+                if kind not in (KEYFRAME, DELTA) or not _is_int(kind):
+                    raise ValueError(f"非法的帧类型: {kind!r}")
+                if not _is_number(timestamp):
+                    raise ValueError(f"非法的时间戳: {timestamp!r}")
+                yield seq, kind, timestamp, payload
+        except (msgpack.UnpackException, ValueError) as e:
+            raise ValueError(f"无法解析帧: {e}")
+
+    return header, frames()
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def encode_batch(header: bytes, frames: List[bytes]) -> bytes:
+    return header + b''.join(frames)
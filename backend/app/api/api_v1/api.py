@@ -3,7 +3,7 @@ API v1 路由配置
 """
 
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import monitoring, metrics, summary, prometheus, auth
+from app.api.api_v1.endpoints import monitoring, metrics, summary, prometheus, auth, debug, agents
 
 api_router = APIRouter()
 
@@ -40,4 +40,18 @@ api_router.include_router(
     auth.router,
     prefix="/auth",
     tags=["认证"]
-)
\ No newline at end of file
+)
+
+# 诊断（仅管理员）
+api_router.include_router(
+    debug.router,
+    prefix="/debug",
+    tags=["诊断"]
+)
+
+# 推送agent上报与主机列表
+api_router.include_router(
+    agents.router,
+    prefix="/agents",
+    tags=["推送agent"]
+)
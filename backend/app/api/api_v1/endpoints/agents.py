@@ -0,0 +1,71 @@
+"""
+推送agent相关API端点
+接收agent上报的快照帧，并提供全部上报主机的列表、最新快照与历史
+"""
+
+import hmac
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.agent.protocol import TOKEN_HEADER
+from app.api.conditional import check_etag, snapshot_etag
+from app.core.config import settings
+from app.services.fleet import HISTORY_FIELDS, fleet_store
+
+router = APIRouter()
+
+
+@router.post("/ingest")
+async def ingest_agent_batch(request: Request):
+    """接收agent上报的一批帧（msgpack），返回确认的seq"""
+    token = request.headers.get(TOKEN_HEADER, "")
+    if not settings.AGENT_INGEST_TOKEN or not hmac.compare_digest(token, settings.AGENT_INGEST_TOKEN):
+        raise HTTPException(status_code=403, detail="无效的agent上报令牌")
+    body = await request.body()
+    if len(body) > settings.AGENT_MAX_INGEST_BYTES:
+        raise HTTPException(status_code=413, detail="上报内容过大")
+    try:
+        # 解码与增量应用是CPU密集操作，多worker时还要写共享文件，放入线程池执行
+        return await run_in_threadpool(fleet_store.ingest, body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"上报格式错误: {str(e)}")
+
+
+@router.get("/hosts")
+async def list_agent_hosts():
+    """获取所有上报主机的状态与关键指标"""
+    try:
+        hosts = [state.summary() for state in await run_in_threadpool(fleet_store.list)]
+        return {
+            "total": len(hosts),
+            "online": sum(1 for host in hosts if host["online"]),
+            "hosts": hosts
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取主机列表失败: {str(e)}")
+
+
+@router.get("/hosts/{host}")
+async def get_agent_host(host: str, request: Request, response: Response):
+    """获取主机最近一次上报的完整快照"""
+    state = await run_in_threadpool(fleet_store.get, host)
+    if state is None or not state.snapshot:
+        raise HTTPException(status_code=404, detail=f"主机 {host} 没有上报数据")
+    not_modified = check_etag(request, response, snapshot_etag(state.snapshot))
+    if not_modified:
+        return not_modified
+    return {**state.summary(), "snapshot": state.snapshot}
+
+
+@router.get("/hosts/{host}/history")
+async def get_agent_host_history(host: str):
+    """获取主机最近的历史点（列式：fields给出字段顺序，points为各点的取值）"""
+    state = await run_in_threadpool(fleet_store.get, host)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"主机 {host} 没有上报数据")
+    return {
+        "host": host,
+        "fields": HISTORY_FIELDS,
+        "points": list(state.history)
+    }
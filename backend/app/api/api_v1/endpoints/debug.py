@@ -0,0 +1,82 @@
+"""
+诊断相关API端点（仅管理员）
+用于生产环境排查性能问题，无需重新部署
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.security import require_roles
+from app.models.auth import User
+from app.monitoring.loop_monitor import loop_monitor
+from app.monitoring.profiler import profiler, ProfilerBusyError
+
+router = APIRouter()
+
+
+@router.get("/profile")
+async def profile_service(
+    seconds: int = Query(10, ge=1, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000),
+    idle: bool = False,
+    top: int = Query(30, ge=1, le=500),
+    format: str = "json",
+    _: User = Depends(require_roles("admin"))
+):
+    """对本worker的所有线程采样剖析指定秒数（仅管理员）
+
+    format=json 返回函数排行与折叠栈，format=collapsed 只返回折叠栈文本（可直接用于flamegraph.pl、speedscope）；
+    idle=false 时不统计空闲等待中的线程。同一时间只允许一个剖析会话。
+    """
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="format必须是json或collapsed")
+    try:
+        session = profiler.start(seconds, interval_ms / 1000 if interval_ms else None)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        await asyncio.sleep(session.seconds)
+    finally:
+        # 客户端断开时同样结束会话
+        profiler.finish(session)
+
+    try:
+        result = await run_in_threadpool(session.result, idle, top)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"汇总剖析结果失败: {str(e)}")
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"] + "\n")
+    return result
+
+
+@router.get("/event-loop")
+async def get_event_loop_status(
+    limit: int = Query(20, ge=1, le=settings.LOOP_BLOCK_LOG_SIZE),
+    _: User = Depends(require_roles("admin"))
+):
+    """获取本worker事件循环延迟与最近的阻塞记录（仅管理员）"""
+    return loop_monitor.status(limit)
+
+
+@router.put("/event-loop")
+async def configure_event_loop_monitor(
+    debug: bool,
+    threshold_ms: Optional[float] = Query(None, ge=10, le=60000),
+    _: User = Depends(require_roles("admin"))
+):
+    """开启/关闭本worker的阻塞调用检测，可同时调整阈值（仅管理员）"""
+    loop_monitor.configure(debug, threshold_ms / 1000 if threshold_ms else None)
+    return loop_monitor.status(0)
+
+
+@router.delete("/event-loop/blocks")
+async def clear_event_loop_blocks(_: User = Depends(require_roles("admin"))):
+    """清空本worker的阻塞记录（仅管理员）"""
+    loop_monitor.clear()
+    return {"status": "cleared"}
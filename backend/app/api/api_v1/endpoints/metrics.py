@@ -5,6 +5,7 @@ Prometheus指标API端点
 
 from fastapi import APIRouter, Response
 from app.monitoring.metrics import get_metrics_response
+from app.monitoring.cardinality import series_guard
 
 router = APIRouter()
 
@@ -15,6 +16,17 @@ async def get_prometheus_metrics():
     return get_metrics_response()
 
 
+@router.get("/cardinality")
+async def get_metrics_cardinality():
+    """获取各指标族的序列数与估算内存"""
+    families = series_guard.stats()
+    return {
+        "total_series": sum(f['series'] for f in families.values()),
+        "total_memory_bytes": sum(f['memory_bytes'] for f in families.values()),
+        "families": families
+    }
+
+
 @router.get("/health")
 async def get_metrics_health():
     """获取指标服务健康状态"""
@@ -23,6 +35,7 @@ async def get_metrics_health():
         "service": "metrics-service",
         "endpoints": {
             "prometheus": "/api/v1/metrics/prometheus",
+            "cardinality": "/api/v1/metrics/cardinality",
             "health": "/api/v1/metrics/health"
         }
     }
\ No newline at end of file
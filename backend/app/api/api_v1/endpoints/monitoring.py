@@ -3,53 +3,100 @@
 提供系统资源监控的RESTful接口
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List
+import os
+import psutil
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
-from app.monitoring.collectors.system_collector import SystemCollector
+from app.core.security import require_roles
+from app.models.auth import User
+from app.monitoring.collectors.system_collector import system_collector
+from app.api.conditional import check_etag, snapshot_etag
+from app.core.config import settings
 from app.monitoring.metrics import get_metrics_response
+from app.services.fleet import fleet_store
+from app.services.materialized_views import materializer, view_response
 
 router = APIRouter()
 
-# 全局收集器实例
-system_collector = SystemCollector()
-
 
 @router.get("/status")
 async def get_monitoring_status():
-    """获取监控服务状态"""
+    """获取监控服务状态
+
+    collector_running 按最近一次快照的新鲜度判断，任一worker上都反映主收集器的真实状态。
+    """
+    collector = system_collector.status()
     return {
         "status": "running",
-        "collector_running": system_collector.running,
+        "collector_running": collector["running"],
+        "collector_leader": system_collector.is_leader,
+        "collector": collector,
+        "worker_pid": os.getpid(),
+        "materialized_views": materializer.status(),
         "timestamp": datetime.now().isoformat()
     }
 
 
+async def host_metrics(host: Optional[str]) -> Dict[str, Any]:
+    """获取快照：未指定host时为本机，否则为该主机推送agent最近一次上报的快照"""
+    if not host:
+        metrics = await system_collector.current_metrics()
+        if not metrics:
+            raise HTTPException(status_code=503, detail="系统指标收集器正在预热，尚无快照")
+        return metrics
+    # 多worker部署时可能要读取并解析共享目录中的主机状态文件，放入线程池执行
+    snapshot = await run_in_threadpool(fleet_store.snapshot, host)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"主机 {host} 没有上报数据")
+    return snapshot
+
+
+async def build_system_overview(metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """构建系统概览（默认使用本机快照）"""
+    if metrics is None:
+        metrics = await system_collector.current_metrics()
+        if not metrics:
+            # 视图保持未就绪，请求回退到host_metrics并得到503
+            raise RuntimeError("尚无系统快照")
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "system": {
+            "cpu_usage": metrics.get('cpu', {}).get('usage_percent', 0),
+            "memory_usage": metrics.get('memory', {}).get('virtual', {}).get('percent', 0),
+            "disk_usage": metrics.get('disk', {}).get('root', {}).get('percent', 0),
+            "process_count": metrics.get('processes', {}).get('count', 0)
+        },
+        "status": "healthy"
+    }
+
+
+materializer.register("system_overview", build_system_overview, settings.COLLECTION_INTERVAL)
+
+
 @router.get("/system/overview")
-async def get_system_overview():
-    """获取系统概览信息"""
+async def get_system_overview(request: Request, host: Optional[str] = None):
+    """获取系统概览信息（本机优先返回物化视图）"""
+    view = None if host else await materializer.aget("system_overview")
+    if view is not None:
+        return view_response(view, request)
+    metrics = await host_metrics(host)
     try:
-        metrics = system_collector.get_current_metrics()
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "system": {
-                "cpu_usage": metrics.get('cpu', {}).get('usage_percent', 0),
-                "memory_usage": metrics.get('memory', {}).get('virtual', {}).get('percent', 0),
-                "disk_usage": metrics.get('disk', {}).get('root', {}).get('percent', 0),
-                "process_count": metrics.get('processes', {}).get('count', 0)
-            },
-            "status": "healthy"
-        }
+        return await build_system_overview(metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取系统概览失败: {str(e)}")
 
 
 @router.get("/system/cpu")
-async def get_cpu_metrics():
+async def get_cpu_metrics(request: Request, response: Response, host: Optional[str] = None):
     """获取CPU指标"""
+    metrics = await host_metrics(host)
     try:
-        metrics = system_collector.get_current_metrics()
+        not_modified = check_etag(request, response, snapshot_etag(metrics))
+        if not_modified:
+            return not_modified
         cpu_data = metrics.get('cpu', {})
         
         return {
@@ -61,7 +108,9 @@ async def get_cpu_metrics():
                     "5min": cpu_data.get('load_avg', [0, 0, 0])[1],
                     "15min": cpu_data.get('load_avg', [0, 0, 0])[2]
                 },
-                "core_count": cpu_data.get('count', 0)
+                "core_count": cpu_data.get('count', 0),
+                "modes": cpu_data.get('modes', {}),
+                "per_cpu": dict(zip(cpu_data.get('cpus', []), cpu_data.get('per_cpu', [])))
             }
         }
     except Exception as e:
@@ -69,10 +118,13 @@ async def get_cpu_metrics():
 
 
 @router.get("/system/memory")
-async def get_memory_metrics():
+async def get_memory_metrics(request: Request, response: Response, host: Optional[str] = None):
     """获取内存指标"""
+    metrics = await host_metrics(host)
     try:
-        metrics = system_collector.get_current_metrics()
+        not_modified = check_etag(request, response, snapshot_etag(metrics))
+        if not_modified:
+            return not_modified
         memory_data = metrics.get('memory', {})
         
         virtual_memory = memory_data.get('virtual', {})
@@ -101,10 +153,13 @@ async def get_memory_metrics():
 
 
 @router.get("/system/disk")
-async def get_disk_metrics():
+async def get_disk_metrics(request: Request, response: Response, host: Optional[str] = None):
     """获取磁盘指标"""
+    metrics = await host_metrics(host)
     try:
-        metrics = system_collector.get_current_metrics()
+        not_modified = check_etag(request, response, snapshot_etag(metrics))
+        if not_modified:
+            return not_modified
         disk_data = metrics.get('disk', {})
         
         root_usage = disk_data.get('root', {})
@@ -127,10 +182,12 @@ async def get_disk_metrics():
                         "total": partition.get('usage', {}).get('total', 0),
                         "used": partition.get('usage', {}).get('used', 0),
                         "free": partition.get('usage', {}).get('free', 0),
-                        "percent": partition.get('usage', {}).get('percent', 0)
+                        "percent": partition.get('usage', {}).get('percent', 0),
+                        "stale": partition.get('stale', False)
                     }
                     for partition in partitions
-                ]
+                ],
+                "io": disk_data.get('io_rates', {})
             }
         }
     except Exception as e:
@@ -138,10 +195,13 @@ async def get_disk_metrics():
 
 
 @router.get("/system/network")
-async def get_network_metrics():
+async def get_network_metrics(request: Request, response: Response, host: Optional[str] = None):
     """获取网络指标"""
+    metrics = await host_metrics(host)
     try:
-        metrics = system_collector.get_current_metrics()
+        not_modified = check_etag(request, response, snapshot_etag(metrics))
+        if not_modified:
+            return not_modified
         network_data = metrics.get('network', {})
         
         io_counters = network_data.get('io_counters', {})
@@ -153,18 +213,58 @@ async def get_network_metrics():
                 "bytes_recv": io_counters.get('bytes_recv', 0),
                 "packets_sent": io_counters.get('packets_sent', 0),
                 "packets_recv": io_counters.get('packets_recv', 0),
-                "connections": network_data.get('connections', 0)
+                "connections": network_data.get('connections', 0),
+                "sockets": network_data.get('sockets', {}),
+                "rates": network_data.get('rates_total', {}),
+                "interfaces": network_data.get('rates', {})
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取网络指标失败: {str(e)}")
 
 
+@router.get("/system/connections")
+async def get_connection_list(
+    kind: str = "inet",
+    limit: int = 1000,
+    _: User = Depends(require_roles("admin"))
+):
+    """获取完整连接列表（仅管理员）
+
+    需要遍历全部连接和进程fd表，连接数多时开销很大，仅用于排障。
+    """
+    if kind not in ("inet", "inet4", "inet6", "tcp", "tcp4", "tcp6", "udp", "udp4", "udp6", "unix", "all"):
+        raise HTTPException(status_code=400, detail="不支持的连接类型")
+    try:
+        connections = await run_in_threadpool(psutil.net_connections, kind)
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "total": len(connections),
+            "connections": [
+                {
+                    "fd": conn.fd,
+                    "family": conn.family.name,
+                    "type": conn.type.name,
+                    "laddr": list(conn.laddr) if conn.laddr else None,
+                    "raddr": list(conn.raddr) if conn.raddr else None,
+                    "status": conn.status,
+                    "pid": conn.pid
+                }
+                for conn in connections[:max(0, limit)]
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取连接列表失败: {str(e)}")
+
+
 @router.get("/system/processes")
-async def get_process_metrics():
+async def get_process_metrics(request: Request, response: Response, host: Optional[str] = None):
     """获取进程指标"""
+    metrics = await host_metrics(host)
     try:
-        metrics = system_collector.get_current_metrics()
+        not_modified = check_etag(request, response, snapshot_etag(metrics))
+        if not_modified:
+            return not_modified
         processes_data = metrics.get('processes', {})
         
         return {
@@ -178,6 +278,53 @@ async def get_process_metrics():
         raise HTTPException(status_code=500, detail=f"获取进程指标失败: {str(e)}")
 
 
+@router.get("/cgroups")
+async def get_cgroup_metrics(
+    request: Request,
+    response: Response,
+    level: str = "pod",
+    pod_uid: Optional[str] = None,
+    sort_by: str = "cpu",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    host: Optional[str] = None
+):
+    """获取Pod/容器资源使用（cgroup v2，分页）"""
+    if level not in ("pod", "container"):
+        raise HTTPException(status_code=400, detail="level必须是pod或container")
+    sort_keys = {
+        "cpu": lambda item: item.get('cpu_cores') or 0,
+        "memory": lambda item: item.get('memory_bytes', 0),
+        "io": lambda item: (item.get('io_read_bytes_per_sec') or 0) + (item.get('io_write_bytes_per_sec') or 0)
+    }
+    if sort_by not in sort_keys:
+        raise HTTPException(status_code=400, detail="sort_by必须是cpu、memory或io")
+
+    metrics = await host_metrics(host)
+    try:
+        not_modified = check_etag(request, response, snapshot_etag(metrics))
+        if not_modified:
+            return not_modified
+
+        cgroups = metrics.get('cgroups', {})
+        items = cgroups.get('pods' if level == "pod" else 'containers', [])
+        if pod_uid:
+            items = [item for item in items if item.get('pod_uid') == pod_uid]
+        items = sorted(items, key=sort_keys[sort_by], reverse=True)
+
+        start = (page - 1) * page_size
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "level": level,
+            "total": len(items),
+            "page": page,
+            "page_size": page_size,
+            "items": items[start:start + page_size]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取cgroup指标失败: {str(e)}")
+
+
 @router.get("/alerts")
 async def get_alerts():
     """获取告警信息"""
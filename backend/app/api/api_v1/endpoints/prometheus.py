@@ -3,17 +3,28 @@ Prometheus查询API端点
 提供Prometheus查询接口
 """
 
-from fastapi import APIRouter, HTTPException, Body
-from typing import Dict, Any, Optional
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel
 
-from app.services.prometheus_service import PrometheusService
+from app.api.responses import JSONResponse
+from app.api.series_format import check_format, series_response
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.models.auth import User
+from app.services.admission import AdmissionRejected, query_admission
+from app.services.prometheus_service import prometheus_service
+from app.services.resilience import deadline_scope
+from app.services.promql import (
+    PromQLError, QueryPlan, QueryTooExpensive, cap_result, parse_step, parse_time, plan_query
+)
+from app.services.range_export import EXPORT_FORMATS, stream_export
 
 router = APIRouter()
 
-# 全局Prometheus服务实例
-prometheus_service = PrometheusService()
-
 
 class PrometheusQuery(BaseModel):
     """Prometheus查询模型"""
@@ -23,75 +34,250 @@ class PrometheusQuery(BaseModel):
     step: Optional[str] = "15s"
 
 
+class BatchQueryItem(PrometheusQuery):
+    """批量查询中的单个查询，id由客户端指定，用于对应返回结果"""
+    id: str
+
+
+class PrometheusBatchQuery(BaseModel):
+    """批量查询模型"""
+    queries: List[BatchQueryItem]
+
+
+class PrometheusExport(BaseModel):
+    """范围查询导出模型"""
+    query: str
+    start: str
+    end: str
+    step: Optional[str] = "60s"
+    format: str = "ndjson"
+
+
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    """准入拒绝转换为429/503响应"""
+    headers = None
+    if e.retry_after is not None:
+        headers = {"Retry-After": str(max(1, int(e.retry_after + 0.999)))}
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+
+def plan_prometheus_query(query_data: PrometheusQuery) -> Tuple[bool, QueryPlan]:
+    """解析并估算查询成本，返回（是否范围查询, 查询计划）"""
+    is_range = bool(query_data.start and query_data.end)
+    plan = plan_query(
+        query_data.query,
+        query_data.start if is_range else None,
+        query_data.end if is_range else None,
+        query_data.step
+    )
+    return is_range, plan
+
+
+async def execute_prometheus_query(query_data: PrometheusQuery, is_range: bool, plan: QueryPlan) -> Dict[str, Any]:
+    """按查询计划执行即时查询或范围查询"""
+    if is_range:
+        # 范围查询
+        return await prometheus_service.query_range(
+            query_data.query,
+            query_data.start,
+            query_data.end,
+            str(plan.step)
+        )
+    # 即时查询
+    return await prometheus_service.query(query_data.query)
+
+
 @router.post("/query")
-async def query_prometheus(query_data: PrometheusQuery):
-    """执行Prometheus查询"""
+async def query_prometheus(query_data: PrometheusQuery, format: str = "json",
+                           user: User = Depends(get_current_user)):
+    """执行Prometheus查询
+
+    查询经PromQL解析后校验指标白名单并估算成本：范围查询超出预算时自动放大步长，
+    无法降到预算内的查询直接拒绝；返回结果按序列数和点数上限截断。
+    执行前按当前用户做准入控制：超出速率返回429，排队超时返回503。
+    format为columnar/msgpack/arrow时按序列返回时间戳与值数组（见series_format）。
+    """
+    try:
+        check_format(format)
+        try:
+            is_range, plan = plan_prometheus_query(query_data)
+        except QueryTooExpensive as e:
+            raise HTTPException(status_code=422, detail=f"查询成本过高: {str(e)}")
+        except PromQLError as e:
+            raise HTTPException(status_code=400, detail=f"查询不合法: {str(e)}")
+        
+        try:
+            async with query_admission.admit(user.username):
+                result = await execute_prometheus_query(query_data, is_range, plan)
+        except AdmissionRejected as e:
+            raise admission_error(e)
+        
+        result = cap_result(result)
+        if format != "json":
+            meta = {"plan": plan.to_dict(), "warnings": result.get("warnings", [])}
+            return series_response(format, meta, result)
+        return JSONResponse({
+            "status": "success",
+            "data": result,
+            "plan": plan.to_dict()
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prometheus查询失败: {str(e)}")
+
+
+@router.post("/query/batch")
+async def query_prometheus_batch(batch: PrometheusBatchQuery, user: User = Depends(get_current_user)):
+    """批量执行Prometheus查询
+
+    一个页面的多个面板合并为一次请求：相同的查询（查询语句、时间范围和规划后的步长都相同）只执行一次，
+    不同的查询并发执行，每个查询单独经过准入控制（受每用户并发上限约束）。
+    结果按客户端提供的id返回，单个查询失败只在该查询的结果中报告错误。
+    整个批次只消耗一个速率令牌。
+    """
     try:
-        # 白名单检查（安全考虑）
-        allowed_queries = [
-            "node_cpu_seconds_total",
-            "node_memory_MemTotal_bytes",
-            "node_memory_MemAvailable_bytes",
-            "node_filesystem_size_bytes",
-            "node_filesystem_avail_bytes",
-            "node_network_receive_bytes_total",
-            "node_network_transmit_bytes_total",
-            "kube_node_info",
-            "kube_pod_info",
-            "kube_pod_status_phase",
-            "kube_node_status_condition",
-            "up",
-            "rate(",
-            "avg(",
-            "sum(",
-            "count("
-        ]
-        
-        # 检查查询是否包含允许的指标
-        if not any(allowed in query_data.query for allowed in allowed_queries):
+        if not batch.queries:
+            raise HTTPException(status_code=400, detail="queries不能为空")
+        if len(batch.queries) > settings.PROMQL_BATCH_MAX_QUERIES:
             raise HTTPException(
-                status_code=400, 
-                detail="查询包含不允许的指标，请使用预定义的查询模板"
+                status_code=400,
+                detail=f"单次最多 {settings.PROMQL_BATCH_MAX_QUERIES} 个查询"
             )
+        ids = [item.id for item in batch.queries]
+        if len(set(ids)) != len(ids):
+            raise HTTPException(status_code=400, detail="查询id不能重复")
         
-        if query_data.start and query_data.end:
-            # 范围查询
-            result = await prometheus_service.query_range(
-                query_data.query,
-                query_data.start,
-                query_data.end,
-                query_data.step
-            )
-        else:
-            # 即时查询
-            result = await prometheus_service.query(query_data.query)
+        try:
+            query_admission.charge(user.username)
+        except AdmissionRejected as e:
+            raise admission_error(e)
         
-        return {
+        results: Dict[str, Dict[str, Any]] = {}
+        # 去重键 -> 对应的查询id
+        groups: Dict[Tuple, List[str]] = {}
+        planned: Dict[Tuple, Tuple[BatchQueryItem, bool, QueryPlan]] = {}
+        for item in batch.queries:
+            try:
+                is_range, plan = plan_prometheus_query(item)
+            except QueryTooExpensive as e:
+                results[item.id] = {"status": "error", "errorType": "too_expensive", "error": str(e)}
+                continue
+            except PromQLError as e:
+                results[item.id] = {"status": "error", "errorType": "bad_query", "error": str(e)}
+                continue
+            key = (item.query, item.start, item.end, plan.step) if is_range else (item.query,)
+            groups.setdefault(key, []).append(item.id)
+            planned.setdefault(key, (item, is_range, plan))
+        
+        async def run(key: Tuple) -> Dict[str, Any]:
+            item, is_range, plan = planned[key]
+            try:
+                async with query_admission.admit(user.username, tokens=0):
+                    result = await execute_prometheus_query(item, is_range, plan)
+            except AdmissionRejected as e:
+                return {"status": "error", "errorType": e.reason, "error": str(e)}
+            except Exception as e:
+                return {"status": "error", "errorType": "internal", "error": str(e)}
+            if result.get("status") != "success":
+                return {
+                    "status": "error",
+                    "errorType": result.get("errorType", "unavailable"),
+                    "error": result.get("error", "")
+                }
+            return {"status": "success", "data": cap_result(result), "plan": plan.to_dict()}
+        
+        keys = list(groups)
+        outcomes = await asyncio.gather(*(run(key) for key in keys))
+        for key, outcome in zip(keys, outcomes):
+            for query_id in groups[key]:
+                results[query_id] = outcome
+        
+        return JSONResponse({
             "status": "success",
-            "data": result
-        }
+            "data": {query_id: results[query_id] for query_id in ids},
+            "executed": len(keys)
+        })
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prometheus查询失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prometheus批量查询失败: {str(e)}")
+
+
+@router.post("/query/export")
+async def export_prometheus_query(export: PrometheusExport, user: User = Depends(get_current_user)):
+    """流式导出长时间范围的查询结果（NDJSON或CSV）
+
+    时间范围按步长切分为块，逐块查询并立即写出，内存占用与总时间范围无关。
+    成本按单块估算；单块超出预算时与/query一样放大步长，实际步长见X-Export-Step响应头。
+    每块查询都经过准入控制，整个导出只消耗一个速率令牌；开始输出后的错误以错误行的形式写在末尾。
+    """
+    try:
+        if export.format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format必须是{'、'.join(EXPORT_FORMATS)}之一")
+        try:
+            start, end = parse_time(export.start), parse_time(export.end)
+            if end < start:
+                raise PromQLError("结束时间不能早于开始时间")
+            if end - start > settings.PROMQL_EXPORT_MAX_RANGE:
+                raise PromQLError(f"导出时间范围不能超过 {settings.PROMQL_EXPORT_MAX_RANGE} 秒")
+            chunk_end = min(end, start + parse_step(export.step) * (settings.PROMQL_EXPORT_CHUNK_POINTS - 1))
+            plan = plan_query(export.query, start, chunk_end, export.step)
+        except QueryTooExpensive as e:
+            raise HTTPException(status_code=422, detail=f"查询成本过高: {str(e)}")
+        except PromQLError as e:
+            raise HTTPException(status_code=400, detail=f"查询不合法: {str(e)}")
+        
+        try:
+            query_admission.charge(user.username)
+        except AdmissionRejected as e:
+            raise admission_error(e)
+        
+        async def fetch(chunk_start: float, chunk_end: float, step: float) -> Dict[str, Any]:
+            async with query_admission.admit(user.username, tokens=0):
+                # 导出的块只读一次，不经过块缓存
+                return await prometheus_service.query_range(
+                    export.query, str(chunk_start), str(chunk_end), str(step), cache=False
+                )
+        
+        filename = f"prometheus-export-{int(start)}-{int(end)}.{export.format}"
+        return StreamingResponse(
+            stream_export(fetch, start, end, plan.step, export.format),
+            media_type=EXPORT_FORMATS[export.format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "X-Export-Step": str(plan.step)
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"导出查询结果失败: {str(e)}")
 
 
 @router.get("/query/cpu-trend")
-async def get_cpu_trend(duration: str = "1h"):
-    """获取CPU使用率趋势"""
+async def get_cpu_trend(duration: str = "1h", format: str = "json"):
+    """获取CPU使用率趋势
+
+    format=json时所有序列的点展开为一个列表；columnar/msgpack/arrow按序列返回并保留标签。
+    """
     try:
         if duration not in ["1h", "6h", "24h"]:
             raise HTTPException(status_code=400, detail="duration必须是1h、6h或24h")
+        check_format(format)
+        if format != "json":
+            result = await prometheus_service.get_usage_range("cpu", duration)
+            return series_response(format, {"duration": duration}, result)
         
         trend_data = await prometheus_service.get_cpu_usage_trend(duration)
         
-        return {
+        return JSONResponse({
             "status": "success",
             "data": {
                 "duration": duration,
                 "trend": trend_data
             }
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -99,21 +285,28 @@ async def get_cpu_trend(duration: str = "1h"):
 
 
 @router.get("/query/memory-trend")
-async def get_memory_trend(duration: str = "1h"):
-    """获取内存使用率趋势"""
+async def get_memory_trend(duration: str = "1h", format: str = "json"):
+    """获取内存使用率趋势
+
+    format=json时所有序列的点展开为一个列表；columnar/msgpack/arrow按序列返回并保留标签。
+    """
     try:
         if duration not in ["1h", "6h", "24h"]:
             raise HTTPException(status_code=400, detail="duration必须是1h、6h或24h")
+        check_format(format)
+        if format != "json":
+            result = await prometheus_service.get_usage_range("memory", duration)
+            return series_response(format, {"duration": duration}, result)
         
         trend_data = await prometheus_service.get_memory_usage_trend(duration)
         
-        return {
+        return JSONResponse({
             "status": "success",
             "data": {
                 "duration": duration,
                 "trend": trend_data
             }
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -122,14 +315,15 @@ async def get_memory_trend(duration: str = "1h"):
 
 @router.get("/query/kubernetes")
 async def get_kubernetes_metrics():
-    """获取Kubernetes指标"""
+    """获取Kubernetes指标（节点/Pod清单可能很大，直接由orjson序列化）"""
     try:
-        metrics = await prometheus_service.get_kubernetes_metrics()
+        with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+            metrics = await prometheus_service.get_kubernetes_metrics()
         
-        return {
+        return JSONResponse({
             "status": "success",
             "data": metrics
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取Kubernetes指标失败: {str(e)}")
 
@@ -138,7 +332,8 @@ async def get_kubernetes_metrics():
 async def get_prometheus_summary():
     """获取Prometheus汇总指标"""
     try:
-        summary = await prometheus_service.get_summary_metrics()
+        with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+            summary = await prometheus_service.get_summary_metrics()
         
         return {
             "status": "success",
@@ -158,12 +353,18 @@ async def prometheus_health():
         if result.get("status") == "success":
             return {
                 "status": "healthy",
-                "prometheus": "connected"
+                "prometheus": "connected",
+                "mode": prometheus_service.mode,
+                "backends": prometheus_service.backend_status(),
+                "admission": query_admission.status(),
+                "range_cache": prometheus_service.range_cache.status()
             }
         else:
             return {
                 "status": "unhealthy",
-                "prometheus": "disconnected"
+                "prometheus": "disconnected",
+                "mode": prometheus_service.mode,
+                "backends": prometheus_service.backend_status()
             }
     except Exception as e:
         return {
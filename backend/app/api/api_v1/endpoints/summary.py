@@ -3,60 +3,149 @@
 提供系统资源的综合概览数据
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 import asyncio
 
-from app.monitoring.collectors.system_collector import SystemCollector
-from app.services.prometheus_service import PrometheusService
+from app.api.conditional import check_etag, make_etag, snapshot_etag
+from app.core.config import settings
+from app.monitoring.collectors.system_collector import system_collector
+from app.services.prometheus_service import prometheus_service
+from app.services.resilience import deadline_scope
+from app.services.materialized_views import materializer, view_response
+from app.services.kubernetes_inventory import kubernetes_inventory
 
 router = APIRouter()
 
-# 全局服务实例
-system_collector = SystemCollector()
-prometheus_service = PrometheusService()
+
+async def build_system_summary() -> Dict[str, Any]:
+    """构建系统综合概览"""
+    # 获取系统指标
+    system_metrics = await system_collector.current_metrics()
+    
+    # 获取Prometheus指标与告警状态（并发执行，共享同一时间预算）
+    with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+        prometheus_metrics, alert_status = await asyncio.gather(
+            prometheus_service.get_summary_metrics(),
+            get_alert_status()
+        )
+    
+    # Prometheus不可用时对应字段为None，并标记该部分为degraded
+    kubernetes = {
+        "node_count": prometheus_metrics.get('node_count'),
+        "pod_count": prometheus_metrics.get('pod_count'),
+        "running_pods": prometheus_metrics.get('running_pods'),
+        "failed_pods": prometheus_metrics.get('failed_pods'),
+        "degraded": prometheus_metrics.get('degraded', False)
+    }
+    if prometheus_metrics.get('errors'):
+        kubernetes["errors"] = prometheus_metrics['errors']
+    degraded_sections = ["kubernetes"] if kubernetes["degraded"] else []
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "system": {
+            "cpu_usage": system_metrics.get('cpu', {}).get('usage_percent', 0),
+            "memory_usage": system_metrics.get('memory', {}).get('virtual', {}).get('percent', 0),
+            "disk_usage": system_metrics.get('disk', {}).get('root', {}).get('percent', 0),
+            "process_count": system_metrics.get('processes', {}).get('count', 0),
+            "load_average": system_metrics.get('cpu', {}).get('load_avg', [0, 0, 0])
+        },
+        "kubernetes": kubernetes,
+        "alerts": alert_status,
+        "status": "degraded" if degraded_sections else "healthy",
+        "degraded_sections": degraded_sections
+    }
+
+
+async def build_kubernetes_overview() -> Dict[str, Any]:
+    """构建Kubernetes概览"""
+    with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+        k8s_metrics = await prometheus_service.get_kubernetes_metrics()
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "generation": kubernetes_inventory.update(k8s_metrics),
+        "kubernetes": k8s_metrics
+    }
+
+
+def build_kubernetes_delta(since: int) -> Dict[str, Any]:
+    """构建相对 since 代的节点/Pod增量；该代已不可用时返回完整清单（full=True）"""
+    changes = kubernetes_inventory.delta(since)
+    kubernetes = {**kubernetes_inventory.counts(), "degraded": kubernetes_inventory.degraded}
+    kubernetes.update(changes if changes is not None else kubernetes_inventory.listing())
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "generation": kubernetes_inventory.generation,
+        "since": since,
+        "full": changes is None,
+        "kubernetes": kubernetes
+    }
+
+
+async def build_alerts_overview() -> Dict[str, Any]:
+    """构建告警概览"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "alerts": await get_alert_status()
+    }
+
+
+def load_kubernetes_overview(overview: Dict[str, Any]):
+    """其他worker刷新的Kubernetes概览：以相同代数更新本进程清单，ETag与since=增量在各worker间一致"""
+    kubernetes_inventory.update(overview["kubernetes"], overview["generation"])
+
+
+# 注册物化视图，由后台任务定时刷新
+materializer.register("summary", build_system_summary, settings.MATERIALIZED_VIEW_INTERVAL)
+materializer.register(
+    "kubernetes_overview", build_kubernetes_overview, settings.MATERIALIZED_VIEW_INTERVAL, load_kubernetes_overview
+)
+materializer.register("alerts", build_alerts_overview, settings.MATERIALIZED_VIEW_INTERVAL)
 
 
 @router.get("/summary")
-async def get_system_summary():
-    """获取系统综合概览"""
+async def get_system_summary(request: Request):
+    """获取系统综合概览（优先返回物化视图）"""
+    view = await materializer.aget("summary")
+    if view is not None:
+        return view_response(view, request)
     try:
-        # 获取系统指标
-        system_metrics = system_collector.get_current_metrics()
-        
-        # 获取Prometheus指标
-        prometheus_metrics = await prometheus_service.get_summary_metrics()
-        
-        # 计算告警状态
-        alert_status = await get_alert_status()
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "system": {
-                "cpu_usage": system_metrics.get('cpu', {}).get('usage_percent', 0),
-                "memory_usage": system_metrics.get('memory', {}).get('virtual', {}).get('percent', 0),
-                "disk_usage": system_metrics.get('disk', {}).get('root', {}).get('percent', 0),
-                "process_count": system_metrics.get('processes', {}).get('count', 0),
-                "load_average": system_metrics.get('cpu', {}).get('load_avg', [0, 0, 0])
-            },
-            "kubernetes": {
-                "node_count": prometheus_metrics.get('node_count', 0),
-                "pod_count": prometheus_metrics.get('pod_count', 0),
-                "running_pods": prometheus_metrics.get('running_pods', 0),
-                "failed_pods": prometheus_metrics.get('failed_pods', 0)
-            },
-            "alerts": alert_status,
-            "status": "healthy"
-        }
+        return await build_system_summary()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取系统概览失败: {str(e)}")
 
 
+@router.get("/dashboard")
+async def get_dashboard_bundle(request: Request, response: Response):
+    """获取仪表盘所需的全部视图（一次请求返回预先序列化的内容）"""
+    try:
+        # 引擎未运行或视图过期时先同步刷新一次
+        stale = [name for name in materializer.views if await materializer.aget(name) is None]
+        if stale:
+            await asyncio.gather(*(materializer.refresh(name) for name in stale))
+        not_modified = check_etag(request, response, materializer.bundle_etag)
+        if not_modified:
+            return not_modified
+        return Response(
+            content=materializer.bundle(),
+            media_type="application/json",
+            headers={"ETag": materializer.bundle_etag, "X-View-Generation": str(materializer.generation)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取仪表盘数据失败: {str(e)}")
+
+
 @router.get("/resources/overview")
-async def get_resources_overview():
+async def get_resources_overview(request: Request, response: Response):
     """获取资源概览"""
     try:
+        not_modified = check_etag(request, response, snapshot_etag(await system_collector.current_metrics()))
+        if not_modified:
+            return not_modified
+        
         # 获取所有资源数据
         cpu_data = await get_cpu_metrics()
         memory_data = await get_memory_metrics()
@@ -77,30 +166,40 @@ async def get_resources_overview():
 
 
 @router.get("/kubernetes/overview")
-async def get_kubernetes_overview():
-    """获取Kubernetes概览"""
+async def get_kubernetes_overview(request: Request, response: Response, since: Optional[int] = None):
+    """获取Kubernetes概览（优先返回物化视图）
+
+    ETag取自节点/Pod清单代数，清单未变化时返回304；
+    带 since=<代数> 时只返回节点和Pod的新增（added）、删除（removed）与变化（changed）条目。
+    """
     try:
-        # 获取K8s指标
-        k8s_metrics = await prometheus_service.get_kubernetes_metrics()
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "kubernetes": k8s_metrics
-        }
+        view = await materializer.aget("kubernetes_overview")
+        body = await build_kubernetes_overview() if view is None else None
+
+        etag = make_etag("k8s", kubernetes_inventory.generation, "degraded" if kubernetes_inventory.degraded else "ok")
+        not_modified = check_etag(request, response, etag)
+        if not_modified:
+            return not_modified
+
+        if since is not None:
+            return build_kubernetes_delta(since)
+        if view is not None:
+            cached = view_response(view)
+            cached.headers["ETag"] = etag
+            return cached
+        return body
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取Kubernetes概览失败: {str(e)}")
 
 
 @router.get("/alerts/overview")
-async def get_alerts_overview():
-    """获取告警概览"""
+async def get_alerts_overview(request: Request):
+    """获取告警概览（优先返回物化视图）"""
+    view = await materializer.aget("alerts")
+    if view is not None:
+        return view_response(view, request)
     try:
-        alert_status = await get_alert_status()
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "alerts": alert_status
-        }
+        return await build_alerts_overview()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取告警概览失败: {str(e)}")
 
@@ -129,7 +228,7 @@ async def get_alert_status() -> Dict[str, Any]:
 async def get_cpu_metrics() -> Dict[str, Any]:
     """获取CPU指标"""
     try:
-        metrics = system_collector.get_current_metrics()
+        metrics = await system_collector.current_metrics()
         cpu_data = metrics.get('cpu', {})
         
         return {
@@ -148,7 +247,7 @@ async def get_cpu_metrics() -> Dict[str, Any]:
 async def get_memory_metrics() -> Dict[str, Any]:
     """获取内存指标"""
     try:
-        metrics = system_collector.get_current_metrics()
+        metrics = await system_collector.current_metrics()
         memory_data = metrics.get('memory', {})
         
         virtual_memory = memory_data.get('virtual', {})
@@ -176,7 +275,7 @@ async def get_memory_metrics() -> Dict[str, Any]:
 async def get_disk_metrics() -> Dict[str, Any]:
     """获取磁盘指标"""
     try:
-        metrics = system_collector.get_current_metrics()
+        metrics = await system_collector.current_metrics()
         disk_data = metrics.get('disk', {})
         
         root_usage = disk_data.get('root', {})
@@ -197,10 +296,12 @@ async def get_disk_metrics() -> Dict[str, Any]:
                     "total": partition.get('usage', {}).get('total', 0),
                     "used": partition.get('usage', {}).get('used', 0),
                     "free": partition.get('usage', {}).get('free', 0),
-                    "percent": partition.get('usage', {}).get('percent', 0)
+                    "percent": partition.get('usage', {}).get('percent', 0),
+                    "stale": partition.get('stale', False)
                 }
                 for partition in partitions
-            ]
+            ],
+            "io": disk_data.get('io_rates', {})
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取磁盘指标失败: {str(e)}")
@@ -209,7 +310,7 @@ async def get_disk_metrics() -> Dict[str, Any]:
 async def get_network_metrics() -> Dict[str, Any]:
     """获取网络指标"""
     try:
-        metrics = system_collector.get_current_metrics()
+        metrics = await system_collector.current_metrics()
         network_data = metrics.get('network', {})
         
         io_counters = network_data.get('io_counters', {})
@@ -219,7 +320,9 @@ async def get_network_metrics() -> Dict[str, Any]:
             "bytes_recv": io_counters.get('bytes_recv', 0),
             "packets_sent": io_counters.get('packets_sent', 0),
             "packets_recv": io_counters.get('packets_recv', 0),
-            "connections": network_data.get('connections', 0)
+            "connections": network_data.get('connections', 0),
+            "rates": network_data.get('rates_total', {}),
+            "interfaces": network_data.get('rates', {})
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取网络指标失败: {str(e)}")
\ No newline at end of file
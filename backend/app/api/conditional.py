@@ -0,0 +1,48 @@
+"""
+条件请求（ETag / If-None-Match）
+快照类接口以快照代数作为ETag，数据未更新时返回304，客户端无需重复下载相同内容。
+ETag只能由各worker共享的代数生成（主收集器快照、共享物化视图），不能带进程内的计数或标识，
+否则多worker部署时客户端换到另一个worker就会得到200而不是304。
+"""
+
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    """由代数等标识生成弱ETag（响应中的时间戳等字段不影响语义上的等价）"""
+    return 'W/"' + '-'.join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否命中当前ETag（弱比较）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def check_etag(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """为响应设置ETag；客户端缓存仍有效时返回304响应，否则返回None"""
+    if etag is None:
+        return None
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+def snapshot_etag(snapshot: dict) -> Optional[str]:
+    """系统快照的ETag（快照没有代数时不启用条件请求）"""
+    generation = snapshot.get('generation')
+    return make_etag("snap", generation) if generation is not None else None
@@ -0,0 +1,24 @@
+"""
+JSON序列化
+应用默认响应类使用orjson；数据量大的接口（Kubernetes清单、趋势、查询结果）直接返回JSONResponse，
+跳过FastAPI对返回值的jsonable_encoder逐个对象转换，由orjson一次性序列化。
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为JSON字节；orjson不支持的类型按str()输出"""
+    return orjson.dumps(content, default=str, option=_OPTIONS)
+
+
+class JSONResponse(ORJSONResponse):
+    """orjson响应（支持numpy数组、非字符串键，未知类型按str()输出）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
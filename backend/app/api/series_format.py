@@ -0,0 +1,108 @@
+"""
+时间序列响应格式
+- json：Prometheus原始结构（兼容旧接口）
+- columnar：每条序列一个 {labels, timestamps[], values[]}，由NumPy从原始矩阵构建，orjson直接序列化数组
+- msgpack：同columnar结构，timestamps/values为小端float64字节（前端可直接用Float64Array读取）
+- arrow：Arrow IPC流，列为 series/timestamp/value，序列标签放在schema元数据中（需安装pyarrow）
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import msgpack
+import numpy as np
+from fastapi import HTTPException, Response
+
+from app.api.responses import JSONResponse, dumps
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # 可选依赖，仅format=arrow需要
+    pyarrow = None
+
+FORMATS = ("json", "columnar", "msgpack", "arrow")
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def check_format(format: str):
+    """校验format参数"""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format必须是{'、'.join(FORMATS)}之一")
+    if format == "arrow" and pyarrow is None:
+        raise HTTPException(status_code=400, detail="服务端未安装pyarrow，不支持arrow格式")
+
+
+def series_arrays(item: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """一条序列的时间戳和值（float64）；即时查询结果视为只有一个点"""
+    points = item.get("values")
+    if points is None:
+        points = [item["value"]] if "value" in item else []
+    count = len(points)
+    timestamps = np.fromiter((point[0] for point in points), dtype=np.float64, count=count)
+    # Prometheus的值是字符串（含"NaN"、"+Inf"），float()可直接解析
+    values = np.fromiter((float(point[1]) for point in points), dtype=np.float64, count=count)
+    return timestamps, values
+
+
+def to_columnar(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Prometheus查询结果转为按序列的列式结构"""
+    data = result.get("data")
+    if not isinstance(data, dict):
+        return []
+    columns = []
+    for item in data.get("result") or []:
+        timestamps, values = series_arrays(item)
+        columns.append({"labels": item.get("metric", {}), "timestamps": timestamps, "values": values})
+    return columns
+
+
+def _to_msgpack(content: Dict[str, Any], series: List[Dict[str, Any]]) -> bytes:
+    packed = [
+        {
+            "labels": item["labels"],
+            "timestamps": item["timestamps"].astype("<f8").tobytes(),
+            "values": item["values"].astype("<f8").tobytes()
+        }
+        for item in series
+    ]
+    return msgpack.packb(
+        {"status": "success", **content, "dtype": "float64", "series": packed},
+        use_bin_type=True, default=str
+    )
+
+
+def _to_arrow(content: Dict[str, Any], series: List[Dict[str, Any]]) -> bytes:
+    lengths = [len(item["timestamps"]) for item in series]
+    empty = np.empty(0, dtype=np.float64)
+    table = pyarrow.table(
+        {
+            "series": pyarrow.array(np.repeat(np.arange(len(series), dtype=np.int32), lengths)),
+            "timestamp": pyarrow.array(np.concatenate([item["timestamps"] for item in series] or [empty])),
+            "value": pyarrow.array(np.concatenate([item["values"] for item in series] or [empty]))
+        },
+        metadata={
+            b"labels": dumps([item["labels"] for item in series]),
+            b"meta": dumps(content)
+        }
+    )
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def series_response(format: str, content: Dict[str, Any], result: Dict[str, Any]) -> Response:
+    """按format返回非json格式的序列数据；content为随序列一起返回的其他字段
+
+    查询失败（Prometheus不可达或返回错误）时返回502，而不是看起来成功的空序列。
+    """
+    if result.get("status") != "success":
+        error_type = result.get("errorType", "unknown")
+        raise HTTPException(status_code=502, detail=f"Prometheus查询失败: {error_type}: {result.get('error', '')}")
+    series = to_columnar(result)
+    if format == "msgpack":
+        return Response(content=_to_msgpack(content, series), media_type=MSGPACK_MEDIA_TYPE)
+    if format == "arrow":
+        return Response(content=_to_arrow(content, series), media_type=ARROW_MEDIA_TYPE)
+    return JSONResponse({"status": "success", "data": {**content, "series": series}})
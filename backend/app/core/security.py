@@ -46,7 +46,8 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    # 同步依赖由FastAPI放入线程池执行，数据库查询不阻塞事件循环
     payload = decode_token(token)
     username: str = payload.get("sub")
     if username is None:
@@ -0,0 +1,230 @@
+"""
+指标标签基数守卫
+主机相关标签（interface、device、mountpoint、pod_uid）的取值来自宿主机，
+在Kubernetes节点上veth网卡、容器挂载点会不断出现和消失。守卫负责：
+- 按标签的白名单/黑名单正则过滤序列
+- 按指标族限制序列数，超出部分汇入溢出序列（标签值为 __overflow__）
+- 连续N个收集周期未出现的序列自动移除
+- 统计每个指标族的序列数和估算内存
+
+多进程模式下不移除过期序列：prometheus_client无法从mmap值文件中删除已写入的值，
+remove()之后序列仍会被导出，而守卫会误以为有了空位继续接纳新序列。
+因此该模式下过期序列一直占用上限直到进程退出，新出现的序列超出上限后汇入溢出序列，导出的序列数仍然有界。
+"""
+
+import re
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.monitoring.metrics import SystemMetrics, ApplicationMetrics, app_metrics
+from app.monitoring.multiprocess import is_multiprocess_mode
+
+OVERFLOW_VALUE = '__overflow__'
+
+# 取值来自宿主机、需要限制基数的标签
+GUARDED_LABELS = frozenset(('interface', 'device', 'mountpoint', 'pod_uid'))
+
+
+class _FamilyState:
+    """单个指标族的序列跟踪状态"""
+
+    def __init__(self, metric, max_series: int, stale_cycles: int):
+        self.metric = metric
+        self.name = metric._name
+        self.labelnames: Tuple[str, ...] = metric._labelnames
+        self.max_series = max_series
+        self.stale_cycles = stale_cycles
+        # 序列标签值 -> 最近出现的周期
+        self.last_seen: Dict[Tuple[str, ...], int] = {}
+        # 溢出序列 -> 最近出现的周期（不计入上限）
+        self.overflow_seen: Dict[Tuple[str, ...], int] = {}
+        # 本周期汇入溢出序列的Gauge值（按溢出标签值合并）
+        self.overflow_values: Dict[Tuple[str, ...], float] = {}
+        # 溢出Gauge的合并方式：可加的量（字节、速率）求和，百分比、延迟等取最大值
+        self.overflow_merge = _merge_sum
+
+
+class CardinalityGuard:
+    """指标标签基数守卫"""
+
+    def __init__(
+        self,
+        default_max_series: int,
+        max_series: Dict[str, int],
+        allow: Dict[str, str],
+        deny: Dict[str, str],
+        stale_cycles: int,
+        evict: bool = True
+    ):
+        self.default_max_series = default_max_series
+        self.max_series = max_series
+        self.allow = {label: re.compile(pattern) for label, pattern in allow.items() if pattern}
+        self.deny = {label: re.compile(pattern) for label, pattern in deny.items() if pattern}
+        self.stale_cycles = stale_cycles
+        self.evict = evict
+        self.cycle = 0
+        self._families: Dict[str, _FamilyState] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> 'CardinalityGuard':
+        return cls(
+            default_max_series=settings.METRIC_DEFAULT_MAX_SERIES,
+            max_series=settings.METRIC_MAX_SERIES,
+            allow=settings.METRIC_LABEL_ALLOW,
+            deny=settings.METRIC_LABEL_DENY,
+            stale_cycles=settings.METRIC_STALE_CYCLES,
+            evict=not is_multiprocess_mode()
+        )
+
+    def configure(
+        self, metric, max_series: Optional[int] = None, stale_cycles: Optional[int] = None, additive: Optional[bool] = None
+    ):
+        """为指标族单独设置上限、过期周期（如速率类Gauge设备消失后应立即移除）或溢出合并方式
+
+        additive=False 的Gauge（百分比、延迟）溢出序列取各序列的最大值而不是求和。
+        """
+        family = self._family(metric)
+        if max_series is not None:
+            family.max_series = max_series
+        if stale_cycles is not None:
+            family.stale_cycles = stale_cycles
+        if additive is not None:
+            family.overflow_merge = _merge_sum if additive else max
+
+    def set(self, metric, value: float, **labels):
+        """设置Gauge序列的值"""
+        family = self._family(metric)
+        admitted = self._admit(family, labels)
+        if admitted is None:
+            return
+        labelvalues, overflow = admitted
+        if overflow:
+            # 溢出的Gauge在周期结束时以本周期所有溢出序列的合并值写入
+            previous = family.overflow_values.get(labelvalues)
+            family.overflow_values[labelvalues] = value if previous is None else family.overflow_merge(previous, value)
+        else:
+            metric.labels(*labelvalues).set(value)
+
+    def inc(self, metric, amount: float, **labels) -> Optional[Tuple[Tuple[str, ...], bool]]:
+        """累加Counter序列（amount可为0，仅标记序列本周期仍然存在）
+
+        返回 (实际写入的标签值, 是否溢出)，被过滤时返回None。
+        """
+        family = self._family(metric)
+        admitted = self._admit(family, labels)
+        if admitted is not None:
+            metric.labels(*admitted[0]).inc(amount)
+        return admitted
+
+    def end_cycle(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        """结束一个收集周期：写入溢出Gauge、移除过期序列、更新基数统计
+
+        返回本周期移除的 (指标名, 标签值) 列表。
+        """
+        evicted = []
+        with self._lock:
+            for family in self._families.values():
+                for labelvalues, value in family.overflow_values.items():
+                    family.metric.labels(*labelvalues).set(value)
+                family.overflow_values = {}
+
+                if not self.evict:
+                    continue
+                for seen_map in (family.last_seen, family.overflow_seen):
+                    expired = [
+                        labelvalues for labelvalues, seen in seen_map.items()
+                        if self.cycle - seen >= family.stale_cycles
+                    ]
+                    for labelvalues in expired:
+                        del seen_map[labelvalues]
+                        try:
+                            family.metric.remove(*labelvalues)
+                        except KeyError:
+                            pass
+                        app_metrics.metric_series_evicted_total.labels(metric=family.name).inc()
+                        evicted.append((family.name, labelvalues))
+            self.cycle += 1
+
+        for name, stats in self.stats().items():
+            app_metrics.metric_series_count.labels(metric=name).set(stats['series'])
+            app_metrics.metric_series_memory_bytes.labels(metric=name).set(stats['memory_bytes'])
+        return evicted
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个指标族的序列数和估算内存（覆盖SystemMetrics与ApplicationMetrics的所有指标）"""
+        result = {}
+        for metric in _all_metrics():
+            children = dict(getattr(metric, '_metrics', {}))
+            family = self._families.get(metric._name)
+            result[metric._name] = {
+                'series': len(children),
+                'memory_bytes': sum(_estimate_child_size(key, child) for key, child in children.items()),
+                'max_series': family.max_series if family else None,
+                'overflow_series': len(family.overflow_seen) if family else 0
+            }
+        return result
+
+    def _family(self, metric) -> _FamilyState:
+        family = self._families.get(metric._name)
+        if family is None:
+            with self._lock:
+                family = self._families.get(metric._name)
+                if family is None:
+                    family = _FamilyState(
+                        metric,
+                        self.max_series.get(metric._name, self.default_max_series),
+                        self.stale_cycles
+                    )
+                    self._families[metric._name] = family
+        return family
+
+    def _admit(self, family: _FamilyState, labels: Dict[str, Any]) -> Optional[Tuple[Tuple[str, ...], bool]]:
+        """返回 (实际写入的标签值, 是否溢出)；被黑名单/白名单过滤时返回None"""
+        labelvalues = tuple(str(labels[name]) for name in family.labelnames)
+        for name, value in zip(family.labelnames, labelvalues):
+            if name not in GUARDED_LABELS:
+                continue
+            allow = self.allow.get(name)
+            deny = self.deny.get(name)
+            if (allow and not allow.search(value)) or (deny and deny.search(value)):
+                app_metrics.metric_series_dropped_total.labels(metric=family.name, reason='filtered').inc()
+                return None
+
+        if labelvalues not in family.last_seen and len(family.last_seen) >= family.max_series:
+            app_metrics.metric_series_dropped_total.labels(metric=family.name, reason='overflow').inc()
+            labelvalues = tuple(
+                OVERFLOW_VALUE if name in GUARDED_LABELS else value
+                for name, value in zip(family.labelnames, labelvalues)
+            )
+            family.overflow_seen[labelvalues] = self.cycle
+            return labelvalues, True
+
+        family.last_seen[labelvalues] = self.cycle
+        return labelvalues, False
+
+
+def _merge_sum(a: float, b: float) -> float:
+    return a + b
+
+
+def _all_metrics():
+    for metrics_class in (SystemMetrics, ApplicationMetrics):
+        for value in vars(metrics_class).values():
+            if hasattr(value, '_labelnames') and hasattr(value, '_name'):
+                yield value
+
+
+def _estimate_child_size(labelvalues: Tuple[str, ...], child) -> int:
+    size = sys.getsizeof(labelvalues) + sum(sys.getsizeof(v) for v in labelvalues) + sys.getsizeof(child)
+    for attr in ('_value', '_created', '_buckets', '_sum'):
+        value = getattr(child, attr, None)
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+# 全局基数守卫
+series_guard = CardinalityGuard.from_settings()
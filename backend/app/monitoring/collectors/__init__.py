@@ -1,4 +1,12 @@
 # 数据收集器模块
-from .system_collector import SystemCollector
+# SystemCollector按需导入：推送agent只使用其中的轻量模块（如rates），导入本包时不加载后端配置与指标
+
+
+def __getattr__(name):
+    if name == 'SystemCollector':
+        from .system_collector import SystemCollector
+        return SystemCollector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ['SystemCollector']
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+容器/Pod资源收集器（cgroup v2）
+遍历cgroup v2层级，读取 cpu.stat、memory.current、memory.stat、io.stat，
+根据路径将cgroup映射到Pod UID与容器ID，并按增量计算每个cgroup的CPU使用率
+"""
+
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.monitoring.collectors.rates import CounterRateTracker
+
+# systemd驱动：kubepods-burstable-pod<uid>.slice（uid中的'-'被替换为'_'）
+# cgroupfs驱动：kubepods/burstable/pod<uid>
+_POD_PATTERN = re.compile(r'(?:^|[/-])pod([0-9a-f]{8}[-_][0-9a-f]{4}[-_][0-9a-f]{4}[-_][0-9a-f]{4}[-_][0-9a-f]{12})(?:\.slice)?$')
+_QOS_PATTERN = re.compile(r'kubepods[-/](burstable|besteffort)')
+# cri-containerd-<id>.scope、crio-<id>.scope、docker-<id>.scope 或cgroupfs下的 <id>
+_CONTAINER_PATTERN = re.compile(r'^(?:(?:cri-containerd|crio|docker)-)?([0-9a-f]{64})(?:\.scope)?$')
+
+_MEMORY_STAT_FIELDS = ('anon', 'file', 'kernel', 'shmem', 'file_dirty', 'file_writeback')
+
+_DIR_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+
+
+def _read_at(dir_fd: int, name: str) -> Optional[str]:
+    """相对目录fd读取cgroup文件（open/read/close三次系统调用）"""
+    try:
+        fd = os.open(name, os.O_RDONLY, dir_fd=dir_fd)
+    except OSError:
+        return None
+    try:
+        return os.read(fd, 65536).decode()
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+
+def parse_flat_keyed(content: str, fields=None) -> Dict[str, int]:
+    """解析 'key value' 形式的文件（cpu.stat、memory.stat）"""
+    result = {}
+    for line in content.splitlines():
+        key, _, value = line.partition(' ')
+        if fields is None or key in fields:
+            result[key] = int(value)
+    return result
+
+
+def parse_io_stat(content: str) -> Dict[str, int]:
+    """解析io.stat并对所有设备求和，如 '8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0 dios=0'"""
+    totals = {'rbytes': 0, 'wbytes': 0, 'rios': 0, 'wios': 0}
+    for line in content.splitlines():
+        for item in line.split()[1:]:
+            key, _, value = item.partition('=')
+            if key in totals:
+                totals[key] += int(value)
+    return totals
+
+
+class CgroupCollector:
+    """cgroup v2 Pod/容器资源收集器"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.CGROUP_ROOT
+        self.max_depth = settings.CGROUP_MAX_DEPTH
+        self._cpu_tracker = CounterRateTracker()
+        self._io_tracker = CounterRateTracker()
+
+    @property
+    def available(self) -> bool:
+        """仅支持cgroup v2统一层级"""
+        return os.path.exists(os.path.join(self.root, 'cgroup.controllers'))
+
+    def collect(self) -> Dict[str, Any]:
+        """返回 {'pods': [...], 'containers': [...]}，每项包含ID、CPU核数、内存和IO速率"""
+        if not self.available:
+            return {}
+
+        raw: Dict[str, Dict[str, Any]] = {}
+        root_fd = os.open(self.root, _DIR_FLAGS)
+        try:
+            self._walk(root_fd, '', 0, None, None, raw)
+        finally:
+            os.close(root_fd)
+
+        now = time.monotonic()
+        cpu_deltas, cpu_elapsed = self._cpu_tracker.update(
+            {path: {'usage_usec': item['cpu']['usage_usec']} for path, item in raw.items() if item['cpu']}, now
+        )
+        io_deltas, io_elapsed = self._io_tracker.update(
+            {path: item['io'] for path, item in raw.items() if item['io']}, now
+        )
+
+        pods, containers = [], []
+        for path, item in raw.items():
+            cpu_delta = cpu_deltas.get(path)
+            io_delta = io_deltas.get(path)
+            entry = {
+                'cgroup': path,
+                'pod_uid': item['pod_uid'],
+                'qos': item['qos'],
+                # 增量除以经过的微秒数即为占用的CPU核数
+                'cpu_cores': cpu_delta['usage_usec'] / (cpu_elapsed * 1e6) if cpu_delta else None,
+                'cpu_usage_usec': item['cpu'].get('usage_usec', 0),
+                'cpu_throttled_usec': item['cpu'].get('throttled_usec', 0),
+                'memory_bytes': item['memory_current'],
+                'memory_stat': item['memory_stat'],
+                'io_read_bytes_per_sec': io_delta['rbytes'] / io_elapsed if io_delta else None,
+                'io_write_bytes_per_sec': io_delta['wbytes'] / io_elapsed if io_delta else None
+            }
+            if item['container_id']:
+                entry['container_id'] = item['container_id']
+                containers.append(entry)
+            else:
+                pods.append(entry)
+
+        return {'pods': pods, 'containers': containers}
+
+    def _walk(self, dir_fd: int, path: str, depth: int, pod_uid: Optional[str], qos: Optional[str],
+              out: Dict[str, Dict[str, Any]]):
+        name = path.rsplit('/', 1)[-1]
+        qos_match = _QOS_PATTERN.search(name)
+        if qos_match:
+            qos = qos_match.group(1)
+        elif name in ('kubepods.slice', 'kubepods'):
+            qos = 'guaranteed'
+
+        container_id = None
+        pod_match = _POD_PATTERN.search(name)
+        if pod_match:
+            pod_uid = pod_match.group(1).replace('_', '-')
+        elif pod_uid:
+            container_match = _CONTAINER_PATTERN.match(name)
+            if container_match:
+                container_id = container_match.group(1)
+
+        # 只读取Pod级和容器级cgroup的统计文件，中间层级只做遍历
+        if pod_match or container_id:
+            out[path] = self._read_stats(dir_fd, pod_uid, qos, container_id)
+            if container_id:
+                return
+
+        if depth >= self.max_depth:
+            return
+        try:
+            with os.scandir(dir_fd) as entries:
+                children = [e.name for e in entries if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+
+        for child in children:
+            try:
+                child_fd = os.open(child, _DIR_FLAGS, dir_fd=dir_fd)
+            except OSError:
+                # cgroup可能在遍历过程中被删除
+                continue
+            try:
+                self._walk(child_fd, f'{path}/{child}', depth + 1, pod_uid, qos, out)
+            finally:
+                os.close(child_fd)
+
+    @staticmethod
+    def _read_stats(dir_fd: int, pod_uid: str, qos: Optional[str], container_id: Optional[str]) -> Dict[str, Any]:
+        cpu_stat = _read_at(dir_fd, 'cpu.stat')
+        memory_current = _read_at(dir_fd, 'memory.current')
+        memory_stat = _read_at(dir_fd, 'memory.stat')
+        io_stat = _read_at(dir_fd, 'io.stat')
+        try:
+            return {
+                'pod_uid': pod_uid,
+                'qos': qos,
+                'container_id': container_id,
+                'cpu': parse_flat_keyed(cpu_stat) if cpu_stat else {},
+                'memory_current': int(memory_current) if memory_current else 0,
+                'memory_stat': parse_flat_keyed(memory_stat, _MEMORY_STAT_FIELDS) if memory_stat else {},
+                'io': parse_io_stat(io_stat) if io_stat is not None else {}
+            }
+        except ValueError as e:
+            logger.debug(f"解析cgroup统计失败: {e}")
+            return {'pod_uid': pod_uid, 'qos': qos, 'container_id': container_id,
+                    'cpu': {}, 'memory_current': 0, 'memory_stat': {}, 'io': {}}
@@ -0,0 +1,96 @@
+"""
+CPU时间收集器
+一次读取 /proc/stat，对相邻两次采样的各核CPU时间求差得到各模式占比，不需要sleep等待；
+差值与百分比计算在NumPy数组上按核向量化完成，256核与8核的开销基本相同
+"""
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import psutil
+
+PROC_STAT_PATH = "/proc/stat"
+
+# /proc/stat 每行前8列的含义（guest/guest_nice已计入user/nice，不参与求和）
+CPU_MODES = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+
+_IDLE_MODES = [CPU_MODES.index('idle'), CPU_MODES.index('iowait')]
+
+
+def parse_proc_stat(content: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """解析/proc/stat中的各核行，返回 (核编号数组, 时间矩阵[核数, 8])
+
+    去掉行首的'cpu'后整块文本一次split转换为整数矩阵，第一列即为核编号。
+    """
+    lines = [line[3:] for line in content.splitlines() if line.startswith('cpu') and line[3:4].isdigit()]
+    if not lines:
+        return None
+    columns = len(lines[0].split())
+    values = np.array(' '.join(lines).split(), dtype=np.int64)
+    if values.size != columns * len(lines):
+        return None
+    matrix = values.reshape(len(lines), columns)
+    times = np.zeros((len(lines), len(CPU_MODES)), dtype=np.int64)
+    width = min(columns - 1, len(CPU_MODES))
+    times[:, :width] = matrix[:, 1:width + 1]
+    return matrix[:, 0], times
+
+
+class CpuTimesCollector:
+    """基于CPU时间增量的各核各模式使用率"""
+
+    def __init__(self, path: str = PROC_STAT_PATH):
+        self.path = path if os.path.exists(path) else None
+        self._cpu_ids: Optional[np.ndarray] = None
+        self._previous: Optional[np.ndarray] = None
+
+    def _sample(self):
+        if self.path:
+            with open(self.path) as f:
+                parsed = parse_proc_stat(f.read())
+            if parsed is not None:
+                return parsed
+        # 非Linux平台使用psutil，单位为秒
+        times = psutil.cpu_times(percpu=True)
+        matrix = np.array(
+            [[getattr(t, mode, 0.0) for mode in CPU_MODES] for t in times],
+            dtype=np.float64
+        )
+        return np.arange(len(times)), matrix
+
+    def collect(self) -> Dict[str, Any]:
+        """返回各核的总使用率与各模式占比
+
+        首次采样（或CPU热插拔后）以0为基线，得到的是开机以来的平均值。
+        """
+        cpu_ids, times = self._sample()
+        if self._previous is None or not np.array_equal(cpu_ids, self._cpu_ids):
+            previous = np.zeros_like(times)
+        else:
+            previous = self._previous
+        self._cpu_ids, self._previous = cpu_ids, times
+
+        # iowait等计数器在部分内核上可能回退，负增量按0处理
+        deltas = np.clip(times - previous, 0, None).astype(np.float64)
+        totals = deltas.sum(axis=1)
+        safe_totals = np.where(totals > 0, totals, 1.0)
+
+        per_mode = deltas / safe_totals[:, None] * 100.0
+        busy = 100.0 - per_mode[:, _IDLE_MODES].sum(axis=1)
+        busy[totals == 0] = 0.0
+
+        overall_total = totals.sum()
+        overall_modes = deltas.sum(axis=0) / (overall_total or 1.0) * 100.0
+
+        return {
+            'cpus': [f'cpu{i}' for i in cpu_ids.tolist()],
+            'per_cpu': np.round(busy, 1).tolist(),
+            'per_cpu_modes': {
+                mode: np.round(per_mode[:, i], 1).tolist() for i, mode in enumerate(CPU_MODES)
+            },
+            'modes': {
+                mode: round(float(overall_modes[i]), 1) for i, mode in enumerate(CPU_MODES)
+            },
+            'usage_percent': round(float(busy.mean()), 1) if busy.size else 0
+        }
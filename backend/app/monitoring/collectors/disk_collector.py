@@ -0,0 +1,264 @@
+"""
+磁盘使用量收集器
+- 挂载表缓存：仅在 /proc/self/mountinfo 变化时重新解析
+- 按文件系统类型/挂载点过滤，并按设备去重（忽略bind mount、容器挂载等重复项）
+- 在小线程池中逐挂载点执行statfs并设置超时，卡住的挂载点标记为stale而不阻塞收集周期
+"""
+
+import os
+import queue
+import re
+import select
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Any, Dict, List, Optional
+
+import psutil
+from loguru import logger
+
+from app.core.config import settings
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def _unescape(value: str) -> str:
+    """还原mountinfo中的八进制转义（如空格为\\040）"""
+    return _OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), value)
+
+
+def parse_mountinfo(content: str) -> List[Dict[str, str]]:
+    """解析mountinfo内容
+
+    格式：mount_id parent_id major:minor root mount_point options [optional...] - fstype source super_options
+    """
+    mounts = []
+    for line in content.splitlines():
+        fields = line.split()
+        try:
+            separator = fields.index('-')
+        except ValueError:
+            continue
+        if separator < 6 or len(fields) < separator + 3:
+            continue
+        mounts.append({
+            'dev': fields[2],
+            'root': _unescape(fields[3]),
+            'mountpoint': _unescape(fields[4]),
+            'fstype': fields[separator + 1],
+            'device': _unescape(fields[separator + 2])
+        })
+    return mounts
+
+
+class MountTable:
+    """挂载表缓存
+
+    Linux上对mountinfo调用poll，挂载表变化时内核会返回POLLPRI/POLLERR，
+    没有变化时直接复用上次解析结果；其他平台退化为每次调用psutil.disk_partitions。
+    """
+
+    def __init__(self, path: str = MOUNTINFO_PATH):
+        self._file = None
+        self._poller = None
+        self._mounts: Optional[List[Dict[str, str]]] = None
+        if os.path.exists(path) and hasattr(select, 'poll'):
+            self._file = open(path, 'rb')
+            self._poller = select.poll()
+            self._poller.register(self._file, select.POLLPRI | select.POLLERR)
+
+    def mounts(self) -> List[Dict[str, str]]:
+        """返回当前挂载表"""
+        if self._file is None:
+            return [
+                {'dev': p.device, 'root': '/', 'mountpoint': p.mountpoint, 'fstype': p.fstype, 'device': p.device}
+                for p in psutil.disk_partitions(all=True)
+            ]
+
+        if self._mounts is None or self._poller.poll(0):
+            self._file.seek(0)
+            self._mounts = parse_mountinfo(self._file.read().decode(errors='replace'))
+            logger.debug(f"🔁 挂载表已刷新，共 {len(self._mounts)} 项")
+        return self._mounts
+
+
+class StatfsPool:
+    """执行statfs的守护线程池
+
+    不使用ThreadPoolExecutor：其工作线程在解释器退出时会被join，
+    卡在网络文件系统上的statfs会导致进程无法退出。
+    工作线程执行超过stuck_after秒视为卡住，提交任务时补充新线程保证有workers个可用线程
+    （总数不超过max_workers）；卡住的线程返回后，若线程数多于workers则退出。
+    """
+
+    def __init__(self, workers: int, max_workers: int, stuck_after: float):
+        self.workers = workers
+        self.max_workers = max(workers, max_workers)
+        self.stuck_after = stuck_after
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        # 各工作线程正在执行的statfs开始时间（空闲时为None）
+        self._busy_since: Dict[int, Optional[float]] = {}
+        self._next_id = 0
+        with self._lock:
+            for _ in range(workers):
+                self._start_worker()
+
+    def submit(self, mountpoint: str) -> Future:
+        future: Future = Future()
+        self._queue.put((mountpoint, future))
+        self._replace_stuck()
+        return future
+
+    def _available(self, exclude: Optional[int] = None) -> int:
+        """未卡住的工作线程数（调用方持有锁）"""
+        deadline = time.monotonic() - self.stuck_after
+        return sum(
+            1 for worker_id, started in self._busy_since.items()
+            if worker_id != exclude and (started is None or started >= deadline)
+        )
+
+    def _replace_stuck(self):
+        with self._lock:
+            missing = min(self.workers - self._available(), self.max_workers - len(self._busy_since))
+            for _ in range(missing):
+                self._start_worker()
+            if missing > 0:
+                logger.warning(f"⚠️ statfs线程卡住，补充 {missing} 个线程（共 {len(self._busy_since)} 个）")
+
+    def _start_worker(self):
+        worker_id = self._next_id
+        self._next_id += 1
+        self._busy_since[worker_id] = None
+        threading.Thread(target=self._worker, args=(worker_id,), name=f'statfs-{worker_id}', daemon=True).start()
+
+    def _worker(self, worker_id: int):
+        while True:
+            mountpoint, future = self._queue.get()
+            self._busy_since[worker_id] = time.monotonic()
+            try:
+                future.set_result(psutil.disk_usage(mountpoint))
+            except Exception as e:
+                future.set_exception(e)
+            with self._lock:
+                # 卡住期间已补充过线程，其余可用线程已足够时本线程退出
+                if self._available(exclude=worker_id) >= self.workers:
+                    del self._busy_since[worker_id]
+                    return
+                self._busy_since[worker_id] = None
+
+
+class DiskUsageCollector:
+    """带过滤、去重和超时保护的磁盘使用量收集器"""
+
+    def __init__(self):
+        self.mount_table = MountTable()
+        self.fstype_include = set(settings.DISK_FSTYPE_INCLUDE)
+        self.fstype_exclude = set(settings.DISK_FSTYPE_EXCLUDE)
+        self.mountpoint_include = re.compile(settings.DISK_MOUNTPOINT_INCLUDE) if settings.DISK_MOUNTPOINT_INCLUDE else None
+        self.mountpoint_exclude = re.compile(settings.DISK_MOUNTPOINT_EXCLUDE) if settings.DISK_MOUNTPOINT_EXCLUDE else None
+        self.timeout = settings.DISK_STATFS_TIMEOUT
+        self._pool = StatfsPool(settings.DISK_STATFS_WORKERS, settings.DISK_STATFS_MAX_WORKERS, self.timeout)
+        # 仍在执行中的statfs（可能卡在网络文件系统上），完成前不会重复提交
+        self._pending: Dict[str, Future] = {}
+        # 每个挂载点最近一次成功的结果及时间
+        self._last_usage: Dict[str, Dict[str, Any]] = {}
+        self._last_success: Dict[str, float] = {}
+
+    def select_mounts(self) -> List[Dict[str, str]]:
+        """过滤挂载表并按设备去重"""
+        selected: Dict[str, Dict[str, str]] = {}
+        for mount in self.mount_table.mounts():
+            # 根分区始终采集（容器内的根通常是overlay）
+            if mount['mountpoint'] != '/' and not self._included(mount):
+                continue
+
+            # 同一设备只保留一次：优先文件系统根目录的挂载，其次挂载点路径最短的
+            current = selected.get(mount['dev'])
+            if current is None or self._prefer(mount, current):
+                selected[mount['dev']] = mount
+        return list(selected.values())
+
+    def _included(self, mount: Dict[str, str]) -> bool:
+        if self.fstype_include and mount['fstype'] not in self.fstype_include:
+            return False
+        if mount['fstype'] in self.fstype_exclude:
+            return False
+        if self.mountpoint_include and not self.mountpoint_include.search(mount['mountpoint']):
+            return False
+        if self.mountpoint_exclude and self.mountpoint_exclude.search(mount['mountpoint']):
+            return False
+        return True
+
+    @staticmethod
+    def _prefer(candidate: Dict[str, str], current: Dict[str, str]) -> bool:
+        if current['mountpoint'] == '/':
+            return False
+        if candidate['mountpoint'] == '/':
+            return True
+        if (candidate['root'] == '/') != (current['root'] == '/'):
+            return candidate['root'] == '/'
+        return len(candidate['mountpoint']) < len(current['mountpoint'])
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """并行采集各挂载点使用量，超时的挂载点返回上次结果并标记stale"""
+        mounts = self.select_mounts()
+
+        submitted = []
+        for mount in mounts:
+            mountpoint = mount['mountpoint']
+            future = self._pending.get(mountpoint)
+            if future is None or future.done():
+                future = self._pool.submit(mountpoint)
+                self._pending[mountpoint] = future
+                submitted.append(future)
+
+        # 只等待本周期提交的statfs，之前已卡住的挂载点不再占用等待时间
+        wait(submitted, timeout=self.timeout)
+
+        now = time.time()
+        partitions = []
+        for mount in mounts:
+            mountpoint = mount['mountpoint']
+            future = self._pending[mountpoint]
+            stale = not future.done()
+
+            if not stale:
+                del self._pending[mountpoint]
+                try:
+                    self._last_usage[mountpoint] = future.result()._asdict()
+                    self._last_success[mountpoint] = now
+                except OSError as e:
+                    # 无权限或已卸载的挂载点直接跳过
+                    logger.debug(f"跳过挂载点 {mountpoint}: {e}")
+                    self._last_usage.pop(mountpoint, None)
+                    continue
+            else:
+                logger.warning(f"⚠️ 挂载点 {mountpoint} statfs超过 {self.timeout}s 未返回，标记为stale")
+
+            usage = self._last_usage.get(mountpoint)
+            if usage is None:
+                continue
+            partitions.append({
+                'device': mount['device'],
+                'mountpoint': mountpoint,
+                'fstype': mount['fstype'],
+                'usage': usage,
+                'stale': stale,
+                'updated_at': self._last_success.get(mountpoint)
+            })
+
+        self._forget_unmounted({m['mountpoint'] for m in mounts})
+        return partitions
+
+    def _forget_unmounted(self, mountpoints):
+        """清理已卸载挂载点的缓存（仍在执行的statfs保留，避免重复提交）"""
+        for mountpoint in list(self._last_usage):
+            if mountpoint not in mountpoints:
+                self._last_usage.pop(mountpoint, None)
+                self._last_success.pop(mountpoint, None)
+        for mountpoint, future in list(self._pending.items()):
+            if mountpoint not in mountpoints and future.done():
+                del self._pending[mountpoint]
@@ -0,0 +1,225 @@
+"""
+独立进程模式的系统资源收集器
+收集器运行在子进程中，通过 multiprocessing.shared_memory 以seqlock方式发布快照（定长头部+负载），
+API进程无锁读取（直接从共享内存解析，不复制负载）；子进程退出或卡死时由监督者自动重启。
+"""
+
+import json
+import multiprocessing
+import os
+import struct
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Optional
+
+import orjson
+from loguru import logger
+
+from app.core.config import settings
+
+# 头部：seq(偶数=稳定，奇数=写入中)、generation、采集时间戳、负载长度、写入者pid
+_HEADER = struct.Struct('<QQdII')
+_PAYLOAD_OFFSET = _HEADER.size
+
+_READ_RETRIES = 100
+
+
+class SeqlockSnapshotBuffer:
+    """共享内存中的seqlock快照缓冲区（单写者，多读者）
+
+    写者在写入前后各递增一次seq；读者读取前后seq一致且为偶数时数据才有效，
+    否则重试。读者不加锁，在seq检查窗口内直接从共享内存视图解析（orjson支持memoryview），
+    不复制负载；每个新generation仍要付出一次完整解析的开销，同一generation只解析一次。
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.capacity = shm.size - _PAYLOAD_OFFSET
+        self._buf = shm.buf
+        self._cached_generation = 0
+        self._cached_snapshot: Dict[str, Any] = {}
+
+    @classmethod
+    def create(cls, size: int) -> 'SeqlockSnapshotBuffer':
+        """创建共享内存（API进程）"""
+        shm = SharedMemory(create=True, size=size)
+        shm.buf[:_PAYLOAD_OFFSET] = bytes(_PAYLOAD_OFFSET)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'SeqlockSnapshotBuffer':
+        """连接已有共享内存（收集器子进程）"""
+        # spawn子进程与父进程共用同一个resource_tracker，由父进程负责unlink
+        return cls(SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, snapshot: Dict[str, Any]):
+        """写入快照（仅收集器子进程调用）"""
+        payload = json.dumps(snapshot, default=str).encode()
+        if len(payload) > self.capacity:
+            logger.error(f"❌ 快照大小 {len(payload)} 超出共享内存容量 {self.capacity}，本周期跳过发布")
+            return
+
+        buf = self._buf
+        seq, generation, _, _, _ = _HEADER.unpack_from(buf, 0)
+        if seq & 1:
+            # 上一个写者在临界区内被杀死，从下一个偶数继续
+            seq += 1
+        # 进入写临界区：seq变为奇数
+        struct.pack_into('<Q', buf, 0, seq + 1)
+        buf[_PAYLOAD_OFFSET:_PAYLOAD_OFFSET + len(payload)] = payload
+        _HEADER.pack_into(
+            buf, 0, seq + 2, generation + 1, snapshot.get('timestamp', time.time()), len(payload), os.getpid()
+        )
+
+    def generation(self) -> int:
+        """当前已发布的快照代数"""
+        return _HEADER.unpack_from(self._buf, 0)[1]
+
+    def read(self) -> Dict[str, Any]:
+        """读取完整快照；generation未变化时直接返回已解析的对象"""
+        generation = self.generation()
+        if generation == self._cached_generation:
+            return self._cached_snapshot
+
+        stable = self._read_stable(self._read_payload)
+        if stable is None:
+            # 写者可能在临界区内退出，返回上一份完整快照，等待监督者重启写者
+            return self._cached_snapshot
+
+        header, snapshot = stable
+        if header[1] and snapshot is not None:
+            self._cached_snapshot = snapshot
+            self._cached_generation = header[1]
+        return self._cached_snapshot
+
+    def _read_payload(self) -> Optional[Dict[str, Any]]:
+        """在seqlock窗口内解析负载；写者并发写入导致的残缺数据由随后的seq检查丢弃"""
+        length = _HEADER.unpack_from(self._buf, 0)[3]
+        if not length:
+            return None
+        with self._buf[_PAYLOAD_OFFSET:_PAYLOAD_OFFSET + min(length, self.capacity)] as view:
+            try:
+                return orjson.loads(view)
+            except orjson.JSONDecodeError:
+                return None
+
+    def _read_stable(self, reader):
+        """seqlock读：前后seq一致且为偶数才返回，重试耗尽时返回None"""
+        for _ in range(_READ_RETRIES):
+            header = _HEADER.unpack_from(self._buf, 0)
+            if header[0] & 1:
+                continue
+            value = reader()
+            if struct.unpack_from('<Q', self._buf, 0)[0] == header[0]:
+                return header, value
+        return None
+
+    def close(self):
+        """释放映射；API进程同时删除共享内存"""
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _run_collector_process(shm_name: str, interval: float):
+    """收集器子进程入口"""
+    from app.monitoring.collectors.system_collector import SystemCollector
+
+    buffer = SeqlockSnapshotBuffer.attach(shm_name)
+    collector = SystemCollector()
+    parent_pid = os.getppid()
+    logger.info(f"🔄 收集器子进程 {os.getpid()} 已启动")
+
+    try:
+        # 父进程退出后子进程随之退出
+        while os.getppid() == parent_pid:
+            started = time.monotonic()
+            try:
+                buffer.write(collector.collect_snapshot())
+            except Exception as e:
+                logger.error(f"❌ 收集器子进程采集失败: {e}")
+            # 与线程模式一致按固定节拍采集，超时的周期顺延到下一个节拍
+            collector.record_cycle(time.monotonic() - started)
+            time.sleep(interval - (time.monotonic() - started) % interval)
+    finally:
+        buffer.close()
+
+
+class CollectorProcess:
+    """收集器子进程的监督者
+
+    负责启动子进程、检测其退出或卡死（快照长时间未更新）并重启。
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stall_timeout = max(settings.COLLECTOR_STALL_TIMEOUT, interval * 3)
+        self.buffer: Optional[SeqlockSnapshotBuffer] = None
+        self.process: Optional[multiprocessing.Process] = None
+        self.restarts = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._last_generation = 0
+        self._last_progress = 0.0
+
+    def start(self):
+        """创建共享内存并启动子进程"""
+        if self.buffer is None:
+            self.buffer = SeqlockSnapshotBuffer.create(settings.COLLECTOR_SHM_SIZE)
+        self._spawn()
+
+    def _spawn(self):
+        self.process = self._context.Process(
+            target=_run_collector_process,
+            args=(self.buffer.name, self.interval),
+            name='system-collector',
+            daemon=True
+        )
+        self.process.start()
+        self._last_progress = time.monotonic()
+
+    def supervise(self):
+        """检查子进程状态，必要时重启"""
+        if self.process is None:
+            return
+
+        generation = self.buffer.generation()
+        now = time.monotonic()
+        if generation != self._last_generation:
+            self._last_generation = generation
+            self._last_progress = now
+
+        if not self.process.is_alive():
+            logger.warning(f"⚠️ 收集器子进程已退出（exitcode={self.process.exitcode}），正在重启")
+        elif now - self._last_progress > self.stall_timeout:
+            logger.warning(f"⚠️ 收集器子进程 {self.stall_timeout:.0f}s 未产出快照，判定卡死并重启")
+            self.process.kill()
+            self.process.join(timeout=5)
+        else:
+            return
+
+        self.restarts += 1
+        self._spawn()
+
+    def read(self) -> Dict[str, Any]:
+        """读取最新快照"""
+        if self.buffer is None:
+            return {}
+        return self.buffer.read()
+
+    def stop(self):
+        """停止子进程并释放共享内存"""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.kill()
+            self.process = None
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
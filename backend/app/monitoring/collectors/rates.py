@@ -0,0 +1,64 @@
+"""
+计数器增量与速率计算
+在采集时根据前后两次内核计数器计算速率，处理计数器回绕与设备热插拔
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+# /proc/diskstats 等部分字段在32位内核或旧驱动上是32位计数器
+_WRAP_32 = 2 ** 32
+_WRAP_64 = 2 ** 64
+
+
+def counter_delta(previous: int, current: int) -> int:
+    """计算两次计数器采样的增量
+
+    current < previous 时：若按32/64位回绕解释得到的增量小于回绕宽度的一半则视为回绕，
+    否则视为计数器重置（设备重建、驱动重载），增量取current。
+    """
+    if current >= previous:
+        return current - previous
+    for width in (_WRAP_32, _WRAP_64):
+        if previous < width:
+            wrapped = width - previous + current
+            if wrapped < width // 2:
+                return wrapped
+    return current
+
+
+class CounterRateTracker:
+    """按设备/网卡保存上一次计数器采样，计算本周期的增量和经过时间"""
+
+    def __init__(self):
+        self._previous: Dict[str, Dict[str, int]] = {}
+        self._previous_time: Optional[float] = None
+
+    def update(
+        self,
+        samples: Dict[str, Dict[str, int]],
+        timestamp: Optional[float] = None
+    ) -> Tuple[Dict[str, Dict[str, int]], float]:
+        """记录新采样
+
+        返回 (增量, 经过秒数)。新出现的设备本周期只建立基线，不出现在增量中；
+        消失的设备直接丢弃其基线，重新出现时从头建立。
+        """
+        now = timestamp if timestamp is not None else time.monotonic()
+        elapsed = now - self._previous_time if self._previous_time is not None else 0.0
+
+        deltas: Dict[str, Dict[str, int]] = {}
+        if elapsed > 0:
+            for key, counters in samples.items():
+                previous = self._previous.get(key)
+                if previous is None:
+                    continue
+                deltas[key] = {
+                    field: counter_delta(previous[field], value)
+                    for field, value in counters.items()
+                    if field in previous
+                }
+
+        self._previous = {key: dict(counters) for key, counters in samples.items()}
+        self._previous_time = now
+        return deltas, elapsed
@@ -3,278 +3,677 @@
 使用psutil收集CPU、内存、磁盘、网络等系统指标
 """
 
+import os
+import re
 import psutil
 import threading
 import time
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional
 from loguru import logger
+from prometheus_client import REGISTRY
+from starlette.concurrency import run_in_threadpool
 
 from app.monitoring.metrics import system_metrics
+from app.monitoring.cardinality import series_guard
+from app.monitoring.collectors.process_collector import CollectorProcess
+from app.monitoring.collectors.disk_collector import DiskUsageCollector
+from app.monitoring.collectors.rates import CounterRateTracker
+from app.monitoring.collectors.cpu_collector import CpuTimesCollector
+from app.monitoring.collectors.socket_collector import SocketStatsCollector
+from app.monitoring.collectors.cgroup_collector import CgroupCollector
+from app.monitoring.multiprocess import (
+    is_multiprocess_mode, mark_process_dead, LeaderElection, SharedSnapshotStore, SnapshotAgeCollector
+)
 from app.core.config import settings
 
+# 快照中的子系统：(快照字段, 日志中的名称, 采集方法)
+SUBSYSTEMS = (
+    ('cpu', 'CPU', '_collect_cpu_metrics'),
+    ('memory', '内存', '_collect_memory_metrics'),
+    ('disk', '磁盘', '_collect_disk_metrics'),
+    ('network', '网络', '_collect_network_metrics'),
+    ('processes', '进程', '_collect_process_metrics'),
+    ('cgroups', 'cgroup', '_collect_cgroup_metrics'),
+    ('system_info', '系统信息', '_collect_system_info'),
+)
+
 
 class SystemCollector:
-    """系统资源收集器"""
-    
+    """系统资源收集器
+
+    每个收集周期生成一份系统快照并据此更新Prometheus指标；
+    API请求直接读取最近一次快照，不再现场调用psutil。
+    多进程部署时通过文件锁选举出唯一的主收集器，其余worker读取共享快照。
+    COLLECTOR_MODE=process 时采集在独立子进程中进行，本线程只负责监督子进程和导出指标。
+    """
+
     def __init__(self):
         self.running = False
         self.collector_thread = None
         self.interval = settings.COLLECTION_INTERVAL
-        
+        self.mode = settings.COLLECTOR_MODE
+        self.collector_process: Optional[CollectorProcess] = None
+        self._stop_event = threading.Event()
+        self._disk_collector: Optional[DiskUsageCollector] = None
+        self._snapshot: Dict[str, Any] = {}
+        # 内核计数器上次导出的值，用于按增量累加Counter：(指标名, 标签值) -> (计数器值, 是否汇入溢出序列)
+        self._exported_counters: Dict[tuple, tuple] = {}
+        # 本周期导出过的计数器
+        self._counters_seen: set = set()
+        # 采集时计算速率所需的上一轮计数器
+        self._disk_io_tracker = CounterRateTracker()
+        self._network_tracker = CounterRateTracker()
+        self.cpu_collector = CpuTimesCollector()
+        self.socket_collector = SocketStatsCollector()
+        self.cgroup_collector = CgroupCollector() if settings.CGROUP_COLLECTION_ENABLED else None
+        self._disk_io_exclude = re.compile(settings.DISK_IO_DEVICE_EXCLUDE) if settings.DISK_IO_DEVICE_EXCLUDE else None
+        # 采集自身的累计统计，随快照发布，任一worker都能读到主收集器的数据
+        self._stats: Dict[str, Any] = {'cycles': 0, 'overruns': 0, 'skipped_cycles': 0, 'errors': {}}
+        # 上一周期因超时跳过的周期数，随下一份快照发布
+        self._pending_skipped = 0
+        # 最近一次所有子系统都成功的采集完成时间
+        self._last_success_at: Optional[float] = None
+
+        self.multiprocess = is_multiprocess_mode()
+        self.election = LeaderElection() if self.multiprocess else None
+        self.snapshot_store = SharedSnapshotStore() if self.multiprocess else None
+
+    @property
+    def disk_collector(self) -> DiskUsageCollector:
+        """磁盘收集器（首次采集时创建，避免不采集的worker也持有线程池）"""
+        if self._disk_collector is None:
+            self._disk_collector = DiskUsageCollector()
+        return self._disk_collector
+
+    @property
+    def is_leader(self) -> bool:
+        """当前进程是否负责主机指标采集"""
+        return self.running and (self.election is None or self.election.is_leader)
+
     def start(self):
         """启动收集器"""
         if self.running:
             return
-            
+
         self.running = True
-        self.collector_thread = threading.Thread(target=self._collect_loop, daemon=True)
+        self._stop_event.clear()
+        self.collector_thread = threading.Thread(target=self._collect_loop, name='system-collector', daemon=True)
         self.collector_thread.start()
         logger.info("🔄 系统资源收集器已启动")
-        
+
     def stop(self):
         """停止收集器"""
         self.running = False
+        self._stop_event.set()
         if self.collector_thread:
             self.collector_thread.join()
+        if self.collector_process:
+            self.collector_process.stop()
+            self.collector_process = None
+        if self.election:
+            self.election.release()
+            mark_process_dead(os.getpid())
         logger.info("⏹️ 系统资源收集器已停止")
-        
+
     def _collect_loop(self):
         """收集循环"""
         while self.running:
+            started = time.monotonic()
             try:
-                self._collect_cpu_metrics()
-                self._collect_memory_metrics()
-                self._collect_disk_metrics()
-                self._collect_network_metrics()
-                self._collect_process_metrics()
-                self._collect_system_info()
-                
-                time.sleep(self.interval)
+                if self._acquire_leadership():
+                    snapshot = self._next_snapshot()
+                    if snapshot:
+                        self._timed('publish', self._publish_snapshot, snapshot)
+                        self._timed('export', self._update_metrics, snapshot)
+                        if self.mode != 'process':
+                            self.record_cycle(time.monotonic() - started)
             except Exception as e:
+                system_metrics.collector_errors_total.labels(subsystem='cycle').inc()
                 logger.error(f"❌ 收集系统指标时出错: {e}")
-                time.sleep(self.interval)
-    
-    def _collect_cpu_metrics(self):
-        """收集CPU指标"""
+            # 子进程模式下以更短的周期监督子进程并转发新快照；
+            # 线程模式下按固定节拍采集，超时的周期顺延到下一个节拍（计入skipped_cycles）
+            if self.mode == 'process':
+                self._stop_event.wait(min(self.interval, 1))
+            else:
+                self._stop_event.wait(self.interval - (time.monotonic() - started) % self.interval)
+
+    def record_cycle(self, cycle_seconds: float):
+        """按整个周期（采集、发布、导出）的耗时统计超时与跳过的周期
+
+        快照在周期结束前已发布，跳过的周期数随下一份快照发布并导出。
+        """
+        skipped = int(cycle_seconds // self.interval)
+        if not skipped:
+            return
+        self._stats['overruns'] += 1
+        self._stats['skipped_cycles'] += skipped
+        self._pending_skipped += skipped
+        logger.warning(f"⚠️ 采集周期耗时 {cycle_seconds:.2f}s 超过收集间隔 {self.interval}s，跳过 {skipped} 个周期")
+
+    @staticmethod
+    def _timed(subsystem: str, fn, *args):
+        """执行并记录耗时（用于采集之外的发布、导出阶段）"""
+        started = time.perf_counter()
         try:
-            # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1, percpu=True)
-            for i, percent in enumerate(cpu_percent):
-                system_metrics.cpu_usage_percent.labels(cpu=f'cpu{i}', mode='total').set(percent)
-            
-            # CPU负载平均值
-            load_avg = psutil.getloadavg()
-            periods = ['1min', '5min', '15min']
-            for period, load in zip(periods, load_avg):
-                system_metrics.cpu_load_avg.labels(period=period).set(load)
-                
-        except Exception as e:
-            logger.error(f"❌ 收集CPU指标失败: {e}")
-    
-    def _collect_memory_metrics(self):
+            return fn(*args)
+        finally:
+            system_metrics.collector_subsystem_duration_seconds.labels(subsystem=subsystem).observe(
+                time.perf_counter() - started
+            )
+
+    def _next_snapshot(self) -> Optional[Dict[str, Any]]:
+        """获取本周期的新快照，子进程模式下无新快照时返回None"""
+        if self.mode != 'process':
+            return self.collect_snapshot()
+
+        if self.collector_process is None:
+            self.collector_process = CollectorProcess(self.interval)
+            self.collector_process.start()
+        self.collector_process.supervise()
+
+        snapshot = self.collector_process.read()
+        return snapshot if snapshot is not self._snapshot else None
+
+    def _acquire_leadership(self) -> bool:
+        """单进程模式下始终采集；多进程模式下只有主收集器采集"""
+        if self.election is None:
+            return True
+        if self.election.is_leader:
+            return True
+        if not self.election.try_acquire():
+            return False
+
+        # 接管时以上一任主收集器最后的快照作为计数器基线，避免Counter重复累加
+        previous = self.snapshot_store.read()
+        self._last_success_at = previous.get('collector', {}).get('last_success_at')
+        for interface, io in previous.get('network', {}).get('interfaces', {}).items():
+            for key, (metric, direction) in NETWORK_COUNTERS.items():
+                if key in io:
+                    self._exported_counters[_counter_key(metric, interface=interface, direction=direction)] = (io[key], False)
+        for device, io in previous.get('disk', {}).get('io_counters', {}).items():
+            for key, operation in DISK_COUNTERS.items():
+                if key in io:
+                    self._exported_counters[_counter_key(
+                        system_metrics.disk_io_total, device=device, operation=operation
+                    )] = (io[key], False)
+        return True
+
+    def _publish_snapshot(self, snapshot: Dict[str, Any]):
+        """发布最新快照"""
+        self._snapshot = snapshot
+        if self.snapshot_store:
+            self.snapshot_store.write(snapshot)
+
+    def collect_snapshot(self) -> Dict[str, Any]:
+        """执行一次完整采集，返回系统快照
+
+        各子系统单独计时，失败时记录错误并以空字典代替，不影响其他子系统；
+        本周期的耗时、失败的子系统及累计统计写入快照的collector字段。
+        """
+        timestamp = time.time()
+        started = time.perf_counter()
+        snapshot: Dict[str, Any] = {
+            # 快照代数：采集时刻的毫秒时间戳，多进程共享及主收集器切换后仍单调递增，用作ETag
+            'generation': int(timestamp * 1000),
+            'timestamp': timestamp
+        }
+        durations: Dict[str, float] = {}
+        errors = []
+        for subsystem, name, method in SUBSYSTEMS:
+            subsystem_started = time.perf_counter()
+            try:
+                snapshot[subsystem] = getattr(self, method)()
+            except Exception as e:
+                logger.error(f"❌ 收集{name}指标失败: {e}")
+                snapshot[subsystem] = {}
+                errors.append(subsystem)
+            durations[subsystem] = time.perf_counter() - subsystem_started
+
+        cycle_seconds = time.perf_counter() - started
+        stats = self._stats
+        stats['cycles'] += 1
+        for subsystem in errors:
+            stats['errors'][subsystem] = stats['errors'].get(subsystem, 0) + 1
+        # 只有所有子系统都成功的周期才更新成功时间
+        if not errors:
+            self._last_success_at = timestamp + cycle_seconds
+        skipped, self._pending_skipped = self._pending_skipped, 0
+
+        snapshot['collector'] = {
+            'completed_at': timestamp + cycle_seconds,
+            'last_success_at': self._last_success_at,
+            'cycle_seconds': cycle_seconds,
+            'durations': durations,
+            'errors': errors,
+            'skipped_cycles': skipped,
+            'totals': {**stats, 'errors': dict(stats['errors'])}
+        }
+        return snapshot
+
+    def _collect_cpu_metrics(self) -> Dict[str, Any]:
+        """收集CPU指标"""
+        # 与上次采样的CPU时间求差，不阻塞等待
+        cpu = self.cpu_collector.collect()
+        cpu['load_avg'] = psutil.getloadavg()
+        cpu['count'] = psutil.cpu_count()
+        return cpu
+
+    def _collect_memory_metrics(self) -> Dict[str, Any]:
         """收集内存指标"""
-        try:
-            # 虚拟内存
-            virtual_memory = psutil.virtual_memory()
-            system_metrics.memory_usage_bytes.labels(type='total').set(virtual_memory.total)
-            system_metrics.memory_usage_bytes.labels(type='available').set(virtual_memory.available)
-            system_metrics.memory_usage_bytes.labels(type='used').set(virtual_memory.used)
-            system_metrics.memory_usage_bytes.labels(type='free').set(virtual_memory.free)
-            
-            system_metrics.memory_usage_percent.labels(type='virtual').set(virtual_memory.percent)
-            
-            # 交换内存
-            swap_memory = psutil.swap_memory()
-            system_metrics.memory_usage_bytes.labels(type='swap_total').set(swap_memory.total)
-            system_metrics.memory_usage_bytes.labels(type='swap_used').set(swap_memory.used)
-            system_metrics.memory_usage_bytes.labels(type='swap_free').set(swap_memory.free)
-            
-            system_metrics.memory_usage_percent.labels(type='swap').set(swap_memory.percent)
-            
-        except Exception as e:
-            logger.error(f"❌ 收集内存指标失败: {e}")
-    
-    def _collect_disk_metrics(self):
+        return {
+            'virtual': psutil.virtual_memory()._asdict(),
+            'swap': psutil.swap_memory()._asdict()
+        }
+
+    def _collect_disk_metrics(self) -> Dict[str, Any]:
         """收集磁盘指标"""
-        try:
-            # 磁盘使用情况
-            disk_usage = psutil.disk_usage('/')
-            system_metrics.disk_usage_bytes.labels(
-                device='root', mountpoint='/', type='total'
-            ).set(disk_usage.total)
-            system_metrics.disk_usage_bytes.labels(
-                device='root', mountpoint='/', type='used'
-            ).set(disk_usage.used)
-            system_metrics.disk_usage_bytes.labels(
-                device='root', mountpoint='/', type='free'
-            ).set(disk_usage.free)
-            
-            system_metrics.disk_usage_percent.labels(
-                device='root', mountpoint='/'
-            ).set(disk_usage.percent)
-            
-            # 所有磁盘分区
-            for partition in psutil.disk_partitions():
-                try:
-                    partition_usage = psutil.disk_usage(partition.mountpoint)
-                    device = partition.device.replace('/', '_')
-                    mountpoint = partition.mountpoint
-                    
-                    system_metrics.disk_usage_bytes.labels(
-                        device=device, mountpoint=mountpoint, type='total'
-                    ).set(partition_usage.total)
-                    system_metrics.disk_usage_bytes.labels(
-                        device=device, mountpoint=mountpoint, type='used'
-                    ).set(partition_usage.used)
-                    system_metrics.disk_usage_bytes.labels(
-                        device=device, mountpoint=mountpoint, type='free'
-                    ).set(partition_usage.free)
-                    
-                    system_metrics.disk_usage_percent.labels(
-                        device=device, mountpoint=mountpoint
-                    ).set(partition_usage.percent)
-                    
-                except PermissionError:
-                    # 跳过无权限访问的分区
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"❌ 收集磁盘指标失败: {e}")
-    
-    def _collect_network_metrics(self):
+        partitions = self.disk_collector.collect()
+        root = next((p['usage'] for p in partitions if p['mountpoint'] == '/'), {})
+        io_counters, io_rates = self._collect_disk_io()
+
+        return {
+            'root': root,
+            'partitions': partitions,
+            'io_counters': io_counters,
+            'io_rates': io_rates
+        }
+
+    def _collect_disk_io(self):
+        """采集各块设备IO计数器，并根据上一轮采样计算速率、利用率和平均延迟"""
+        io_counters = {
+            device: {
+                'read_count': io.read_count,
+                'write_count': io.write_count,
+                'read_bytes': io.read_bytes,
+                'write_bytes': io.write_bytes,
+                'read_time': io.read_time,
+                'write_time': io.write_time,
+                # Linux上为diskstats的io_ticks（设备忙碌毫秒数）
+                'busy_time': getattr(io, 'busy_time', 0)
+            }
+            for device, io in (psutil.disk_io_counters(perdisk=True) or {}).items()
+            if not (self._disk_io_exclude and self._disk_io_exclude.match(device))
+        }
+
+        deltas, elapsed = self._disk_io_tracker.update(io_counters)
+        io_rates = {}
+        for device, delta in deltas.items():
+            io_rates[device] = {
+                'read_bytes_per_sec': delta['read_bytes'] / elapsed,
+                'write_bytes_per_sec': delta['write_bytes'] / elapsed,
+                'read_ops_per_sec': delta['read_count'] / elapsed,
+                'write_ops_per_sec': delta['write_count'] / elapsed,
+                'utilization_percent': min(100.0, delta['busy_time'] / (elapsed * 1000) * 100),
+                'read_latency_ms': delta['read_time'] / delta['read_count'] if delta['read_count'] else 0.0,
+                'write_latency_ms': delta['write_time'] / delta['write_count'] if delta['write_count'] else 0.0
+            }
+        return io_counters, io_rates
+
+    def _collect_network_metrics(self) -> Dict[str, Any]:
         """收集网络指标"""
-        try:
-            # 网络IO统计
-            net_io = psutil.net_io_counters(pernic=True)
-            for interface, io in net_io.items():
-                system_metrics.network_bytes_total.labels(
-                    interface=interface, direction='sent'
-                )._value._value = io.bytes_sent
-                
-                system_metrics.network_bytes_total.labels(
-                    interface=interface, direction='recv'
-                )._value._value = io.bytes_recv
-                
-                system_metrics.network_packets_total.labels(
-                    interface=interface, direction='sent'
-                )._value._value = io.packets_sent
-                
-                system_metrics.network_packets_total.labels(
-                    interface=interface, direction='recv'
-                )._value._value = io.packets_recv
-                
-        except Exception as e:
-            logger.error(f"❌ 收集网络指标失败: {e}")
-    
-    def _collect_process_metrics(self):
+        interfaces = {
+            interface: {
+                'bytes_sent': io.bytes_sent,
+                'bytes_recv': io.bytes_recv,
+                'packets_sent': io.packets_sent,
+                'packets_recv': io.packets_recv
+            }
+            for interface, io in psutil.net_io_counters(pernic=True).items()
+        }
+
+        deltas, elapsed = self._network_tracker.update(interfaces)
+        rates = {
+            interface: {f'{key}_per_sec': value / elapsed for key, value in delta.items()}
+            for interface, delta in deltas.items()
+        }
+        rates_total = {}
+        for rate in rates.values():
+            for key, value in rate.items():
+                rates_total[key] = rates_total.get(key, 0.0) + value
+
+        # 连接数来自sockstat/inet_diag汇总，完整连接列表只通过管理员接口按需获取
+        sockets = self.socket_collector.collect()
+
+        return {
+            'io_counters': psutil.net_io_counters()._asdict(),
+            'interfaces': interfaces,
+            'rates': rates,
+            'rates_total': rates_total,
+            'connections': sockets['total'],
+            'sockets': sockets
+        }
+
+    def _collect_process_metrics(self) -> Dict[str, Any]:
         """收集进程指标"""
-        try:
-            # 进程统计
-            process_count = len(psutil.pids())
-            system_metrics.process_count.labels(state='total').set(process_count)
-            
-            # 按状态统计进程
-            running_count = 0
-            sleeping_count = 0
-            zombie_count = 0
-            
-            for proc in psutil.process_iter(['status']):
-                try:
-                    status = proc.info['status']
-                    if status == psutil.STATUS_RUNNING:
-                        running_count += 1
-                    elif status == psutil.STATUS_SLEEPING:
-                        sleeping_count += 1
-                    elif status == psutil.STATUS_ZOMBIE:
-                        zombie_count += 1
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            
-            system_metrics.process_count.labels(state='running').set(running_count)
-            system_metrics.process_count.labels(state='sleeping').set(sleeping_count)
-            system_metrics.process_count.labels(state='zombie').set(zombie_count)
-            
-        except Exception as e:
-            logger.error(f"❌ 收集进程指标失败: {e}")
-    
-    def _collect_system_info(self):
+        # 一次遍历同时完成状态统计和CPU排行
+        states = {'running': 0, 'sleeping': 0, 'zombie': 0}
+        processes = []
+
+        for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent']):
+            info = proc.info
+            status = info['status']
+            if status == psutil.STATUS_RUNNING:
+                states['running'] += 1
+            elif status == psutil.STATUS_SLEEPING:
+                states['sleeping'] += 1
+            elif status == psutil.STATUS_ZOMBIE:
+                states['zombie'] += 1
+            processes.append(info)
+
+        top_cpu = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:10]
+
+        return {
+            'count': len(processes),
+            'states': states,
+            'top_cpu': [
+                {
+                    'pid': p['pid'],
+                    'name': p['name'],
+                    'cpu_percent': p['cpu_percent']
+                }
+                for p in top_cpu
+            ]
+        }
+
+    def _collect_cgroup_metrics(self) -> Dict[str, Any]:
+        """收集Pod/容器资源使用（cgroup v2）"""
+        if self.cgroup_collector is None:
+            return {}
+        return self.cgroup_collector.collect()
+
+    def _collect_system_info(self) -> Dict[str, Any]:
         """收集系统信息"""
+        # 系统信息
+        uname = psutil.os.uname()
+
+        # 获取处理器信息，Linux系统使用machine字段
+        processor_info = 'unknown'
         try:
-            # 系统信息
-            uname = psutil.os.uname()
-            
-            # 获取处理器信息，Linux系统使用machine字段
+            if hasattr(uname, 'processor'):
+                processor_info = uname.processor
+            else:
+                # Linux系统使用machine字段作为处理器架构信息
+                processor_info = uname.machine
+        except:
             processor_info = 'unknown'
-            try:
-                if hasattr(uname, 'processor'):
-                    processor_info = uname.processor
-                else:
-                    # Linux系统使用machine字段作为处理器架构信息
-                    processor_info = uname.machine
-            except:
-                processor_info = 'unknown'
-            
-            system_metrics.system_info.info({
-                'system': uname.sysname,
-                'node': uname.nodename,
-                'release': uname.release,
-                'version': uname.version,
-                'machine': uname.machine,
-                'processor': processor_info,
-                'boot_time': str(psutil.boot_time()),
-                'cpu_count': str(psutil.cpu_count()),
-                'cpu_count_logical': str(psutil.cpu_count(logical=True))
-            })
-            
-        except Exception as e:
-            logger.error(f"❌ 收集系统信息失败: {e}")
-    
+
+        return {
+            'system': uname.sysname,
+            'node': uname.nodename,
+            'release': uname.release,
+            'version': uname.version,
+            'machine': uname.machine,
+            'processor': processor_info,
+            'boot_time': str(psutil.boot_time()),
+            'cpu_count': str(psutil.cpu_count()),
+            'cpu_count_logical': str(psutil.cpu_count(logical=True))
+        }
+
+    def _update_metrics(self, snapshot: Dict[str, Any]):
+        """根据快照更新Prometheus指标"""
+        self._export_cpu_metrics(snapshot.get('cpu', {}))
+        self._export_memory_metrics(snapshot.get('memory', {}))
+        self._export_disk_metrics(snapshot.get('disk', {}))
+        self._export_network_metrics(snapshot.get('network', {}))
+        self._export_process_metrics(snapshot.get('processes', {}))
+        self._export_cgroup_metrics(snapshot.get('cgroups', {}))
+
+        if snapshot.get('system_info'):
+            system_metrics.system_info.info(snapshot['system_info'])
+        self._export_collector_metrics(snapshot.get('collector', {}))
+
+        # 移除长期未出现的序列并更新基数统计，同时丢弃已移除序列的计数器基线
+        for key in series_guard.end_cycle():
+            self._exported_counters.pop(key, None)
+        # 汇入溢出序列的设备不会单独过期，设备消失后立即丢弃其基线
+        for key, (_, overflow) in list(self._exported_counters.items()):
+            if overflow and key not in self._counters_seen:
+                del self._exported_counters[key]
+        self._counters_seen = set()
+
+    def _export_cpu_metrics(self, cpu: Dict[str, Any]):
+        """导出CPU指标"""
+        cpus = cpu.get('cpus', [])
+        for name, percent in zip(cpus, cpu.get('per_cpu', [])):
+            system_metrics.cpu_usage_percent.labels(cpu=name, mode='total').set(percent)
+        for mode, values in cpu.get('per_cpu_modes', {}).items():
+            for name, percent in zip(cpus, values):
+                system_metrics.cpu_usage_percent.labels(cpu=name, mode=mode).set(percent)
+
+        # CPU负载平均值
+        periods = ['1min', '5min', '15min']
+        for period, load in zip(periods, cpu.get('load_avg', [])):
+            system_metrics.cpu_load_avg.labels(period=period).set(load)
+
+    def _export_memory_metrics(self, memory: Dict[str, Any]):
+        """导出内存指标"""
+        virtual_memory = memory.get('virtual')
+        if virtual_memory:
+            for key in ('total', 'available', 'used', 'free'):
+                system_metrics.memory_usage_bytes.labels(type=key).set(virtual_memory[key])
+            system_metrics.memory_usage_percent.labels(type='virtual').set(virtual_memory['percent'])
+
+        swap_memory = memory.get('swap')
+        if swap_memory:
+            for key in ('total', 'used', 'free'):
+                system_metrics.memory_usage_bytes.labels(type=f'swap_{key}').set(swap_memory[key])
+            system_metrics.memory_usage_percent.labels(type='swap').set(swap_memory['percent'])
+
+    def _export_disk_metrics(self, disk: Dict[str, Any]):
+        """导出磁盘指标"""
+        usages = []
+        if disk.get('root'):
+            usages.append(('root', '/', disk['root']))
+        for partition in disk.get('partitions', []):
+            usages.append((partition['device'].replace('/', '_'), partition['mountpoint'], partition['usage']))
+
+        for device, mountpoint, usage in usages:
+            for key in ('total', 'used', 'free'):
+                series_guard.set(system_metrics.disk_usage_bytes, usage[key],
+                                 device=device, mountpoint=mountpoint, type=key)
+            series_guard.set(system_metrics.disk_usage_percent, usage['percent'],
+                             device=device, mountpoint=mountpoint)
+
+        for device, io in disk.get('io_counters', {}).items():
+            for key, operation in DISK_COUNTERS.items():
+                self._inc_counter(system_metrics.disk_io_total, io[key], device=device, operation=operation)
+
+        for device, rate in disk.get('io_rates', {}).items():
+            for operation in ('read', 'write'):
+                series_guard.set(system_metrics.disk_io_bytes_rate, rate[f'{operation}_bytes_per_sec'],
+                                 device=device, operation=operation)
+                series_guard.set(system_metrics.disk_io_ops_rate, rate[f'{operation}_ops_per_sec'],
+                                 device=device, operation=operation)
+                series_guard.set(system_metrics.disk_io_latency, rate[f'{operation}_latency_ms'],
+                                 device=device, operation=operation)
+            series_guard.set(system_metrics.disk_io_utilization, rate['utilization_percent'], device=device)
+
+    def _export_network_metrics(self, network: Dict[str, Any]):
+        """导出网络指标
+
+        内核计数器按增量累加到Counter上，多进程模式下各进程的Counter文件求和后
+        仍等于真实值（主收集器切换时新主以旧快照为基线）。
+        """
+        for interface, io in network.get('interfaces', {}).items():
+            for key, (metric, direction) in NETWORK_COUNTERS.items():
+                self._inc_counter(metric, io[key], interface=interface, direction=direction)
+
+        for interface, rate in network.get('rates', {}).items():
+            for direction in ('sent', 'recv'):
+                series_guard.set(system_metrics.network_bytes_rate, rate[f'bytes_{direction}_per_sec'],
+                                 interface=interface, direction=direction)
+                series_guard.set(system_metrics.network_packets_rate, rate[f'packets_{direction}_per_sec'],
+                                 interface=interface, direction=direction)
+
+        sockets = network.get('sockets', {})
+        for protocol, fields in sockets.get('sockstat', {}).items():
+            for state, count in fields.items():
+                system_metrics.socket_count.labels(protocol=protocol, state=state).set(count)
+        for state, count in sockets.get('tcp_states', {}).items():
+            system_metrics.tcp_connections.labels(state=state).set(count)
+
+    def _export_cgroup_metrics(self, cgroups: Dict[str, Any]):
+        """导出Pod资源指标，只导出CPU占用最高的CGROUP_MAX_PODS个Pod以限制序列数"""
+        pods = sorted(
+            cgroups.get('pods', []),
+            key=lambda p: (p['cpu_cores'] or 0, p['memory_bytes']),
+            reverse=True
+        )[:settings.CGROUP_MAX_PODS]
+
+        for pod in pods:
+            labels = {'pod_uid': pod['pod_uid'], 'qos': pod['qos'] or 'unknown'}
+            if pod['cpu_cores'] is not None:
+                series_guard.set(system_metrics.pod_cpu_usage_cores, pod['cpu_cores'], **labels)
+            series_guard.set(system_metrics.pod_memory_usage_bytes, pod['memory_bytes'], **labels)
+            for direction in ('read', 'write'):
+                rate = pod[f'io_{direction}_bytes_per_sec']
+                if rate is not None:
+                    series_guard.set(system_metrics.pod_io_bytes_rate, rate, direction=direction, **labels)
+
+    def _inc_counter(self, metric, value: int, **labels):
+        """将内核计数器的增量累加到Counter上；计数器回绕或设备重建时从0重新计数
+
+        增量为0时同样经过守卫，使空闲设备的序列不会被当作过期移除；被过滤的设备不保留基线。
+        """
+        key = _counter_key(metric, **labels)
+        previous = self._exported_counters.get(key, (0, False))[0]
+        delta = value - previous if value >= previous else value
+        admitted = series_guard.inc(metric, delta, **labels)
+        if admitted is None:
+            self._exported_counters.pop(key, None)
+            return
+        self._exported_counters[key] = (value, admitted[1])
+        self._counters_seen.add(key)
+
+    def _export_collector_metrics(self, collector: Dict[str, Any]):
+        """导出收集器自身的耗时、错误与超时指标（每份快照只导出一次）"""
+        if not collector:
+            return
+        for subsystem, seconds in collector['durations'].items():
+            system_metrics.collector_subsystem_duration_seconds.labels(subsystem=subsystem).observe(seconds)
+        system_metrics.collector_cycle_duration_seconds.observe(collector['cycle_seconds'])
+        for subsystem in collector['errors']:
+            system_metrics.collector_errors_total.labels(subsystem=subsystem).inc()
+        if collector['skipped_cycles']:
+            system_metrics.collector_overruns_total.inc()
+            system_metrics.collector_skipped_cycles_total.inc(collector['skipped_cycles'])
+
+    def _export_process_metrics(self, processes: Dict[str, Any]):
+        """导出进程指标"""
+        if 'count' in processes:
+            system_metrics.process_count.labels(state='total').set(processes['count'])
+        for state, count in processes.get('states', {}).items():
+            system_metrics.process_count.labels(state=state).set(count)
+
+    def latest_snapshot(self) -> Dict[str, Any]:
+        """最近一次发布的快照（多进程模式下读取主收集器的共享快照），尚无快照时返回空字典"""
+        if self.collector_process:
+            # 直接读取共享内存：generation未变化时无需加锁和复制
+            snapshot = self.collector_process.read()
+            if snapshot:
+                return snapshot
+
+        if self._snapshot:
+            return self._snapshot
+
+        if self.snapshot_store:
+            return self.snapshot_store.read()
+        return {}
+
+    @property
+    def collects_inline(self) -> bool:
+        """是否由调用方现场采集：仅单进程且未启动收集线程/子进程时（如脚本、测试）"""
+        return not self.running and not self.multiprocess
+
     def get_current_metrics(self) -> Dict[str, Any]:
-        """获取当前系统指标快照"""
+        """获取当前系统指标快照
+
+        返回最近一次发布的快照。收集线程/子进程或主收集器负责采集时不在调用方重复采集，
+        尚无快照（刚启动、主收集器还未写入共享快照）时返回空字典。
+        """
         try:
-            return {
-                'cpu': {
-                    'usage_percent': psutil.cpu_percent(interval=1),
-                    'load_avg': psutil.getloadavg(),
-                    'count': psutil.cpu_count()
-                },
-                'memory': {
-                    'virtual': psutil.virtual_memory()._asdict(),
-                    'swap': psutil.swap_memory()._asdict()
-                },
-                'disk': {
-                    'root': psutil.disk_usage('/')._asdict(),
-                    'partitions': [
-                        {
-                            'device': p.device,
-                            'mountpoint': p.mountpoint,
-                            'fstype': p.fstype,
-                            'usage': psutil.disk_usage(p.mountpoint)._asdict()
-                        }
-                        for p in psutil.disk_partitions()
-                        if p.mountpoint != '/'
-                    ]
-                },
-                'network': {
-                    'io_counters': psutil.net_io_counters()._asdict(),
-                    'connections': len(psutil.net_connections())
-                },
-                'processes': {
-                    'count': len(psutil.pids()),
-                    'top_cpu': [
-                        {
-                            'pid': p.info['pid'],
-                            'name': p.info['name'],
-                            'cpu_percent': p.info['cpu_percent']
-                        }
-                        for p in sorted(
-                            psutil.process_iter(['pid', 'name', 'cpu_percent']),
-                            key=lambda x: x.info['cpu_percent'] or 0,
-                            reverse=True
-                        )[:10]
-                    ]
-                }
-            }
+            snapshot = self.latest_snapshot()
+            if snapshot or not self.collects_inline:
+                return snapshot
+            return self.collect_snapshot()
         except Exception as e:
             logger.error(f"❌ 获取系统指标快照失败: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+    async def current_metrics(self) -> Dict[str, Any]:
+        """get_current_metrics的异步版本：需要现场采集时放入线程池执行，不阻塞事件循环"""
+        snapshot = self.latest_snapshot()
+        if snapshot or not self.collects_inline:
+            return snapshot
+        return await run_in_threadpool(self.get_current_metrics)
+
+    def status(self) -> Dict[str, Any]:
+        """收集器状态摘要
+
+        基于最近一次快照判断采集是否在正常进行，因此非主收集器的worker、
+        子进程模式下的监督线程返回的结果与主收集器一致。
+        """
+        snapshot = self.latest_snapshot()
+        collector = snapshot.get('collector', {})
+        last_success_at = collector.get('last_success_at') if collector else snapshot.get('timestamp')
+        age = max(0.0, time.time() - last_success_at) if last_success_at else None
+        totals = collector.get('totals', {})
+        errors = totals.get('errors', {})
+        stale_after = max(self.interval * 3, settings.COLLECTOR_STALL_TIMEOUT)
+
+        return {
+            'running': age is not None and age <= stale_after,
+            'mode': self.mode,
+            'interval': self.interval,
+            'last_success': datetime.fromtimestamp(last_success_at).isoformat() if last_success_at else None,
+            'last_success_age_seconds': round(age, 3) if age is not None else None,
+            'last_cycle_seconds': round(collector.get('cycle_seconds', 0.0), 4),
+            'cycles_total': totals.get('cycles', 0),
+            'overruns_total': totals.get('overruns', 0),
+            'skipped_cycles_total': totals.get('skipped_cycles', 0),
+            'process_restarts': self.collector_process.restarts if self.collector_process else 0,
+            'subsystems': {
+                subsystem: {
+                    'last_seconds': round(collector.get('durations', {}).get(subsystem, 0.0), 4),
+                    'last_failed': subsystem in collector.get('errors', []),
+                    'errors_total': errors.get(subsystem, 0)
+                }
+                for subsystem, _, _ in SUBSYSTEMS
+            }
+        }
+
+
+# 快照中的内核计数器 -> 导出的Counter及标签
+NETWORK_COUNTERS = {
+    'bytes_sent': (system_metrics.network_bytes_total, 'sent'),
+    'bytes_recv': (system_metrics.network_bytes_total, 'recv'),
+    'packets_sent': (system_metrics.network_packets_total, 'sent'),
+    'packets_recv': (system_metrics.network_packets_total, 'recv'),
+}
+DISK_COUNTERS = {'read_count': 'read', 'write_count': 'write'}
+
+
+def _counter_key(metric, **labels) -> tuple:
+    """计数器基线的键，与基数守卫移除序列时返回的 (指标名, 标签值) 一致"""
+    return metric._name, tuple(str(labels[name]) for name in metric._labelnames)
+
+
+# 速率类和Pod指标的设备消失（热拔除、Pod删除、跌出Top N）后立即移除
+for _metric in (
+    system_metrics.disk_io_bytes_rate, system_metrics.disk_io_ops_rate, system_metrics.disk_io_latency,
+    system_metrics.disk_io_utilization, system_metrics.network_bytes_rate, system_metrics.network_packets_rate,
+    system_metrics.pod_cpu_usage_cores, system_metrics.pod_memory_usage_bytes, system_metrics.pod_io_bytes_rate
+):
+    series_guard.configure(_metric, stale_cycles=1)
+
+# 百分比与延迟不可相加，溢出序列取最大值
+for _metric in (system_metrics.disk_usage_percent, system_metrics.disk_io_latency, system_metrics.disk_io_utilization):
+    series_guard.configure(_metric, additive=False)
+
+# 全局收集器实例（应用生命周期与各API端点共享）
+system_collector = SystemCollector()
+
+# 多进程模式下由build_multiprocess_registry从共享快照导出
+if not system_collector.multiprocess:
+    REGISTRY.register(SnapshotAgeCollector(system_collector.latest_snapshot))
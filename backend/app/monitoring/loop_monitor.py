@@ -0,0 +1,168 @@
+"""
+事件循环延迟监控
+- 延迟探针：事件循环中的任务按固定间隔sleep，实际唤醒时间与预期时间之差即调度延迟，导出为直方图
+- 调试模式：看门狗线程检测探针心跳，事件循环被某个回调占用超过阈值时抓取事件循环线程的调用栈，
+  记录到有界的内存日志中（通过管理员接口查看），用于在预发环境自动发现阻塞调用
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.monitoring.metrics import app_metrics
+from app.monitoring.profiler import short_path
+
+# 每条阻塞记录最多保留的栈帧数（最内层）
+MAX_STACK_FRAMES = 50
+
+
+class LoopMonitor:
+    """事件循环延迟探针与阻塞调用检测"""
+
+    def __init__(self, interval: float, debug: bool, threshold: float, log_size: int):
+        self.interval = interval
+        self.debug = debug
+        self.threshold = threshold
+        self.blocks: Deque[Dict[str, Any]] = deque(maxlen=log_size)
+        self.blocks_total = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._heartbeat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop: Optional[threading.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动探针，调试模式下同时启动看门狗线程"""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._probe(), name="loop-lag-probe")
+        if self.debug:
+            self._start_watchdog()
+        logger.info(f"⏱️ 事件循环延迟监控已启动（调试模式: {'开' if self.debug else '关'}）")
+
+    async def stop(self):
+        """停止探针与看门狗"""
+        self._stop_watchdog()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def configure(self, debug: bool, threshold: Optional[float] = None):
+        """运行时切换调试模式与阈值"""
+        if threshold is not None:
+            self.threshold = threshold
+        self.debug = debug
+        if debug and self.running:
+            self._start_watchdog()
+        elif not debug:
+            self._stop_watchdog()
+
+    def clear(self):
+        self.blocks.clear()
+
+    def status(self, limit: int = 20) -> Dict[str, Any]:
+        return {
+            "worker_pid": os.getpid(),
+            "running": self.running,
+            "probe_interval": self.interval,
+            "last_lag_seconds": round(self.last_lag, 6),
+            "max_lag_seconds": round(self.max_lag, 6),
+            "debug": self.debug,
+            "threshold_seconds": self.threshold,
+            "blocks_total": self.blocks_total,
+            # 最新的记录在前
+            "blocks": list(reversed(self.blocks))[:limit]
+        }
+
+    async def _probe(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            # 心跳在延迟之后更新，看门狗看到心跳前进时last_lag已是本次阻塞的时长
+            self._heartbeat = now
+            app_metrics.event_loop_lag_seconds.observe(lag)
+
+    def _start_watchdog(self):
+        if self._watchdog is not None:
+            return
+        # 每个看门狗线程使用各自的停止事件，停止后立即重新开启时不会与正在退出的旧线程混淆
+        self._watchdog_stop = threading.Event()
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(self._watchdog_stop,), name='loop-watchdog', daemon=True
+        )
+        self._watchdog.start()
+
+    def _stop_watchdog(self):
+        # 只通知线程退出而不join：调用方在事件循环中（管理员接口、应用关闭），线程在一个检查周期内自行结束
+        if self._watchdog is not None:
+            self._watchdog_stop.set()
+            self._watchdog = None
+            self._watchdog_stop = None
+
+    def _watch(self, stop_event: threading.Event):
+        """看门狗：心跳超过 间隔+阈值 未前进即判定事件循环被阻塞，每次阻塞只抓取一次调用栈"""
+        record: Optional[Dict[str, Any]] = None
+        stalled_heartbeat = 0.0
+        while not stop_event.wait(min(self.threshold / 2, 0.05)):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if record is not None:
+                if heartbeat != stalled_heartbeat:
+                    # 事件循环已恢复，以探针测得的延迟作为本次阻塞的总时长
+                    record["blocked_seconds"] = round(max(self.last_lag, record["blocked_seconds"]), 4)
+                    record["ongoing"] = False
+                    record = None
+                else:
+                    record["blocked_seconds"] = round(blocked, 4)
+            elif blocked >= self.threshold:
+                record = self._capture(blocked)
+                stalled_heartbeat = heartbeat
+
+    def _capture(self, blocked: float) -> Dict[str, Any]:
+        """抓取事件循环线程当前的调用栈并记录"""
+        frame = sys._current_frames().get(self._loop_thread)
+        summary = traceback.extract_stack(frame)[-MAX_STACK_FRAMES:] if frame is not None else []
+        del frame
+        stack = [f"{short_path(entry.filename)}:{entry.lineno} in {entry.name}" for entry in summary]
+        record = {
+            "detected_at": datetime.now().isoformat(),
+            "blocked_seconds": round(blocked, 4),
+            "ongoing": True,
+            "location": stack[-1] if stack else None,
+            "code": summary[-1].line if summary else None,
+            "stack": stack
+        }
+        self.blocks.append(record)
+        self.blocks_total += 1
+        app_metrics.event_loop_blocks_total.inc()
+        logger.warning(f"⚠️ 事件循环被阻塞超过 {self.threshold}s: {record['location']}")
+        return record
+
+
+# 全局事件循环监控实例（应用生命周期内启动）
+loop_monitor = LoopMonitor(
+    settings.LOOP_LAG_PROBE_INTERVAL, settings.LOOP_BLOCK_DEBUG,
+    settings.LOOP_BLOCK_THRESHOLD, settings.LOOP_BLOCK_LOG_SIZE
+)
@@ -2,12 +2,18 @@
 Prometheus指标定义和配置
 """
 
+from typing import TYPE_CHECKING
+
 from prometheus_client import (
     Counter, Histogram, Gauge, Info,
     generate_latest, CONTENT_TYPE_LATEST
 )
-from fastapi import Response
-from fastapi.responses import PlainTextResponse
+
+from app.monitoring.multiprocess import is_multiprocess_mode, build_multiprocess_registry
+
+# 推送agent复用收集器时只需要指标定义，不导入Web框架
+if TYPE_CHECKING:
+    from fastapi import Response
 
 
 # 系统资源指标
@@ -18,39 +24,45 @@ class SystemMetrics:
     cpu_usage_percent = Gauge(
         'system_cpu_usage_percent',
         'CPU使用率百分比',
-        ['cpu', 'mode']
+        ['cpu', 'mode'],
+        multiprocess_mode='livesum'
     )
     
     cpu_load_avg = Gauge(
         'system_cpu_load_average',
         'CPU负载平均值',
-        ['period']
+        ['period'],
+        multiprocess_mode='livesum'
     )
     
     # 内存指标
     memory_usage_bytes = Gauge(
         'system_memory_usage_bytes',
         '内存使用量（字节）',
-        ['type']
+        ['type'],
+        multiprocess_mode='livesum'
     )
     
     memory_usage_percent = Gauge(
         'system_memory_usage_percent',
         '内存使用率百分比',
-        ['type']
+        ['type'],
+        multiprocess_mode='livesum'
     )
     
     # 磁盘指标
     disk_usage_bytes = Gauge(
         'system_disk_usage_bytes',
         '磁盘使用量（字节）',
-        ['device', 'mountpoint', 'type']
+        ['device', 'mountpoint', 'type'],
+        multiprocess_mode='livesum'
     )
     
     disk_usage_percent = Gauge(
         'system_disk_usage_percent',
         '磁盘使用率百分比',
-        ['device', 'mountpoint']
+        ['device', 'mountpoint'],
+        multiprocess_mode='livesum'
     )
     
     disk_io_total = Counter(
@@ -59,6 +71,34 @@ class SystemMetrics:
         ['device', 'operation']
     )
     
+    disk_io_bytes_rate = Gauge(
+        'system_disk_io_bytes_per_second',
+        '磁盘读写速率（字节/秒）',
+        ['device', 'operation'],
+        multiprocess_mode='livesum'
+    )
+    
+    disk_io_ops_rate = Gauge(
+        'system_disk_io_ops_per_second',
+        '磁盘IOPS',
+        ['device', 'operation'],
+        multiprocess_mode='livesum'
+    )
+    
+    disk_io_utilization = Gauge(
+        'system_disk_io_utilization_percent',
+        '磁盘忙碌时间占比',
+        ['device'],
+        multiprocess_mode='livesum'
+    )
+    
+    disk_io_latency = Gauge(
+        'system_disk_io_latency_milliseconds',
+        '磁盘IO平均延迟（毫秒）',
+        ['device', 'operation'],
+        multiprocess_mode='livesum'
+    )
+    
     # 网络指标
     network_bytes_total = Counter(
         'system_network_bytes_total',
@@ -72,11 +112,62 @@ class SystemMetrics:
         ['interface', 'direction']
     )
     
+    network_bytes_rate = Gauge(
+        'system_network_bytes_per_second',
+        '网络传输速率（字节/秒）',
+        ['interface', 'direction'],
+        multiprocess_mode='livesum'
+    )
+    
+    network_packets_rate = Gauge(
+        'system_network_packets_per_second',
+        '网络传输速率（包/秒）',
+        ['interface', 'direction'],
+        multiprocess_mode='livesum'
+    )
+    
+    socket_count = Gauge(
+        'system_socket_count',
+        '套接字数量（来自/proc/net/sockstat）',
+        ['protocol', 'state'],
+        multiprocess_mode='livesum'
+    )
+    
+    tcp_connections = Gauge(
+        'system_tcp_connections',
+        '按状态统计的TCP连接数（netlink inet_diag）',
+        ['state'],
+        multiprocess_mode='livesum'
+    )
+    
     # 进程指标
     process_count = Gauge(
         'system_process_count',
         '系统进程数量',
-        ['state']
+        ['state'],
+        multiprocess_mode='livesum'
+    )
+    
+    # Pod资源指标（cgroup v2）
+    pod_cpu_usage_cores = Gauge(
+        'system_pod_cpu_usage_cores',
+        'Pod CPU使用量（核）',
+        ['pod_uid', 'qos'],
+        multiprocess_mode='livesum'
+    )
+    
+    pod_memory_usage_bytes = Gauge(
+        'system_pod_memory_usage_bytes',
+        'Pod内存使用量（字节）',
+        ['pod_uid', 'qos'],
+        multiprocess_mode='livesum'
+    )
+    
+    pod_io_bytes_rate = Gauge(
+        'system_pod_io_bytes_per_second',
+        'Pod磁盘读写速率（字节/秒）',
+        ['pod_uid', 'qos', 'direction'],
+        multiprocess_mode='livesum'
     )
     
     # 系统信息
@@ -85,6 +176,36 @@ class SystemMetrics:
         '系统信息'
     )
 
+    # 收集器自身指标（最近一次成功周期的时长由SnapshotAgeCollector在抓取时计算）
+    collector_subsystem_duration_seconds = Histogram(
+        'system_collector_subsystem_duration_seconds',
+        '收集器各子系统单次采集耗时（秒）',
+        ['subsystem'],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    )
+
+    collector_cycle_duration_seconds = Histogram(
+        'system_collector_cycle_duration_seconds',
+        '收集器单个周期的采集耗时（秒）',
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    )
+
+    collector_errors_total = Counter(
+        'system_collector_errors_total',
+        '收集器各子系统采集失败次数',
+        ['subsystem']
+    )
+
+    collector_overruns_total = Counter(
+        'system_collector_overruns_total',
+        '采集耗时超过收集间隔的周期数'
+    )
+
+    collector_skipped_cycles_total = Counter(
+        'system_collector_skipped_cycles_total',
+        '因采集超时而跳过的收集周期数'
+    )
+
 
 # 应用指标
 class ApplicationMetrics:
@@ -103,11 +224,24 @@ class ApplicationMetrics:
         ['method', 'endpoint']
     )
     
+    # 事件循环指标
+    event_loop_lag_seconds = Histogram(
+        'event_loop_lag_seconds',
+        '事件循环调度延迟（秒）',
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    )
+    
+    event_loop_blocks_total = Counter(
+        'event_loop_blocks_total',
+        '事件循环被阻塞超过阈值的次数（仅调试模式统计）'
+    )
+    
     # 数据库指标
     database_connections = Gauge(
         'database_connections',
         '数据库连接数',
-        ['state']
+        ['state'],
+        multiprocess_mode='livesum'
     )
     
     database_query_duration_seconds = Histogram(
@@ -128,6 +262,66 @@ class ApplicationMetrics:
         '缓存未命中总数',
         ['cache_type']
     )
+    
+    # Prometheus后端指标
+    prometheus_backend_request_duration_seconds = Histogram(
+        'prometheus_backend_request_duration_seconds',
+        'Prometheus后端请求耗时（秒）',
+        ['backend', 'endpoint', 'outcome'],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    )
+    
+    prometheus_hedged_requests_total = Counter(
+        'prometheus_hedged_requests_total',
+        'HA模式下发出的对冲请求数',
+        ['backend', 'winner']
+    )
+    
+    # 自定义查询准入指标
+    prometheus_query_rejected_total = Counter(
+        'prometheus_query_rejected_total',
+        '被准入控制拒绝的自定义查询数',
+        ['reason']
+    )
+    
+    prometheus_query_queue_seconds = Histogram(
+        'prometheus_query_queue_seconds',
+        '自定义查询获得执行名额前的排队时间（秒）',
+        buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    )
+    
+    prometheus_query_inflight = Gauge(
+        'prometheus_query_inflight',
+        '正在执行的自定义查询数',
+        multiprocess_mode='livesum'
+    )
+    
+    # 指标基数指标
+    metric_series_count = Gauge(
+        'metric_series_count',
+        '指标族当前序列数',
+        ['metric'],
+        multiprocess_mode='livesum'
+    )
+    
+    metric_series_memory_bytes = Gauge(
+        'metric_series_memory_bytes',
+        '指标族序列估算内存（字节）',
+        ['metric'],
+        multiprocess_mode='livesum'
+    )
+    
+    metric_series_dropped_total = Counter(
+        'metric_series_dropped_total',
+        '被过滤或汇入溢出序列的写入次数',
+        ['metric', 'reason']
+    )
+    
+    metric_series_evicted_total = Counter(
+        'metric_series_evicted_total',
+        '因长期未出现被移除的序列数',
+        ['metric']
+    )
 
 
 # 创建指标实例
@@ -138,11 +332,19 @@ app_metrics = ApplicationMetrics()
 def setup_metrics():
     """设置Prometheus指标"""
     print("📊 初始化Prometheus指标...")
+    if is_multiprocess_mode():
+        print("📊 已启用多进程指标模式（mmap值文件）")
 
 
-def get_metrics_response() -> Response:
+def get_metrics_response() -> "Response":
     """获取Prometheus指标响应"""
-    metrics_data = generate_latest()
+    from fastapi.responses import PlainTextResponse
+
+    if is_multiprocess_mode():
+        # 多进程模式：聚合所有worker的指标文件，保证无论请求落到哪个worker结果一致
+        metrics_data = generate_latest(build_multiprocess_registry())
+    else:
+        metrics_data = generate_latest()
     return PlainTextResponse(
         content=metrics_data,
         media_type=CONTENT_TYPE_LATEST
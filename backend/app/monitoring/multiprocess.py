@@ -0,0 +1,183 @@
+"""
+多进程（多worker）部署支持
+- prometheus_client multiprocess 模式（基于mmap的指标值文件）
+- 基于文件锁的主收集器选举：只有一个worker执行主机指标采集
+- 主收集器快照共享：其他worker直接读取共享快照文件
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+from prometheus_client import CollectorRegistry, multiprocess
+from prometheus_client.core import GaugeMetricFamily, InfoMetricFamily
+
+# prometheus_client 在导入时读取该环境变量决定是否使用mmap值文件，
+# 因此必须在进程启动前设置，并由启动器（而非worker）在启动时清空目录
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+LEADER_LOCK_FILE = "collector.lock"
+VIEWS_LEADER_LOCK_FILE = "materializer.lock"
+SNAPSHOT_FILE = "system_snapshot.json"
+
+
+def is_multiprocess_mode() -> bool:
+    """是否启用了prometheus_client多进程模式"""
+    return bool(MULTIPROC_DIR)
+
+
+def prepare_multiprocess_dir(path: str):
+    """由启动器在fork/spawn worker之前调用：清空指标目录并设置环境变量"""
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def build_multiprocess_registry() -> CollectorRegistry:
+    """构建聚合所有worker指标文件的采集注册表"""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    # Info类型与抓取时才能计算的时长不支持mmap聚合，改由主收集器共享快照提供
+    store = SharedSnapshotStore()
+    registry.register(SnapshotInfoCollector(store))
+    registry.register(SnapshotAgeCollector(store.read))
+    return registry
+
+
+def mark_process_dead(pid: int):
+    """清理已退出进程的live模式Gauge文件"""
+    if not is_multiprocess_mode():
+        return
+    try:
+        multiprocess.mark_process_dead(pid)
+    except Exception as e:
+        logger.warning(f"⚠️ 清理进程 {pid} 的指标文件失败: {e}")
+
+
+class LeaderElection:
+    """基于flock的主进程选举（主收集器、物化视图刷新各用一把锁）
+
+    持有锁的worker即为主进程；进程退出时内核自动释放锁，
+    其余worker在下一个周期的尝试中接管。
+    """
+
+    def __init__(self, directory: Optional[str] = None, lock_file: str = LEADER_LOCK_FILE, role: str = "主收集器"):
+        self.lock_path = os.path.join(directory or MULTIPROC_DIR, lock_file)
+        self.role = role
+        self._fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """尝试成为主进程（非阻塞），已是主进程时直接返回True"""
+        if self._fd is not None:
+            return True
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        previous_pid = self._read_pid(fd)
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, str(os.getpid()).encode(), 0)
+        self._fd = fd
+
+        # 上一任主进程已退出（锁已释放），清理其live模式的Gauge文件，
+        # 避免其最后写入的主机指标与新主收集器的值叠加
+        if previous_pid and previous_pid != os.getpid():
+            mark_process_dead(previous_pid)
+        logger.info(f"👑 进程 {os.getpid()} 成为{self.role}")
+        return True
+
+    def release(self):
+        """释放主进程身份"""
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    @staticmethod
+    def _read_pid(fd: int) -> Optional[int]:
+        try:
+            return int(os.pread(fd, 32, 0).decode().strip() or 0) or None
+        except ValueError:
+            return None
+
+
+class SharedSnapshotStore:
+    """主收集器快照的共享存储（原子替换的JSON文件）"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.path = os.path.join(directory or MULTIPROC_DIR, SNAPSHOT_FILE)
+        self._lock = threading.Lock()
+        self._cached: Dict[str, Any] = {}
+        self._cached_mtime: int = 0
+
+    def write(self, snapshot: Dict[str, Any]):
+        """写入快照：先写临时文件再rename，读者不会看到半个文件"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(tmp_path, self.path)
+
+    def read(self) -> Dict[str, Any]:
+        """读取快照，文件未变化时复用上次解析结果"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        with self._lock:
+            if mtime != self._cached_mtime:
+                try:
+                    with open(self.path) as f:
+                        self._cached = json.load(f)
+                    self._cached_mtime = mtime
+                except (OSError, ValueError) as e:
+                    logger.warning(f"⚠️ 读取共享快照失败: {e}")
+            return self._cached
+
+
+class SnapshotInfoCollector:
+    """从共享快照导出system_info（多进程模式下Info指标无法mmap聚合）"""
+
+    def __init__(self, store: SharedSnapshotStore):
+        self.store = store
+
+    def collect(self):
+        system_info = self.store.read().get('system_info')
+        if system_info:
+            info = InfoMetricFamily('system_info', '系统信息')
+            info.add_metric([], {k: str(v) for k, v in system_info.items()})
+            yield info
+
+
+class SnapshotAgeCollector:
+    """导出最近一次成功采集周期距今的时长（抓取时计算，尚无成功采集时不导出）"""
+
+    def __init__(self, source: Callable[[], Dict[str, Any]]):
+        self.source = source
+
+    def collect(self):
+        snapshot = self.source()
+        collector = snapshot.get('collector')
+        last_success_at = collector.get('last_success_at') if collector else snapshot.get('timestamp')
+        if last_success_at:
+            yield GaugeMetricFamily(
+                'system_collector_last_success_age_seconds',
+                '最近一次成功采集周期距今的时长（秒）',
+                value=max(0.0, time.time() - last_success_at)
+            )
@@ -0,0 +1,229 @@
+"""
+按需采样剖析器
+在独立线程中周期性读取 sys._current_frames()，统计所有线程（收集线程、事件循环、线程池worker）
+的调用栈，输出火焰图可直接使用的折叠栈（collapsed stacks）与函数耗时排行。
+
+- 同一进程同时只允许一个剖析会话
+- 每次采样的耗时计入开销，下一次采样的等待时间随之拉长，保证采样线程占用的CPU不超过上限
+- 多worker部署时只剖析处理该请求的worker；子进程模式的收集器不在剖析范围内
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+
+# 单个调用栈最多记录的帧数（超出部分为最外层调用，截断后仍能定位热点）
+MAX_STACK_DEPTH = 128
+
+# 线程空闲等待时所在的函数（叶子帧），默认不计入结果：(文件名, 限定名)
+IDLE_FUNCTIONS = frozenset((
+    ('threading.py', 'Condition.wait'),
+    ('threading.py', 'Thread._wait_for_tstate_lock'),
+    ('selectors.py', 'EpollSelector.select'),
+    ('selectors.py', 'PollSelector.select'),
+    ('selectors.py', 'SelectSelector.select'),
+    ('selectors.py', 'KqueueSelector.select'),
+    ('thread.py', '_worker'),
+))
+
+_DIGITS = re.compile(r'\d+')
+
+
+class ProfilerBusyError(RuntimeError):
+    """已有剖析会话在运行"""
+
+
+class ProfileSession:
+    """一次剖析会话：采样线程在到期或stop()后结束"""
+
+    def __init__(self, seconds: float, interval: float, max_overhead: float):
+        self.seconds = seconds
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.started_at = time.time()
+        self.samples = 0
+        # 采样本身消耗的时间（秒）
+        self.busy = 0.0
+        self.elapsed = 0.0
+        # (线程名, 由叶子到根的code对象) -> 采样次数
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self) -> 'ProfileSession':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """结束采样并等待采样线程退出"""
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        started = time.monotonic()
+        deadline = started + self.seconds
+        # 采样耗时占比不超过max_overhead：cost / (cost + wait) <= max_overhead
+        backoff = (1 - self.max_overhead) / self.max_overhead
+        try:
+            while not self._stop_event.is_set():
+                sample_started = time.perf_counter()
+                self._sample(own)
+                cost = time.perf_counter() - sample_started
+                self.busy += cost
+                self.samples += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._stop_event.wait(min(max(self.interval, cost * backoff), remaining))
+        except Exception as e:
+            logger.error(f"❌ 性能剖析采样失败: {e}")
+        finally:
+            self.elapsed = time.monotonic() - started
+
+    def _sample(self, own: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        try:
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                # 线程名中的编号归一化，同一线程池的worker合并统计
+                name = _DIGITS.sub('N', names.get(ident, 'unknown'))
+                self.stacks[(name, tuple(stack))] += 1
+        finally:
+            del frames
+
+    def result(self, include_idle: bool = False, top: int = 30) -> Dict[str, Any]:
+        """汇总为折叠栈与函数排行"""
+        labels: Dict[Any, Tuple[str, str, int]] = {}
+        collapsed: Counter = Counter()
+        threads: Counter = Counter()
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        idle_samples = 0
+        thread_samples = 0
+
+        for (thread, stack), count in self.stacks.items():
+            for code in stack:
+                if code not in labels:
+                    # co_qualname自Python 3.11起才有
+                    name = getattr(code, "co_qualname", code.co_name)
+                    labels[code] = (name, short_path(code.co_filename), code.co_firstlineno)
+            if stack and not include_idle and _is_idle(labels[stack[0]]):
+                idle_samples += count
+                continue
+
+            thread_samples += count
+            threads[thread] += count
+            frames = [_frame_label(labels[code]) for code in reversed(stack)]
+            collapsed[';'.join([thread] + frames)] += count
+            if stack:
+                self_samples[labels[stack[0]]] += count
+                # 递归调用的函数在同一个栈中只计一次
+                for label in {labels[code] for code in stack}:
+                    total_samples[label] += count
+
+        def percent(count: int) -> float:
+            return round(count / thread_samples * 100, 2) if thread_samples else 0.0
+
+        ranked = sorted(total_samples, key=lambda label: (self_samples[label], total_samples[label]), reverse=True)
+        return {
+            'worker_pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'duration_seconds': round(self.elapsed, 3),
+            'samples': self.samples,
+            'thread_samples': thread_samples,
+            'idle_samples': idle_samples,
+            'effective_interval_ms': round(self.elapsed / self.samples * 1000, 2) if self.samples else None,
+            'overhead_percent': round(self.busy / self.elapsed * 100, 3) if self.elapsed else 0.0,
+            'threads': dict(threads.most_common()),
+            'top_functions': [
+                {
+                    'function': label[0],
+                    'file': label[1],
+                    'line': label[2],
+                    'self_samples': self_samples[label],
+                    'self_percent': percent(self_samples[label]),
+                    'total_samples': total_samples[label],
+                    'total_percent': percent(total_samples[label])
+                }
+                for label in ranked[:top]
+            ],
+            'collapsed': '\n'.join(f"{stack} {count}" for stack, count in collapsed.most_common())
+        }
+
+
+def short_path(filename: str) -> str:
+    """去掉sys.path前缀，只保留包内相对路径"""
+    best = ''
+    for entry in sys.path:
+        if entry and filename.startswith(entry.rstrip(os.sep) + os.sep) and len(entry) > len(best):
+            best = entry.rstrip(os.sep) + os.sep
+    return filename[len(best):]
+
+
+def _frame_label(label: Tuple[str, str, int]) -> str:
+    function, path, line = label
+    # 折叠栈以分号分隔帧、以最后一个空格分隔计数
+    return f"{function} ({path}:{line})".replace(';', ',')
+
+
+def _is_idle(label: Tuple[str, str, int]) -> bool:
+    return (os.path.basename(label[1]), label[0]) in IDLE_FUNCTIONS
+
+
+class SamplingProfiler:
+    """进程内采样剖析器（同一时间只允许一个会话）"""
+
+    def __init__(self, max_seconds: int, interval: float, max_overhead: float):
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self._lock = threading.Lock()
+        self._session: Optional[ProfileSession] = None
+
+    @property
+    def running(self) -> bool:
+        return self._session is not None
+
+    def start(self, seconds: float, interval: Optional[float] = None) -> ProfileSession:
+        """开始剖析，已有会话在运行时抛出ProfilerBusyError"""
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusyError("已有性能剖析会话在运行")
+            self._session = ProfileSession(
+                min(seconds, self.max_seconds), max(interval or self.interval, 0.001), self.max_overhead
+            ).start()
+        logger.info(f"🔬 性能剖析开始，时长 {self._session.seconds}s")
+        return self._session
+
+    def finish(self, session: ProfileSession):
+        """结束会话并释放剖析名额"""
+        try:
+            session.stop()
+        finally:
+            with self._lock:
+                if self._session is session:
+                    self._session = None
+        logger.info(f"🔬 性能剖析结束，采样 {session.samples} 次，开销 {session.busy:.3f}s")
+
+
+# 全局剖析器实例
+profiler = SamplingProfiler(
+    settings.PROFILER_MAX_SECONDS, settings.PROFILER_SAMPLE_INTERVAL, settings.PROFILER_MAX_OVERHEAD
+)
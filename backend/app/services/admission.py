@@ -0,0 +1,205 @@
+"""
+自定义PromQL查询的准入控制
+- 令牌桶：限制每个用户的查询速率，超出时直接返回429
+- 并发上限：全局与每用户各一个上限，超出时排队等待
+- 公平排队：空出的执行名额按用户轮转分配，单个用户排满队也不会饿死其他用户；等待超时返回503
+
+状态保存在进程内，多worker部署时各worker分别限制。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.monitoring.metrics import app_metrics
+
+
+class AdmissionRejected(Exception):
+    """查询未被准入"""
+
+    def __init__(self, reason: str, message: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：每秒补充rate个令牌，最多积累burst个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self, tokens: int = 1) -> float:
+        """尝试取出令牌；成功返回0，否则返回需要等待的秒数"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (tokens - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class _UserState:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.inflight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+
+class AdmissionController:
+    """按用户的并发与速率准入控制
+
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(
+        self,
+        global_concurrency: Optional[int] = None,
+        user_concurrency: Optional[int] = None,
+        user_rate: Optional[float] = None,
+        user_burst: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        user_queue_limit: Optional[int] = None
+    ):
+        self.global_concurrency = global_concurrency or settings.PROMQL_GLOBAL_CONCURRENCY
+        self.user_concurrency = user_concurrency or settings.PROMQL_USER_CONCURRENCY
+        self.user_rate = user_rate if user_rate is not None else settings.PROMQL_USER_RATE
+        self.user_burst = user_burst or settings.PROMQL_USER_BURST
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.PROMQL_QUEUE_TIMEOUT
+        self.user_queue_limit = user_queue_limit or settings.PROMQL_USER_QUEUE_LIMIT
+        self.inflight = 0
+        self._users: Dict[str, _UserState] = {}
+        # 有排队请求的用户，按轮转顺序
+        self._rotation: "OrderedDict[str, None]" = OrderedDict()
+
+    def _state(self, user: str) -> _UserState:
+        state = self._users.get(user)
+        if state is None:
+            state = _UserState(TokenBucket(self.user_rate, self.user_burst))
+            self._users[user] = state
+        return state
+
+    def _can_run(self, state: _UserState) -> bool:
+        return self.inflight < self.global_concurrency and state.inflight < self.user_concurrency
+
+    def _grant(self, state: _UserState):
+        self.inflight += 1
+        state.inflight += 1
+        app_metrics.prometheus_query_inflight.inc()
+
+    def _release(self, user: str, state: _UserState):
+        self.inflight -= 1
+        state.inflight -= 1
+        app_metrics.prometheus_query_inflight.dec()
+        self._dispatch()
+        if state.inflight == 0 and not state.waiters and state.bucket.full:
+            # 空闲用户的状态与新建时相同，直接丢弃，避免用户表无限增长
+            self._users.pop(user, None)
+
+    def _dispatch(self):
+        """把空出的名额按用户轮转分配给排队中的请求"""
+        while self._rotation and self.inflight < self.global_concurrency:
+            granted = False
+            for user in list(self._rotation):
+                state = self._users[user]
+                while state.waiters and state.waiters[0].done():
+                    state.waiters.popleft()
+                if not state.waiters:
+                    del self._rotation[user]
+                    continue
+                if state.inflight >= self.user_concurrency:
+                    continue
+                self._grant(state)
+                state.waiters.popleft().set_result(None)
+                granted = True
+                # 得到名额的用户移到队尾
+                self._rotation.move_to_end(user)
+                if not state.waiters:
+                    del self._rotation[user]
+                break
+            if not granted:
+                return
+
+    def _reject(self, reason: str, message: str, status_code: int, retry_after: Optional[float] = None):
+        app_metrics.prometheus_query_rejected_total.labels(reason=reason).inc()
+        raise AdmissionRejected(reason, message, status_code, retry_after)
+
+    def charge(self, user: str, tokens: int = 1):
+        """从用户的令牌桶扣除令牌，不足时抛出AdmissionRejected（429）"""
+        wait = self._state(user).bucket.take(tokens)
+        if wait:
+            self._reject(
+                "rate_limited", f"查询过于频繁，请 {wait:.1f} 秒后重试", 429,
+                retry_after=wait
+            )
+
+    @asynccontextmanager
+    async def admit(self, user: str, tokens: int = 1):
+        """获取一个执行名额，退出上下文时归还
+
+        tokens为本次消耗的速率令牌数；已通过charge预先扣除时传0。
+        """
+        if tokens:
+            self.charge(user, tokens)
+        state = self._state(user)
+        start = time.perf_counter()
+        if not state.waiters and self._can_run(state):
+            self._grant(state)
+        else:
+            if len(state.waiters) >= self.user_queue_limit:
+                self._reject("queue_full", f"排队中的查询过多（上限 {self.user_queue_limit}）", 429)
+            waiter = asyncio.get_running_loop().create_future()
+            state.waiters.append(waiter)
+            self._rotation.setdefault(user)
+            try:
+                await asyncio.wait({waiter}, timeout=self.queue_timeout)
+            except asyncio.CancelledError:
+                # 客户端断开：已分配的名额要归还
+                if waiter.done() and not waiter.cancelled():
+                    self._release(user, state)
+                else:
+                    waiter.cancel()
+                raise
+            if not waiter.done():
+                waiter.cancel()
+                self._reject(
+                    "queue_timeout", f"查询排队超过 {self.queue_timeout:.1f} 秒，请稍后重试", 503,
+                    retry_after=self.queue_timeout
+                )
+        app_metrics.prometheus_query_queue_seconds.observe(time.perf_counter() - start)
+
+        try:
+            yield
+        finally:
+            self._release(user, state)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "global_concurrency": self.global_concurrency,
+            "queued": sum(len(state.waiters) for state in self._users.values()),
+            "queued_users": len(self._rotation),
+            "active_users": sum(1 for state in self._users.values() if state.inflight)
+        }
+
+
+# 全局查询准入控制器（/prometheus/query 使用）
+query_admission = AdmissionController()
@@ -0,0 +1,202 @@
+"""
+推送agent上报的主机快照
+按主机保存最新快照、协议状态（会话、已应用的seq）与最近的历史点。
+多worker部署时每台主机的状态写入共享目录下的一个文件（原子替换），任一worker都能读到，
+agent重连到另一个worker时也能接着上一个worker已应用的seq继续应用增量帧。
+"""
+
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import orjson
+from loguru import logger
+
+from app.agent.protocol import DELTA, KEYFRAME, apply, decode_batch
+from app.api.responses import dumps
+from app.core.config import settings
+from app.monitoring.multiprocess import MULTIPROC_DIR, is_multiprocess_mode
+
+# 历史点的字段（每个点按此顺序保存为一个元组）
+HISTORY_FIELDS = ("timestamp", "cpu_usage", "memory_usage", "disk_usage", "load_1min",
+                  "network_recv_per_sec", "network_sent_per_sec")
+
+_HOST_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,252}$')
+
+
+def history_point(snapshot: Dict[str, Any]) -> tuple:
+    """从快照中提取一个历史点"""
+    cpu = snapshot.get('cpu', {})
+    rates = snapshot.get('network', {}).get('rates_total', {})
+    load = cpu.get('load_avg') or [0]
+    return (
+        snapshot.get('timestamp', 0),
+        cpu.get('usage_percent', 0),
+        snapshot.get('memory', {}).get('virtual', {}).get('percent', 0),
+        snapshot.get('disk', {}).get('root', {}).get('percent', 0),
+        load[0],
+        rates.get('bytes_recv_per_sec', 0),
+        rates.get('bytes_sent_per_sec', 0)
+    )
+
+
+class HostState:
+    """单台主机的上报状态"""
+
+    def __init__(self, host: str, history_points: int):
+        self.host = host
+        self.session: Optional[str] = None
+        self.last_seq = 0
+        self.snapshot: Dict[str, Any] = {}
+        self.received_at = 0.0
+        self.interval = settings.COLLECTION_INTERVAL
+        self.agent: Dict[str, Any] = {}
+        self.frames = 0
+        self.skipped = 0
+        self.history: Deque[tuple] = deque(maxlen=history_points)
+
+    @property
+    def online(self) -> bool:
+        return time.time() - self.received_at <= self.interval * 3
+
+    def summary(self) -> Dict[str, Any]:
+        point = history_point(self.snapshot)
+        return {
+            "host": self.host,
+            "online": self.online,
+            "received_at": self.received_at,
+            "snapshot_timestamp": self.snapshot.get('timestamp'),
+            "session": self.session,
+            "last_seq": self.last_seq,
+            "frames": self.frames,
+            "skipped_frames": self.skipped,
+            "agent": self.agent,
+            **dict(zip(HISTORY_FIELDS[1:], point[1:]))
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "host": self.host, "session": self.session, "last_seq": self.last_seq, "snapshot": self.snapshot,
+            "received_at": self.received_at, "interval": self.interval, "agent": self.agent,
+            "frames": self.frames, "skipped": self.skipped, "history": list(self.history)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], history_points: int) -> 'HostState':
+        state = cls(data["host"], history_points)
+        for key in ("session", "last_seq", "snapshot", "received_at", "interval", "agent", "frames", "skipped"):
+            setattr(state, key, data[key])
+        state.history.extend(tuple(point) for point in data["history"])
+        return state
+
+
+class FleetStore:
+    """各主机agent上报状态的存储；directory为None时只保存在本进程内存中"""
+
+    def __init__(self, directory: Optional[str], history_points: int):
+        self.directory = directory
+        self.history_points = history_points
+        self.hosts: Dict[str, HostState] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def ingest(self, body: bytes) -> Dict[str, Any]:
+        """应用一次上报，返回确认的seq与是否需要agent重新发送完整帧；格式错误时抛出ValueError"""
+        header, frames = decode_batch(body)
+        host, session = header["host"], header["session"]
+        if not _HOST_PATTERN.match(host):
+            raise ValueError(f"非法的主机名: {host!r}")
+
+        with self._lock:
+            state = self._load(host) or HostState(host, self.history_points)
+            ack = state.last_seq if state.session == session else 0
+            resync = False
+            for seq, kind, _, payload in frames:
+                same_session = state.session == session
+                if same_session and seq <= state.last_seq:
+                    # 重传的帧
+                    continue
+                if kind == KEYFRAME:
+                    snapshot = payload
+                elif kind == DELTA and same_session and seq == state.last_seq + 1:
+                    snapshot = apply(state.snapshot, payload)
+                else:
+                    # 基准帧缺失，跳过直到下一个完整帧；同样确认，agent不再重发
+                    state.skipped += 1
+                    ack, resync = seq, True
+                    continue
+                state.session, state.last_seq, state.snapshot = session, seq, snapshot
+                state.history.append(history_point(snapshot))
+                state.frames += 1
+                ack, resync = seq, False
+
+            state.received_at = time.time()
+            state.interval = header.get("interval") or state.interval
+            state.agent = {key: header[key] for key in ("rss", "buffered", "dropped") if key in header}
+            self.hosts[host] = state
+            self._save(state)
+
+        if resync:
+            logger.info(f"🔁 主机 {host} 的增量帧缺少基准，要求agent重新发送完整快照")
+        return {"ack": ack, "resync": resync}
+
+    def get(self, host: str) -> Optional[HostState]:
+        # 主机名同时是共享目录中的文件名，非法名称直接视为不存在
+        if not _HOST_PATTERN.match(host):
+            return None
+        with self._lock:
+            return self._load(host)
+
+    def snapshot(self, host: str) -> Optional[Dict[str, Any]]:
+        state = self.get(host)
+        return state.snapshot if state is not None and state.snapshot else None
+
+    def list(self) -> List[HostState]:
+        with self._lock:
+            names = set(self.hosts)
+            if self.directory:
+                names.update(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+            states = [self._load(name) for name in sorted(names)]
+        return [state for state in states if state is not None]
+
+    def _path(self, host: str) -> str:
+        return os.path.join(self.directory, f"{host}.json")
+
+    def _load(self, host: str) -> Optional[HostState]:
+        """返回主机状态；共享目录中的文件被其他worker更新过时重新读取"""
+        if not self.directory:
+            return self.hosts.get(host)
+        try:
+            mtime = os.stat(self._path(host)).st_mtime_ns
+        except FileNotFoundError:
+            return self.hosts.get(host)
+        if mtime != self._mtimes.get(host):
+            try:
+                with open(self._path(host), "rb") as f:
+                    self.hosts[host] = HostState.from_dict(orjson.loads(f.read()), self.history_points)
+                self._mtimes[host] = mtime
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"⚠️ 读取主机 {host} 的上报状态失败: {e}")
+        return self.hosts.get(host)
+
+    def _save(self, state: HostState):
+        if not self.directory:
+            return
+        path = self._path(state.host)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(dumps(state.to_dict()))
+        os.replace(tmp_path, path)
+        self._mtimes[state.host] = os.stat(path).st_mtime_ns
+
+
+# 全局主机快照存储（多worker部署时共享目录位于prometheus多进程目录下）
+fleet_store = FleetStore(
+    os.path.join(MULTIPROC_DIR, "fleet") if is_multiprocess_mode() else None,
+    settings.AGENT_HISTORY_POINTS
+)
@@ -0,0 +1,98 @@
+"""
+Kubernetes节点/Pod清单的版本跟踪
+清单内容变化时代数才递增，未变化的轮询可直接返回304；
+保留最近若干代的清单，客户端带 since=<代数> 时只返回新增、删除和变化的条目
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+SECTIONS = ("nodes", "pods")
+
+
+def _node_key(node: Dict[str, Any]) -> str:
+    return node["name"]
+
+
+def _pod_key(pod: Dict[str, Any]) -> str:
+    return f'{pod["namespace"]}/{pod["name"]}'
+
+
+_KEY_FUNCS = {"nodes": _node_key, "pods": _pod_key}
+
+
+class KubernetesInventory:
+    """节点与Pod清单及其历史版本"""
+
+    def __init__(self, history_size: Optional[int] = None):
+        self.history_size = history_size or settings.KUBERNETES_INVENTORY_HISTORY
+        self.generation = 0
+        self.current: Dict[str, Dict[str, Dict[str, Any]]] = {section: {} for section in SECTIONS}
+        # 最近一次查询是否有部分失败（此时清单为上一版内容）
+        self.degraded = False
+        # 代数 -> 该代的清单
+        self._history: "OrderedDict[int, Dict[str, Dict[str, Dict[str, Any]]]]" = OrderedDict()
+
+    def update(self, k8s_metrics: Dict[str, Any], generation: Optional[int] = None) -> int:
+        """用最新查询结果更新清单，返回当前代数
+
+        查询失败（errors中包含该部分）时保留上一版清单，不把查询失败当成条目全部删除。
+        generation用于采用其他worker已分配的代数（多worker部署时由刷新视图的worker统一分配）。
+        """
+        errors = k8s_metrics.get("errors", {})
+        self.degraded = bool(errors)
+        inventory = {}
+        for section in SECTIONS:
+            if section in errors:
+                inventory[section] = self.current[section]
+            else:
+                key = _KEY_FUNCS[section]
+                inventory[section] = {key(item): item for item in k8s_metrics.get(section, [])}
+
+        if inventory == self.current and self.generation and generation in (None, self.generation):
+            return self.generation
+
+        # 毫秒时间戳作为代数，进程重启后仍单调递增
+        self.generation = generation if generation is not None else max(self.generation + 1, int(time.time() * 1000))
+        self.current = inventory
+        self._history[self.generation] = inventory
+        while len(self._history) > self.history_size:
+            self._history.popitem(last=False)
+        return self.generation
+
+    def listing(self) -> Dict[str, List[Dict[str, Any]]]:
+        """当前完整清单"""
+        return {section: list(self.current[section].values()) for section in SECTIONS}
+
+    def delta(self, since: int) -> Optional[Dict[str, Dict[str, Any]]]:
+        """相对某一代的变化；该代已不在历史中（过旧或来自其他进程）时返回None"""
+        previous = self._history.get(since)
+        if previous is None:
+            return None
+
+        changes = {}
+        for section in SECTIONS:
+            old, new = previous[section], self.current[section]
+            changes[section] = {
+                "added": [new[key] for key in new.keys() - old.keys()],
+                "removed": sorted(old.keys() - new.keys()),
+                "changed": [new[key] for key in new.keys() & old.keys() if new[key] != old[key]]
+            }
+        return changes
+
+    def counts(self) -> Dict[str, int]:
+        nodes = self.current["nodes"].values()
+        pods = self.current["pods"].values()
+        return {
+            "node_count": len(nodes),
+            "pod_count": len(pods),
+            "ready_nodes": sum(1 for node in nodes if node.get("ready")),
+            "running_pods": sum(1 for pod in pods if pod.get("phase") == "Running")
+        }
+
+
+# 全局清单实例（由Kubernetes概览物化视图更新）
+kubernetes_inventory = KubernetesInventory()
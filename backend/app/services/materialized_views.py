@@ -0,0 +1,262 @@
+"""
+物化视图引擎
+后台asyncio任务按各自的刷新间隔重新计算已注册的视图（系统概览、Prometheus汇总、Kubernetes概览、告警状态等），
+结果序列化为JSON字节并附带代数（generation）。请求只需返回已序列化的字节，开销与查看人数和数据规模无关。
+
+多worker部署时只有持有视图锁的worker刷新视图，并把结果写入共享目录（每个视图一个文件，原子替换）；
+其他worker按文件修改时间重新加载。代数取毫秒时间戳并保持单调递增，所有worker对同一版本给出相同的ETag，
+客户端在worker之间切换时仍能得到304。
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from app.api.conditional import etag_matches, make_etag
+from app.api.responses import dumps
+from app.monitoring.multiprocess import MULTIPROC_DIR, VIEWS_LEADER_LOCK_FILE, LeaderElection, is_multiprocess_mode
+
+
+class MaterializedView:
+    """单个物化视图"""
+
+    def __init__(self, name: str, builder: Callable[[], Awaitable[Any]], interval: float,
+                 on_load: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.builder = builder
+        self.interval = interval
+        # 从共享目录加载其他worker刷新的内容后调用（用于同步依赖视图内容的进程内状态）
+        self.on_load = on_load
+        self.payload: Optional[bytes] = None
+        self.generation = 0
+        self.updated_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.mtime = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.payload is not None
+
+    @property
+    def etag(self) -> str:
+        return make_etag("view", self.generation)
+
+    def is_fresh(self) -> bool:
+        """视图是否仍可直接使用（超过3个刷新周期未更新视为过期，例如引擎未启动或刷新卡住）"""
+        return self.ready and time.time() - self.updated_at <= self.interval * 3
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "interval": self.interval,
+            "updated_at": self.updated_at,
+            "build_seconds": self.build_seconds,
+            "size_bytes": len(self.payload) if self.payload else 0,
+            "error": self.error
+        }
+
+
+class MaterializationEngine:
+    """物化视图引擎"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.views: Dict[str, MaterializedView] = {}
+        self.directory = directory
+        self.election = LeaderElection(directory, VIEWS_LEADER_LOCK_FILE, "物化视图刷新进程") if directory else None
+        self._bundle: Optional[bytes] = None
+        self._bundle_generation = -1
+        self._tasks: List[asyncio.Task] = []
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def generation(self) -> int:
+        """整体代数：视图代数单调递增，任一视图更新时最大值随之变化"""
+        return max((view.generation for view in self.views.values()), default=0)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.election is None or self.election.is_leader
+
+    def register(self, name: str, builder: Callable[[], Awaitable[Any]], interval: float,
+                 on_load: Optional[Callable[[Any], None]] = None):
+        """注册视图；builder为返回可JSON序列化数据的协程函数"""
+        self.views[name] = MaterializedView(name, builder, interval, on_load)
+
+    def get(self, name: str) -> Optional[MaterializedView]:
+        """获取可直接返回的视图，未就绪或已过期时返回None"""
+        view = self.views.get(name)
+        if view is None:
+            return None
+        if not self.is_leader:
+            self._load(view)
+        if not view.is_fresh():
+            return None
+        return view
+
+    async def aget(self, name: str) -> Optional[MaterializedView]:
+        """get的异步版本：非主进程在线程池中读取并解析共享视图文件，不阻塞事件循环"""
+        view = self.views.get(name)
+        if view is None:
+            return None
+        if not self.is_leader:
+            self._apply(view, await run_in_threadpool(self._read, view))
+        if not view.is_fresh():
+            return None
+        return view
+
+    async def refresh(self, name: str) -> MaterializedView:
+        """立即重新计算一个视图；失败时保留上一版内容"""
+        view = self.views[name]
+        start = time.perf_counter()
+        try:
+            data = await view.builder()
+            view.payload = dumps(data)
+            # 毫秒时间戳作为代数：主进程切换或重启后仍单调递增，不会与旧版本的ETag相同
+            view.generation = max(self.generation + 1, int(time.time() * 1000))
+            view.updated_at = time.time()
+            view.error = None
+        except Exception as e:
+            view.error = str(e)
+            logger.warning(f"⚠️ 物化视图 {name} 刷新失败: {e}")
+        view.build_seconds = time.perf_counter() - start
+        if self.directory and self.is_leader and view.ready:
+            self._save(view)
+        return view
+
+    def bundle(self) -> bytes:
+        """所有就绪视图拼成一个JSON文档；视图内容已是JSON字节，直接拼接而不重新序列化"""
+        generation = self.generation
+        if self._bundle is None or self._bundle_generation != generation:
+            parts = [
+                dumps(name) + b':' + view.payload
+                for name, view in self.views.items() if view.ready
+            ]
+            self._bundle = (
+                b'{"generation":' + str(generation).encode()
+                + b',"views":{' + b','.join(parts) + b'}}'
+            )
+            self._bundle_generation = generation
+        return self._bundle
+
+    @property
+    def bundle_etag(self) -> str:
+        return make_etag("bundle", self.generation)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": any(not task.done() for task in self._tasks),
+            "leader": self.is_leader,
+            "generation": self.generation,
+            "views": {name: view.status() for name, view in self.views.items()}
+        }
+
+    def start(self):
+        """在当前事件循环中为每个视图启动刷新任务"""
+        if self._tasks:
+            return
+        for name in self.views:
+            self._tasks.append(asyncio.create_task(self._refresh_loop(name), name=f"materialize-{name}"))
+        logger.info(f"🧱 物化视图引擎已启动，共 {len(self.views)} 个视图")
+
+    async def stop(self):
+        """停止所有刷新任务"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.election:
+            self.election.release()
+        logger.info("🛑 物化视图引擎已停止")
+
+    async def _refresh_loop(self, name: str):
+        view = self.views[name]
+        while True:
+            # 非主进程每个周期尝试接管，主进程退出后由其他worker继续刷新
+            if self.election is None or self.election.try_acquire():
+                await self.refresh(name)
+            await asyncio.sleep(view.interval)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.view")
+
+    def _save(self, view: MaterializedView):
+        """写入共享目录：第一行为元数据，其后为视图内容"""
+        meta = dumps({
+            "generation": view.generation,
+            "updated_at": view.updated_at,
+            "build_seconds": view.build_seconds,
+            "error": view.error
+        })
+        path = self._path(view.name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(meta + b"\n" + view.payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ 写入物化视图 {view.name} 失败: {e}")
+
+    def _load(self, view: MaterializedView):
+        """共享目录中的视图文件更新过时重新加载"""
+        self._apply(view, self._read(view))
+
+    def _read(self, view: MaterializedView) -> Optional[Tuple[int, Dict[str, Any], bytes, Any]]:
+        """读取并解析更新过的视图文件，返回 (mtime, 元数据, 视图内容, 解析后的内容)；文件未变化或读取失败时返回None
+
+        只做文件读取与解析，不修改视图，可在线程池中执行。
+        """
+        try:
+            mtime = os.stat(self._path(view.name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == view.mtime:
+            return None
+        try:
+            with open(self._path(view.name), "rb") as f:
+                meta, payload = f.read().split(b"\n", 1)
+            meta = orjson.loads(meta)
+            data = orjson.loads(payload) if view.on_load is not None else None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 读取物化视图 {view.name} 失败: {e}")
+            return None
+        return mtime, meta, payload, data
+
+    def _apply(self, view: MaterializedView, loaded: Optional[Tuple[int, Dict[str, Any], bytes, Any]]):
+        """把读取到的视图文件写入视图（在事件循环中执行，on_load回调不会与请求并发修改共享状态）"""
+        if loaded is None or loaded[0] == view.mtime:
+            return
+        mtime, meta, payload, data = loaded
+        try:
+            if view.on_load is not None:
+                view.on_load(data)
+            generation, updated_at = meta["generation"], meta["updated_at"]
+            build_seconds, error = meta["build_seconds"], meta["error"]
+        except (ValueError, KeyError) as e:
+            logger.warning(f"⚠️ 读取物化视图 {view.name} 失败: {e}")
+            return
+        view.payload = payload
+        view.generation = generation
+        view.updated_at = updated_at
+        view.build_seconds = build_seconds
+        view.error = error
+        view.mtime = mtime
+
+
+def view_response(view: MaterializedView, request: Optional[Request] = None) -> Response:
+    """直接返回视图的序列化内容；客户端已持有当前代数时返回304"""
+    headers = {"ETag": view.etag, "X-View-Generation": str(view.generation)}
+    if request is not None and etag_matches(request, view.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=view.payload, media_type="application/json", headers=headers)
+
+
+# 全局物化视图引擎（视图由各API端点模块注册，应用生命周期内启动；多worker部署时视图共享目录位于prometheus多进程目录下）
+materializer = MaterializationEngine(os.path.join(MULTIPROC_DIR, "views") if is_multiprocess_mode() else None)
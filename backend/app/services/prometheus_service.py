@@ -1,187 +1,468 @@
 """
 Prometheus服务集成
-提供与Prometheus API的交互功能
+提供与Prometheus API的交互功能，支持多个后端：
+- ha：后端互为HA副本，请求先发往延迟最低的副本，超过其p95延迟仍未返回时对冲到另一副本，取最先成功的结果
+- federated：后端为各区域独立实例，并发查询全部后端，合并结果并按外部标签去重；
+  每个后端必须配置互不相同的labels（如 {"region": "a"}），否则sum(...)等无标签的聚合结果无法区分来源
 """
 
-import httpx
+import asyncio
+import time
+from collections import deque
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-import json
+
+import httpx
+import orjson
+from loguru import logger
 
 from app.core.config import settings
+from app.monitoring.metrics import app_metrics
+from app.services.promql import PromQLError, parse_step, parse_time
+from app.services.range_chunks import RangeChunk, RangeChunkCache, chunk_seconds, plan_chunks, stitch
+from app.services.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, remaining_budget
+
+
+class PrometheusBackend:
+    """单个Prometheus后端及其近期延迟"""
+
+    def __init__(self, name: str, url: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.labels = labels or {}
+        # 最近成功请求的耗时（秒），用于计算对冲延迟
+        self.latencies: deque = deque(maxlen=200)
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.PROMETHEUS_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.PROMETHEUS_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.PROMETHEUS_BREAKER_HALF_OPEN_CALLS
+        )
+
+    def latency_quantile(self, quantile: float) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * quantile), len(ordered) - 1)]
+
+    def hedge_delay(self) -> float:
+        delay = self.latency_quantile(settings.PROMETHEUS_HEDGE_QUANTILE)
+        if delay is None:
+            return settings.PROMETHEUS_HEDGE_DELAY_DEFAULT
+        return max(delay, settings.PROMETHEUS_HEDGE_DELAY_MIN)
 
 
 class PrometheusService:
     """Prometheus服务类"""
     
-    def __init__(self):
-        self.base_url = "http://prometheus:9090"  # Docker网络中的Prometheus地址
-        self.timeout = 10.0
-    
+    def __init__(self, backends: Optional[List[Dict[str, Any]]] = None, mode: Optional[str] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        backend_configs = backends if backends is not None else settings.PROMETHEUS_BACKENDS
+        if not backend_configs:
+            backend_configs = [{"name": "default", "url": settings.PROMETHEUS_URL}]
+        self.backends = [
+            PrometheusBackend(config.get("name") or config["url"], config["url"], config.get("labels"))
+            for config in backend_configs
+        ]
+        self.mode = mode or settings.PROMETHEUS_MODE
+        self.timeout = settings.PROMETHEUS_TIMEOUT
+        self.dedup_labels = set(settings.PROMETHEUS_DEDUP_LABELS)
+        if self.mode == "federated" and len(self.backends) > 1:
+            self._check_federated_labels()
+        # 自定义传输层（基准测试中替换为内存中的模拟Prometheus）
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+        # 分块范围查询的块缓存与正在查询中的块
+        self.range_cache = RangeChunkCache()
+        self._range_inflight: Dict[tuple, asyncio.Future] = {}
+
+    def _check_federated_labels(self):
+        """联邦模式要求各后端的labels非空且互不相同：合并时以labels区分来源，
+        缺少时不同后端的无标签聚合（sum、count）会被当作同一序列，后一个后端的值被丢弃"""
+        seen = set()
+        for backend in self.backends:
+            identity = tuple(sorted(
+                (key, value) for key, value in backend.labels.items() if key not in self.dedup_labels
+            ))
+            if not identity:
+                raise ValueError(f"联邦模式下后端 {backend.name} 必须配置labels（且不能只包含去重标签）")
+            if identity in seen:
+                raise ValueError(f"联邦模式下后端 {backend.name} 的labels与其他后端重复")
+            seen.add(identity)
+
+    @property
+    def base_url(self) -> str:
+        return self.backends[0].url
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """所有后端共享一个连接池；事件循环变化（如测试中重建应用）时重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def close(self):
+        """关闭共享连接池"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
     async def query(self, query: str, time: Optional[str] = None) -> Dict[str, Any]:
         """执行Prometheus查询"""
+        params = {"query": query}
+        if time:
+            params["time"] = time
+        return await self._execute("/api/v1/query", params)
+    
+    async def query_range(self, query: str, start: str, end: str, step: str = "15s",
+                          cache: bool = True) -> Dict[str, Any]:
+        """执行Prometheus范围查询
+
+        超过PROMETHEUS_RANGE_CHUNK_THRESHOLD的范围按整点小时/天分块并发查询，各块独立缓存后拼接。
+        cache=False 时直接查询而不分块、不写入块缓存（如流式导出：每块只读一次，写入缓存只会挤掉仪表盘的块）。
+        """
+        if not cache:
+            return await self._execute("/api/v1/query_range", {"query": query, "start": start, "end": end, "step": step})
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                params = {"query": query}
-                if time:
-                    params["time"] = time
-                
-                response = await client.get(f"{self.base_url}/api/v1/query", params=params)
-                response.raise_for_status()
-                return response.json()
+            start_ts, end_ts, step_seconds = parse_time(start), parse_time(end), parse_step(step)
+        except PromQLError:
+            start_ts = None
+        if start_ts is not None and end_ts >= start_ts:
+            size = chunk_seconds(end_ts - start_ts, step_seconds)
+            if size is not None:
+                return await self._chunked_range(query, start_ts, end_ts, step_seconds, size)
+        params = {
+            "query": query,
+            "start": start,
+            "end": end,
+            "step": step
+        }
+        return await self._execute("/api/v1/query_range", params)
+
+    async def _chunked_range(self, query: str, start: float, end: float, step: float, size: float) -> Dict[str, Any]:
+        """分块执行范围查询；任一块失败时返回该块的错误"""
+        first, last, chunks = plan_chunks(start, end, step, size)
+        semaphore = asyncio.Semaphore(settings.PROMETHEUS_RANGE_CHUNK_CONCURRENCY)
+
+        async def fetch(chunk: RangeChunk) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._fetch_chunk(query, step, chunk)
+
+        results = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        for result in results:
+            if result.get("status") != "success":
+                return result
+        return stitch(results, first * step, last * step)
+
+    async def _fetch_chunk(self, query: str, step: float, chunk: RangeChunk) -> Dict[str, Any]:
+        """查询单个块：先查缓存，相同的块正在查询时等待同一个请求"""
+        key = chunk.key(query, step)
+        cached = self.range_cache.get(key)
+        if cached is not None:
+            app_metrics.cache_hits_total.labels(cache_type="prometheus_range").inc()
+            return cached
+        app_metrics.cache_misses_total.labels(cache_type="prometheus_range").inc()
+
+        task = self._range_inflight.get(key)
+        if task is None:
+            params = {
+                "query": query,
+                "start": repr(chunk.first * step),
+                "end": repr(chunk.last * step),
+                "step": repr(step)
+            }
+            task = asyncio.ensure_future(self._execute("/api/v1/query_range", params))
+            self._range_inflight[key] = task
+            task.add_done_callback(lambda _: self._range_inflight.pop(key, None))
+            task.add_done_callback(lambda done: self._cache_chunk(key, chunk, done))
+        # shield：某个请求被取消时不影响等待同一块的其他请求
+        return await asyncio.shield(task)
+
+    def _cache_chunk(self, key, chunk: RangeChunk, task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result.get("status") == "success":
+            ttl = (settings.PROMETHEUS_RANGE_CACHE_TTL_IMMUTABLE if chunk.immutable
+                   else settings.PROMETHEUS_RANGE_CACHE_TTL_RECENT)
+            self.range_cache.put(key, result, ttl)
+
+    def backend_status(self) -> List[Dict[str, Any]]:
+        """各后端的近期延迟与连续失败次数"""
+        return [
+            {
+                "name": backend.name,
+                "url": backend.url,
+                "labels": backend.labels,
+                "p50_seconds": backend.latency_quantile(0.5),
+                "p95_seconds": backend.latency_quantile(0.95),
+                "hedge_delay_seconds": backend.hedge_delay(),
+                "circuit": backend.breaker.status()
+            }
+            for backend in self.backends
+        ]
+
+    async def _execute(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if self.mode == "federated" and len(self.backends) > 1:
+                return await self._federated(path, params)
+            return await self._hedged(path, params)
         except Exception as e:
-            print(f"Prometheus query error: {e}")
-            return {"status": "error", "data": {"result": []}}
-    
-    async def query_range(self, query: str, start: str, end: str, step: str = "15s") -> Dict[str, Any]:
-        """执行Prometheus范围查询"""
+            logger.warning(f"⚠️ Prometheus {path} 请求失败: {e}")
+            return {"status": "error", "errorType": _error_type(e), "error": str(e), "data": {"result": []}}
+
+    async def _request(self, backend: PrometheusBackend, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """向单个后端发起请求并记录耗时
+
+        超时取后端超时与当前请求剩余预算中较小者；熔断器打开时直接失败，不占用预算。
+        """
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            raise DeadlineExceeded("请求时间预算已用完")
+        if not backend.breaker.allow():
+            raise CircuitOpenError(f"后端 {backend.name} 熔断中（{backend.breaker.state}）")
+
+        endpoint = path.rsplit('/', 1)[-1]
+        timeout = self.timeout if budget is None else min(self.timeout, budget)
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                params = {
-                    "query": query,
-                    "start": start,
-                    "end": end,
-                    "step": step
-                }
-                
-                response = await client.get(f"{self.base_url}/api/v1/query_range", params=params)
+            # wait_for保证总耗时不超过预算（httpx的超时针对单个读写阶段）
+            response = await asyncio.wait_for(
+                self._get_client().get(f"{backend.url}{path}", params=params, timeout=timeout),
+                timeout
+            )
+            if response.status_code >= 500:
                 response.raise_for_status()
-                return response.json()
-        except Exception as e:
-            print(f"Prometheus query_range error: {e}")
-            return {"status": "error", "data": {"result": []}}
-    
-    async def get_summary_metrics(self) -> Dict[str, Any]:
-        """获取汇总指标"""
+            # 4xx（如查询语法错误）说明后端是健康的，不计入熔断
+            backend.breaker.record_success()
+            response.raise_for_status()
+            # orjson直接解析响应字节，比response.json()（先解码为str再用标准库json解析）快数倍
+            result = orjson.loads(response.content)
+            outcome = "success"
+            backend.latencies.append(time.perf_counter() - start)
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            backend.breaker.record_cancelled()
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                backend.breaker.record_failure()
+            raise
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            # 因请求预算不足而缩短的超时不能说明后端故障
+            if timeout < self.timeout:
+                backend.breaker.record_cancelled()
+            else:
+                backend.breaker.record_failure()
+            raise
+        except Exception:
+            backend.breaker.record_failure()
+            raise
+        finally:
+            app_metrics.prometheus_backend_request_duration_seconds.labels(
+                backend=backend.name, endpoint=endpoint, outcome=outcome
+            ).observe(time.perf_counter() - start)
+
+    def _replica_order(self) -> List[PrometheusBackend]:
+        """熔断关闭者优先、p95延迟低者优先"""
+        def key(backend: PrometheusBackend):
+            p95 = backend.latency_quantile(0.95)
+            return (backend.breaker.state != CircuitBreaker.CLOSED, p95 if p95 is not None else float('inf'))
+        return sorted(self.backends, key=key)
+
+    async def _hedged(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """HA模式：主副本超过对冲延迟未返回（或已失败）时向下一个副本发起请求，取最先成功的结果"""
+        replicas = self._replica_order()
+        pending: Dict[asyncio.Task, PrometheusBackend] = {}
+        last_error: Optional[BaseException] = None
+        # 是否因超过对冲延迟发起过请求（前一个副本失败后的故障转移不算对冲）
+        hedged = False
         try:
-            # 获取节点数量
-            node_count_query = "count(kube_node_info)"
-            node_count_result = await self.query(node_count_query)
-            node_count = 0
-            if node_count_result.get("status") == "success" and node_count_result.get("data", {}).get("result"):
-                node_count = int(float(node_count_result["data"]["result"][0]["value"][1]))
-            
-            # 获取Pod数量
-            pod_count_query = "count(kube_pod_info)"
-            pod_count_result = await self.query(pod_count_query)
-            pod_count = 0
-            if pod_count_result.get("status") == "success" and pod_count_result.get("data", {}).get("result"):
-                pod_count = int(float(pod_count_result["data"]["result"][0]["value"][1]))
-            
-            # 获取运行中的Pod数量
-            running_pods_query = "count(kube_pod_status_phase{phase=\"Running\"})"
-            running_pods_result = await self.query(running_pods_query)
-            running_pods = 0
-            if running_pods_result.get("status") == "success" and running_pods_result.get("data", {}).get("result"):
-                running_pods = int(float(running_pods_result["data"]["result"][0]["value"][1]))
-            
-            # 获取失败的Pod数量
-            failed_pods_query = "count(kube_pod_status_phase{phase=\"Failed\"})"
-            failed_pods_result = await self.query(failed_pods_query)
-            failed_pods = 0
-            if failed_pods_result.get("status") == "success" and failed_pods_result.get("data", {}).get("result"):
-                failed_pods = int(float(failed_pods_result["data"]["result"][0]["value"][1]))
-            
-            return {
-                "node_count": node_count,
-                "pod_count": pod_count,
-                "running_pods": running_pods,
-                "failed_pods": failed_pods
+            for index, backend in enumerate(replicas):
+                pending[asyncio.create_task(self._request(backend, path, params))] = backend
+                # 最后一个副本发出后一直等到全部请求结束
+                timeout = backend.hedge_delay() if index < len(replicas) - 1 else None
+                while pending:
+                    done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        # 超过对冲延迟，向下一个副本发起请求
+                        hedged = True
+                        break
+                    for finished in done:
+                        winner = pending.pop(finished)
+                        if finished.exception() is None:
+                            if hedged:
+                                app_metrics.prometheus_hedged_requests_total.labels(
+                                    backend=winner.name,
+                                    winner="primary" if winner is replicas[0] else "hedge"
+                                ).inc()
+                            return finished.result()
+                        last_error = finished.exception()
+            raise last_error or RuntimeError("没有可用的Prometheus后端")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _federated(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """联邦模式：并发查询全部后端并合并结果"""
+        responses = await asyncio.gather(
+            *(self._request(backend, path, params) for backend in self.backends),
+            return_exceptions=True
+        )
+
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        result_type = None
+        scalar_result = None
+        warnings = []
+        for backend, response in zip(self.backends, responses):
+            if isinstance(response, BaseException) or response.get("status") != "success":
+                warnings.append(f"后端 {backend.name} 查询失败: {response if isinstance(response, BaseException) else response.get('error')}")
+                continue
+            data = response.get("data", {})
+            result_type = result_type or data.get("resultType")
+            result = data.get("result", [])
+            if data.get("resultType") in ("scalar", "string"):
+                scalar_result = scalar_result if scalar_result is not None else result
+                continue
+            for series in result:
+                metric = {**backend.labels, **series.get("metric", {})}
+                key = tuple(sorted((k, v) for k, v in metric.items() if k not in self.dedup_labels))
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = {**series, "metric": metric}
+                elif "values" in series:
+                    existing["values"] = _merge_samples(existing.get("values", []), series["values"])
+
+        if result_type is None:
+            return {"status": "error", "data": {"result": []}, "warnings": warnings}
+
+        response = {
+            "status": "success",
+            "data": {
+                "resultType": result_type,
+                "result": scalar_result if scalar_result is not None else list(merged.values())
             }
+        }
+        if warnings:
+            response["warnings"] = warnings
+        return response
+
+    async def get_summary_metrics(self) -> Dict[str, Any]:
+        """获取汇总指标
+
+        各计数查询并发执行；失败的查询对应字段为None并在errors中给出原因，而不是以0代替。
+        联邦模式下每个后端各返回一条计数序列，按和计算。
+        kube_pod_status_phase 每个Pod每个阶段各有一条序列（当前阶段为1、其余为0），按阶段统计要用sum而不是count。
+        """
+        queries = {
+            "node_count": "count(kube_node_info)",
+            "pod_count": "count(kube_pod_info)",
+            "running_pods": "sum(kube_pod_status_phase{phase=\"Running\"})",
+            "failed_pods": "sum(kube_pod_status_phase{phase=\"Failed\"})"
+        }
+        try:
+            results = await asyncio.gather(*(self.query(query) for query in queries.values()))
         except Exception as e:
             print(f"Error getting summary metrics: {e}")
-            return {
-                "node_count": 0,
-                "pod_count": 0,
-                "running_pods": 0,
-                "failed_pods": 0
-            }
+            results = [{"status": "error", "errorType": "unavailable"}] * len(queries)
+
+        summary: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for key, result in zip(queries, results):
+            if result.get("status") == "success":
+                summary[key] = int(sum(float(r["value"][1]) for r in result.get("data", {}).get("result", [])))
+            else:
+                summary[key] = None
+                errors[key] = result.get("errorType", "unavailable")
+
+        summary["degraded"] = bool(errors)
+        if errors:
+            summary["errors"] = errors
+        return summary
     
     async def get_kubernetes_metrics(self) -> Dict[str, Any]:
-        """获取Kubernetes指标"""
+        """获取Kubernetes指标（节点与Pod查询并发执行，失败部分的计数为None并标记degraded）"""
         try:
-            # 获取节点状态
-            node_status_query = "kube_node_status_condition{condition=\"Ready\"}"
-            node_status_result = await self.query(node_status_query)
-            
-            nodes = []
-            if node_status_result.get("status") == "success":
-                for result in node_status_result.get("data", {}).get("result", []):
-                    node_name = result["metric"].get("node", "unknown")
-                    status = result["metric"].get("status", "Unknown")
-                    nodes.append({
-                        "name": node_name,
-                        "status": status,
-                        "ready": status == "True"
-                    })
-            
-            # 获取Pod状态
-            pod_status_query = "kube_pod_status_phase"
-            pod_status_result = await self.query(pod_status_query)
-            
-            pods = []
-            if pod_status_result.get("status") == "success":
-                for result in pod_status_result.get("data", {}).get("result", []):
-                    pod_name = result["metric"].get("pod", "unknown")
-                    namespace = result["metric"].get("namespace", "default")
-                    phase = result["metric"].get("phase", "Unknown")
-                    pods.append({
-                        "name": pod_name,
-                        "namespace": namespace,
-                        "phase": phase
-                    })
-            
-            return {
-                "nodes": nodes,
-                "pods": pods,
-                "node_count": len(nodes),
-                "pod_count": len(pods),
-                "ready_nodes": len([n for n in nodes if n["ready"]]),
-                "running_pods": len([p for p in pods if p["phase"] == "Running"])
-            }
+            node_status_result, pod_status_result = await asyncio.gather(
+                # 每个节点/Pod对每种状态各有一条序列，只取值为1的当前状态
+                self.query("kube_node_status_condition{condition=\"Ready\"} == 1"),
+                self.query("kube_pod_status_phase == 1")
+            )
         except Exception as e:
             print(f"Error getting kubernetes metrics: {e}")
-            return {
-                "nodes": [],
-                "pods": [],
-                "node_count": 0,
-                "pod_count": 0,
-                "ready_nodes": 0,
-                "running_pods": 0
-            }
+            node_status_result = pod_status_result = {"status": "error", "errorType": "unavailable"}
+
+        errors: Dict[str, str] = {}
+
+        # 节点状态
+        nodes = []
+        nodes_ok = node_status_result.get("status") == "success"
+        if nodes_ok:
+            for result in node_status_result.get("data", {}).get("result", []):
+                node_name = result["metric"].get("node", "unknown")
+                status = result["metric"].get("status", "Unknown")
+                nodes.append({
+                    "name": node_name,
+                    "status": status,
+                    # kube-state-metrics的status标签为小写的true/false/unknown
+                    "ready": status.lower() == "true"
+                })
+        else:
+            errors["nodes"] = node_status_result.get("errorType", "unavailable")
+
+        # Pod状态
+        pods = []
+        pods_ok = pod_status_result.get("status") == "success"
+        if pods_ok:
+            for result in pod_status_result.get("data", {}).get("result", []):
+                pod_name = result["metric"].get("pod", "unknown")
+                namespace = result["metric"].get("namespace", "default")
+                phase = result["metric"].get("phase", "Unknown")
+                pods.append({
+                    "name": pod_name,
+                    "namespace": namespace,
+                    "phase": phase
+                })
+        else:
+            errors["pods"] = pod_status_result.get("errorType", "unavailable")
+
+        metrics = {
+            "nodes": nodes,
+            "pods": pods,
+            "node_count": len(nodes) if nodes_ok else None,
+            "pod_count": len(pods) if pods_ok else None,
+            "ready_nodes": len([n for n in nodes if n["ready"]]) if nodes_ok else None,
+            "running_pods": len([p for p in pods if p["phase"] == "Running"]) if pods_ok else None,
+            "degraded": bool(errors)
+        }
+        if errors:
+            metrics["errors"] = errors
+        return metrics
+    
+    async def get_usage_range(self, metric: str, duration: str = "1h") -> Dict[str, Any]:
+        """CPU/内存使用率的原始范围查询结果（保留每条序列的标签）"""
+        end_time = datetime.now()
+        start_time = end_time - TREND_DURATIONS.get(duration, timedelta(hours=1))
+        return await self.query_range(
+            TREND_QUERIES[metric],
+            start_time.isoformat(),
+            end_time.isoformat(),
+            "1m"
+        )
     
     async def get_cpu_usage_trend(self, duration: str = "1h") -> List[Dict[str, Any]]:
         """获取CPU使用率趋势"""
         try:
-            end_time = datetime.now()
-            if duration == "1h":
-                start_time = end_time - timedelta(hours=1)
-            elif duration == "6h":
-                start_time = end_time - timedelta(hours=6)
-            elif duration == "24h":
-                start_time = end_time - timedelta(hours=24)
-            else:
-                start_time = end_time - timedelta(hours=1)
-            
-            query = "100 - (avg(rate(node_cpu_seconds_total{mode=\"idle\"}[5m])) * 100)"
-            result = await self.query_range(
-                query,
-                start_time.isoformat(),
-                end_time.isoformat(),
-                "1m"
-            )
-            
-            trend_data = []
-            if result.get("status") == "success":
-                for data_point in result.get("data", {}).get("result", []):
-                    if data_point.get("values"):
-                        for value in data_point["values"]:
-                            trend_data.append({
-                                "timestamp": value[0],
-                                "value": float(value[1])
-                            })
-            
-            return trend_data
+            result = await self.get_usage_range("cpu", duration)
+            return _flatten_trend(result)
         except Exception as e:
             print(f"Error getting CPU usage trend: {e}")
             return []
@@ -189,35 +470,53 @@ class PrometheusService:
     async def get_memory_usage_trend(self, duration: str = "1h") -> List[Dict[str, Any]]:
         """获取内存使用率趋势"""
         try:
-            end_time = datetime.now()
-            if duration == "1h":
-                start_time = end_time - timedelta(hours=1)
-            elif duration == "6h":
-                start_time = end_time - timedelta(hours=6)
-            elif duration == "24h":
-                start_time = end_time - timedelta(hours=24)
-            else:
-                start_time = end_time - timedelta(hours=1)
-            
-            query = "(node_memory_MemTotal_bytes - node_memory_MemAvailable_bytes) / node_memory_MemTotal_bytes * 100"
-            result = await self.query_range(
-                query,
-                start_time.isoformat(),
-                end_time.isoformat(),
-                "1m"
-            )
-            
-            trend_data = []
-            if result.get("status") == "success":
-                for data_point in result.get("data", {}).get("result", []):
-                    if data_point.get("values"):
-                        for value in data_point["values"]:
-                            trend_data.append({
-                                "timestamp": value[0],
-                                "value": float(value[1])
-                            })
-            
-            return trend_data
+            result = await self.get_usage_range("memory", duration)
+            return _flatten_trend(result)
         except Exception as e:
             print(f"Error getting memory usage trend: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+TREND_QUERIES = {
+    "cpu": "100 - (avg(rate(node_cpu_seconds_total{mode=\"idle\"}[5m])) * 100)",
+    "memory": "(node_memory_MemTotal_bytes - node_memory_MemAvailable_bytes) / node_memory_MemTotal_bytes * 100"
+}
+
+TREND_DURATIONS = {
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "24h": timedelta(hours=24)
+}
+
+
+def _flatten_trend(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """所有序列的点展开为 {timestamp, value} 列表（旧版趋势接口格式）"""
+    trend_data = []
+    if result.get("status") == "success":
+        for data_point in result.get("data", {}).get("result", []):
+            if data_point.get("values"):
+                for value in data_point["values"]:
+                    trend_data.append({
+                        "timestamp": value[0],
+                        "value": float(value[1])
+                    })
+    return trend_data
+
+
+def _merge_samples(first: List[List[Any]], second: List[List[Any]]) -> List[List[Any]]:
+    """合并同一序列在不同后端的采样点，按时间戳去重并用另一后端补齐缺失点"""
+    samples = {point[0]: point for point in second}
+    samples.update({point[0]: point for point in first})
+    return [samples[ts] for ts in sorted(samples)]
+
+
+def _error_type(error: BaseException) -> str:
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (DeadlineExceeded, httpx.TimeoutException, asyncio.TimeoutError)):
+        return "timeout"
+    return "unavailable"
+
+
+# 全局Prometheus服务实例（各API端点共享连接池与延迟统计）
+prometheus_service = PrometheusService()
@@ -0,0 +1,737 @@
+"""
+PromQL解析、校验与查询成本估算
+- 递归下降解析器，覆盖选择器、范围向量、子查询、offset/@、函数、聚合及带匹配修饰符的二元运算
+- 指标名按白名单校验（支持以*结尾的前缀），函数按已知函数表及参数类型校验
+- 按时间范围、步长、选择器宽度和回溯窗口估算需要读取的样本数，超过预算时自动放大步长或拒绝
+"""
+
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class PromQLError(ValueError):
+    """查询无法解析或不允许执行"""
+
+
+class QueryTooExpensive(PromQLError):
+    """查询成本超过预算且无法通过放大步长降低"""
+
+
+# ---------------------------------------------------------------------------
+# 语法树
+# ---------------------------------------------------------------------------
+
+class Node:
+    """语法树节点基类"""
+
+    def children(self) -> List['Node']:
+        return []
+
+
+class NumberLiteral(Node):
+    def __init__(self, value: float):
+        self.value = value
+
+
+class StringLiteral(Node):
+    def __init__(self, value: str):
+        self.value = value
+
+
+class Matcher:
+    def __init__(self, label: str, op: str, value: str):
+        self.label = label
+        self.op = op
+        self.value = value
+        self._regex = re.compile(f'^(?:{value})$') if op in ('=~', '!~') else None
+
+    def matches(self, value: str) -> bool:
+        if self.op == '=':
+            return value == self.value
+        if self.op == '!=':
+            return value != self.value
+        if self.op == '=~':
+            return bool(self._regex.match(value))
+        return not self._regex.match(value)
+
+
+class VectorSelector(Node):
+    def __init__(self, name: Optional[str], matchers: List[Matcher]):
+        self.name = name
+        self.matchers = matchers
+        self.range: Optional[float] = None  # 范围向量的窗口（秒）
+        self.offset = 0.0
+        self.at: Optional[float] = None
+
+
+class Call(Node):
+    def __init__(self, func: str, args: List[Node]):
+        self.func = func
+        self.args = args
+
+    def children(self):
+        return self.args
+
+
+class Aggregate(Node):
+    def __init__(self, op: str, expr: Node, param: Optional[Node], grouping: List[str], without: bool):
+        self.op = op
+        self.expr = expr
+        self.param = param
+        self.grouping = grouping
+        self.without = without
+
+    def children(self):
+        return [self.param, self.expr] if self.param is not None else [self.expr]
+
+
+class VectorMatching:
+    def __init__(self, on: bool = False, labels: Optional[List[str]] = None,
+                 card: str = 'one-to-one', include: Optional[List[str]] = None):
+        self.on = on
+        self.labels = labels or []
+        self.card = card
+        self.include = include or []
+
+
+class Binary(Node):
+    def __init__(self, op: str, lhs: Node, rhs: Node, return_bool: bool = False,
+                 matching: Optional[VectorMatching] = None):
+        self.op = op
+        self.lhs = lhs
+        self.rhs = rhs
+        self.return_bool = return_bool
+        self.matching = matching or VectorMatching()
+
+    def children(self):
+        return [self.lhs, self.rhs]
+
+
+class Unary(Node):
+    def __init__(self, op: str, expr: Node):
+        self.op = op
+        self.expr = expr
+
+    def children(self):
+        return [self.expr]
+
+
+class Paren(Node):
+    def __init__(self, expr: Node):
+        self.expr = expr
+
+    def children(self):
+        return [self.expr]
+
+
+class Subquery(Node):
+    def __init__(self, expr: Node, range_: float, step: Optional[float]):
+        self.expr = expr
+        self.range = range_
+        self.step = step
+        self.offset = 0.0
+        self.at: Optional[float] = None
+
+    def children(self):
+        return [self.expr]
+
+
+# ---------------------------------------------------------------------------
+# 词法分析
+# ---------------------------------------------------------------------------
+
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+_DURATION = re.compile(r'(?:\d+(?:ms|s|m|h|d|w|y))+')
+_DURATION_PART = re.compile(r'(\d+)(ms|s|m|h|d|w|y)')
+_NUMBER = re.compile(r'0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+_IDENT = re.compile(r'[a-zA-Z_][a-zA-Z0-9_:]*')
+_OPERATORS = ('==', '!=', '<=', '>=', '=~', '!~', '+', '-', '*', '/', '%', '^', '<', '>', '=',
+              '(', ')', '{', '}', '[', ']', ',', ':', '@')
+
+KEYWORDS = {'and', 'or', 'unless', 'by', 'without', 'on', 'ignoring', 'group_left', 'group_right',
+            'bool', 'offset', 'atan2'}
+
+AGGREGATIONS = {'sum', 'avg', 'count', 'min', 'max', 'stddev', 'stdvar', 'group',
+                'topk', 'bottomk', 'quantile', 'count_values'}
+_PARAM_AGGREGATIONS = {'topk', 'bottomk', 'quantile', 'count_values'}
+
+# 函数名 -> 参数类型（'v'即时向量、'm'范围向量、's'标量、'str'字符串），以'*'结尾表示最后一个参数可重复，'?'表示可选
+FUNCTIONS: Dict[str, Tuple[str, ...]] = {
+    'abs': ('v',), 'absent': ('v',), 'absent_over_time': ('m',), 'ceil': ('v',), 'changes': ('m',),
+    'clamp': ('v', 's', 's'), 'clamp_max': ('v', 's'), 'clamp_min': ('v', 's'),
+    'day_of_month': ('v?',), 'day_of_week': ('v?',), 'day_of_year': ('v?',), 'days_in_month': ('v?',),
+    'delta': ('m',), 'deriv': ('m',), 'exp': ('v',), 'floor': ('v',),
+    'histogram_quantile': ('s', 'v'), 'holt_winters': ('m', 's', 's'), 'hour': ('v?',), 'idelta': ('m',),
+    'increase': ('m',), 'irate': ('m',), 'label_join': ('v', 'str', 'str', 'str*'),
+    'label_replace': ('v', 'str', 'str', 'str', 'str'), 'ln': ('v',), 'log2': ('v',), 'log10': ('v',),
+    'minute': ('v?',), 'month': ('v?',), 'predict_linear': ('m', 's'), 'rate': ('m',), 'resets': ('m',),
+    'round': ('v', 's?'), 'scalar': ('v',), 'sgn': ('v',), 'sort': ('v',), 'sort_desc': ('v',),
+    'sqrt': ('v',), 'time': (), 'timestamp': ('v',), 'vector': ('s',), 'year': ('v?',),
+    'avg_over_time': ('m',), 'min_over_time': ('m',), 'max_over_time': ('m',), 'sum_over_time': ('m',),
+    'count_over_time': ('m',), 'quantile_over_time': ('s', 'm'), 'stddev_over_time': ('m',),
+    'stdvar_over_time': ('m',), 'last_over_time': ('m',), 'present_over_time': ('m',),
+}
+
+
+def parse_duration(text: str) -> float:
+    """解析PromQL时长（如 5m、1h30m），返回秒数"""
+    if not _DURATION.fullmatch(text):
+        raise PromQLError(f"无效的时长: {text}")
+    return sum(int(n) * _DURATION_UNITS[unit] for n, unit in _DURATION_PART.findall(text))
+
+
+class Token:
+    __slots__ = ('kind', 'value', 'pos')
+
+    def __init__(self, kind: str, value: str, pos: int):
+        self.kind = kind
+        self.value = value
+        self.pos = pos
+
+
+def tokenize(query: str) -> List[Token]:
+    tokens = []
+    pos = 0
+    length = len(query)
+    while pos < length:
+        char = query[pos]
+        if char.isspace():
+            pos += 1
+            continue
+        if char == '#':
+            end = query.find('\n', pos)
+            pos = length if end == -1 else end
+            continue
+        if char in '"\'`':
+            end = pos + 1
+            value = []
+            while end < length and query[end] != char:
+                if query[end] == '\\' and char != '`' and end + 1 < length:
+                    end += 1
+                    value.append({'n': '\n', 't': '\t'}.get(query[end], query[end]))
+                else:
+                    value.append(query[end])
+                end += 1
+            if end >= length:
+                raise PromQLError(f"位置 {pos} 的字符串未闭合")
+            tokens.append(Token('STRING', ''.join(value), pos))
+            pos = end + 1
+            continue
+        if char.isdigit() or (char == '.' and pos + 1 < length and query[pos + 1].isdigit()):
+            duration = _DURATION.match(query, pos)
+            number = _NUMBER.match(query, pos)
+            if duration and (not number or duration.end() > number.end()):
+                tokens.append(Token('DURATION', duration.group(), pos))
+                pos = duration.end()
+            else:
+                tokens.append(Token('NUMBER', number.group(), pos))
+                pos = number.end()
+            continue
+        ident = _IDENT.match(query, pos)
+        if ident:
+            value = ident.group()
+            lowered = value.lower()
+            if lowered in ('inf', 'nan'):
+                tokens.append(Token('NUMBER', lowered, pos))
+            elif lowered in KEYWORDS:
+                tokens.append(Token('KEYWORD', lowered, pos))
+            else:
+                tokens.append(Token('IDENT', value, pos))
+            pos = ident.end()
+            continue
+        for op in _OPERATORS:
+            if query.startswith(op, pos):
+                tokens.append(Token('OP', op, pos))
+                pos += len(op)
+                break
+        else:
+            raise PromQLError(f"位置 {pos} 存在无法识别的字符: {char!r}")
+    tokens.append(Token('EOF', '', length))
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# 语法分析
+# ---------------------------------------------------------------------------
+
+# 二元运算符优先级（数值越大越先结合）
+_PRECEDENCE = {
+    'or': 1,
+    'and': 2, 'unless': 2,
+    '==': 3, '!=': 3, '<=': 3, '<': 3, '>=': 3, '>': 3,
+    '+': 4, '-': 4,
+    '*': 5, '/': 5, '%': 5, 'atan2': 5,
+    '^': 6,
+}
+_COMPARISON = {'==', '!=', '<=', '<', '>=', '>'}
+_SET_OPERATORS = {'and', 'or', 'unless'}
+
+
+class Parser:
+    """PromQL递归下降解析器"""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.index = 0
+
+    def parse(self) -> Node:
+        if self.peek().kind == 'EOF':
+            raise PromQLError("查询为空")
+        node = self.parse_expr(0)
+        if self.peek().kind != 'EOF':
+            raise self.error("多余的内容")
+        return node
+
+    # 工具方法
+    def peek(self) -> Token:
+        return self.tokens[self.index]
+
+    def next(self) -> Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def accept(self, kind: str, value: Optional[str] = None) -> Optional[Token]:
+        token = self.peek()
+        if token.kind == kind and (value is None or token.value == value):
+            self.index += 1
+            return token
+        return None
+
+    def expect(self, kind: str, value: Optional[str] = None) -> Token:
+        token = self.accept(kind, value)
+        if token is None:
+            raise self.error(f"期望 {value or kind}")
+        return token
+
+    def error(self, message: str) -> PromQLError:
+        token = self.peek()
+        found = token.value or '结尾'
+        return PromQLError(f"位置 {token.pos} 附近解析失败（{found}）: {message}")
+
+    def _binary_operator(self) -> Optional[str]:
+        token = self.peek()
+        if token.kind == 'OP' and token.value in _PRECEDENCE:
+            return token.value
+        if token.kind == 'KEYWORD' and token.value in _PRECEDENCE:
+            return token.value
+        return None
+
+    # 表达式
+    def parse_expr(self, min_precedence: int) -> Node:
+        lhs = self.parse_unary()
+        while True:
+            op = self._binary_operator()
+            if op is None or _PRECEDENCE[op] < min_precedence:
+                return lhs
+            self.next()
+            return_bool = bool(self.accept('KEYWORD', 'bool'))
+            if return_bool and op not in _COMPARISON:
+                raise self.error("bool只能用于比较运算")
+            matching = self.parse_matching(op)
+            # ^ 右结合，其余左结合
+            next_precedence = _PRECEDENCE[op] if op == '^' else _PRECEDENCE[op] + 1
+            rhs = self.parse_expr(next_precedence)
+            lhs = Binary(op, lhs, rhs, return_bool, matching)
+
+    def parse_matching(self, op: str) -> VectorMatching:
+        matching = VectorMatching(card='many-to-many' if op in _SET_OPERATORS else 'one-to-one')
+        keyword = self.accept('KEYWORD', 'on') or self.accept('KEYWORD', 'ignoring')
+        if keyword is None:
+            return matching
+        matching.on = keyword.value == 'on'
+        matching.labels = self.parse_label_list()
+        group = self.accept('KEYWORD', 'group_left') or self.accept('KEYWORD', 'group_right')
+        if group is not None:
+            if op in _SET_OPERATORS:
+                raise self.error("集合运算不支持group修饰符")
+            matching.card = 'many-to-one' if group.value == 'group_left' else 'one-to-many'
+            if self.peek().kind == 'OP' and self.peek().value == '(':
+                matching.include = self.parse_label_list()
+        return matching
+
+    def parse_unary(self) -> Node:
+        token = self.peek()
+        if token.kind == 'OP' and token.value in ('+', '-'):
+            self.next()
+            # 一元运算的优先级高于乘除、低于乘方
+            operand = self.parse_expr(_PRECEDENCE['^'])
+            if isinstance(operand, NumberLiteral):
+                return NumberLiteral(-operand.value if token.value == '-' else operand.value)
+            return Unary(token.value, operand)
+        return self.parse_postfix(self.parse_primary())
+
+    def parse_postfix(self, node: Node) -> Node:
+        while True:
+            if self.accept('OP', '['):
+                window = parse_duration(self.expect('DURATION').value)
+                if self.accept('OP', ':'):
+                    step_token = self.accept('DURATION')
+                    self.expect('OP', ']')
+                    node = Subquery(node, window, parse_duration(step_token.value) if step_token else None)
+                else:
+                    self.expect('OP', ']')
+                    if not isinstance(node, VectorSelector) or node.range is not None:
+                        raise self.error("范围选择只能用于即时向量选择器")
+                    node.range = window
+            elif self.accept('KEYWORD', 'offset'):
+                negative = bool(self.accept('OP', '-'))
+                offset = parse_duration(self.expect('DURATION').value)
+                self._modifier_target(node).offset = -offset if negative else offset
+            elif self.accept('OP', '@'):
+                token = self.next()
+                if token.kind == 'NUMBER':
+                    at = float(token.value)
+                elif token.kind == 'IDENT' and token.value in ('start', 'end') and self.accept('OP', '('):
+                    self.expect('OP', ')')
+                    at = token.value
+                else:
+                    raise self.error("@后需要时间戳或start()/end()")
+                self._modifier_target(node).at = at
+            else:
+                return node
+
+    def _modifier_target(self, node: Node):
+        if isinstance(node, (VectorSelector, Subquery)):
+            return node
+        raise self.error("offset/@只能用于选择器或子查询")
+
+    def parse_primary(self) -> Node:
+        token = self.next()
+        if token.kind == 'NUMBER':
+            return NumberLiteral(float(int(token.value, 16)) if token.value.lower().startswith('0x') else float(token.value))
+        if token.kind == 'STRING':
+            return StringLiteral(token.value)
+        if token.kind == 'OP' and token.value == '(':
+            expr = self.parse_expr(0)
+            self.expect('OP', ')')
+            return Paren(expr)
+        if token.kind == 'OP' and token.value == '{':
+            self.index -= 1
+            return VectorSelector(None, self.parse_matchers())
+        if token.kind == 'IDENT':
+            name = token.value
+            if name in AGGREGATIONS:
+                return self.parse_aggregate(name)
+            if self.peek().kind == 'OP' and self.peek().value == '(':
+                if name not in FUNCTIONS:
+                    raise PromQLError(f"未知函数: {name}")
+                return self.parse_call(name)
+            matchers = self.parse_matchers() if self.peek().kind == 'OP' and self.peek().value == '{' else []
+            return VectorSelector(name, matchers)
+        self.index -= 1
+        raise self.error("期望表达式")
+
+    def parse_matchers(self) -> List[Matcher]:
+        self.expect('OP', '{')
+        matchers = []
+        while not self.accept('OP', '}'):
+            label = self.next()
+            if label.kind not in ('IDENT', 'KEYWORD'):
+                raise self.error("期望标签名")
+            op = self.next()
+            if op.kind != 'OP' or op.value not in ('=', '!=', '=~', '!~'):
+                raise self.error("期望标签匹配运算符")
+            value = self.expect('STRING').value
+            try:
+                matchers.append(Matcher(label.value, op.value, value))
+            except re.error as e:
+                raise PromQLError(f"标签 {label.value} 的正则表达式无效: {e}")
+            if not self.accept('OP', ','):
+                self.expect('OP', '}')
+                break
+        return matchers
+
+    def parse_label_list(self) -> List[str]:
+        self.expect('OP', '(')
+        labels = []
+        while not self.accept('OP', ')'):
+            token = self.next()
+            if token.kind not in ('IDENT', 'KEYWORD'):
+                raise self.error("期望标签名")
+            labels.append(token.value)
+            if not self.accept('OP', ','):
+                self.expect('OP', ')')
+                break
+        return labels
+
+    def parse_args(self) -> List[Node]:
+        self.expect('OP', '(')
+        args = []
+        while not self.accept('OP', ')'):
+            args.append(self.parse_expr(0))
+            if not self.accept('OP', ','):
+                self.expect('OP', ')')
+                break
+        return args
+
+    def parse_call(self, name: str) -> Call:
+        args = self.parse_args()
+        _check_arguments(name, args)
+        return Call(name, args)
+
+    def parse_aggregate(self, op: str) -> Aggregate:
+        grouping, without = [], False
+        modifier = self.accept('KEYWORD', 'by') or self.accept('KEYWORD', 'without')
+        if modifier:
+            without = modifier.value == 'without'
+            grouping = self.parse_label_list()
+        args = self.parse_args()
+        if not modifier:
+            modifier = self.accept('KEYWORD', 'by') or self.accept('KEYWORD', 'without')
+            if modifier:
+                without = modifier.value == 'without'
+                grouping = self.parse_label_list()
+
+        expected = 2 if op in _PARAM_AGGREGATIONS else 1
+        if len(args) != expected:
+            raise PromQLError(f"{op} 需要 {expected} 个参数，实际 {len(args)} 个")
+        param = args[0] if expected == 2 else None
+        expr = args[-1]
+        if value_type(expr) != 'vector':
+            raise PromQLError(f"{op} 的参数必须是即时向量")
+        return Aggregate(op, expr, param, grouping, without)
+
+
+def value_type(node: Node) -> str:
+    """表达式结果类型：scalar / string / vector / matrix"""
+    if isinstance(node, NumberLiteral):
+        return 'scalar'
+    if isinstance(node, StringLiteral):
+        return 'string'
+    if isinstance(node, VectorSelector):
+        return 'matrix' if node.range is not None else 'vector'
+    if isinstance(node, Subquery):
+        return 'matrix'
+    if isinstance(node, (Paren, Unary)):
+        return value_type(node.expr)
+    if isinstance(node, Call):
+        return 'scalar' if node.func in ('scalar', 'time') else 'vector'
+    if isinstance(node, Binary):
+        if value_type(node.lhs) == 'scalar' and value_type(node.rhs) == 'scalar':
+            return 'scalar'
+        return 'vector'
+    return 'vector'
+
+
+_TYPE_CODES = {'v': 'vector', 'm': 'matrix', 's': 'scalar', 'str': 'string'}
+
+
+def _check_arguments(name: str, args: List[Node]):
+    spec = FUNCTIONS[name]
+    required = [s for s in spec if not s.endswith('?')]
+    variadic = bool(spec) and spec[-1].endswith('*')
+    if len(args) < len(required) - (1 if variadic else 0) or (not variadic and len(args) > len(spec)):
+        raise PromQLError(f"函数 {name} 的参数个数不正确")
+    for index, arg in enumerate(args):
+        code = spec[min(index, len(spec) - 1)].rstrip('?*')
+        expected = _TYPE_CODES[code]
+        actual = value_type(arg)
+        if expected != actual:
+            raise PromQLError(f"函数 {name} 的第 {index + 1} 个参数应为{expected}，实际为{actual}")
+
+
+def parse(query: str) -> Node:
+    """解析PromQL查询"""
+    return Parser(query).parse()
+
+
+def walk(node: Node):
+    """深度优先遍历语法树"""
+    yield node
+    for child in node.children():
+        yield from walk(child)
+
+
+# ---------------------------------------------------------------------------
+# 校验与成本估算
+# ---------------------------------------------------------------------------
+
+def metric_allowed(name: str, allowlist: Optional[List[str]] = None) -> bool:
+    for pattern in settings.PROMQL_METRIC_ALLOWLIST if allowlist is None else allowlist:
+        if pattern.endswith('*') and name.startswith(pattern[:-1]):
+            return True
+        if name == pattern:
+            return True
+    return False
+
+
+def selector_metric_name(selector: VectorSelector) -> Optional[str]:
+    if selector.name:
+        return selector.name
+    for matcher in selector.matchers:
+        if matcher.label == '__name__' and matcher.op == '=':
+            return matcher.value
+    return None
+
+
+def validate(node: Node, allowlist: Optional[List[str]] = None):
+    """校验查询中的全部指标名都在白名单内"""
+    for child in walk(node):
+        if isinstance(child, VectorSelector):
+            name = selector_metric_name(child)
+            if name is None:
+                raise PromQLError("选择器必须指定确定的指标名")
+            if not metric_allowed(name, allowlist):
+                raise PromQLError(f"指标 {name} 不在允许查询的范围内")
+
+
+def estimate_series(selector: VectorSelector) -> float:
+    """估算选择器匹配的序列数：等值匹配每个缩小10倍，正则匹配缩小2倍，否定匹配不缩小"""
+    series = float(settings.PROMQL_SERIES_ESTIMATES.get(
+        selector_metric_name(selector) or '', settings.PROMQL_DEFAULT_SERIES_PER_METRIC
+    ))
+    for matcher in selector.matchers:
+        if matcher.label == '__name__':
+            continue
+        if matcher.op == '=':
+            series /= 10
+        elif matcher.op == '=~':
+            series /= 2
+    return max(series, 1.0)
+
+
+def estimate_cost(node: Node, steps: float) -> float:
+    """估算在steps个求值点上执行表达式需要读取的样本数"""
+    scrape = settings.PROMQL_SCRAPE_INTERVAL
+    if isinstance(node, VectorSelector):
+        # 即时向量在每个求值点只取回溯窗口内的最新样本，范围向量读取整个窗口
+        samples = node.range / scrape if node.range is not None else 1.0
+        return estimate_series(node) * max(samples, 1.0) * steps
+    if isinstance(node, Subquery):
+        step = node.step or settings.PROMQL_SUBQUERY_DEFAULT_STEP
+        return estimate_cost(node.expr, steps * max(node.range / step, 1.0))
+    return sum(estimate_cost(child, steps) for child in node.children())
+
+
+def check_lookback(node: Node, budget: float) -> float:
+    """单个求值点的成本（主要由范围向量的回溯窗口决定），超过预算时抛出QueryTooExpensive
+
+    放大步长只能减少求值点数，无法降低每个求值点读取整个回溯窗口的成本，这类查询直接拒绝。
+    """
+    cost = estimate_cost(node, 1)
+    if cost > budget:
+        raise QueryTooExpensive(
+            f"单个求值点预计读取 {int(cost)} 个样本，超过上限 {int(budget)}，请缩小回溯窗口或增加标签过滤条件"
+        )
+    return cost
+
+
+def parse_time(value: Any) -> float:
+    """解析Unix时间戳或RFC3339/ISO时间"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise PromQLError(f"无效的时间: {value}")
+
+
+def parse_step(value: Any) -> float:
+    """步长可以是秒数或PromQL时长"""
+    try:
+        step = float(value)
+    except (TypeError, ValueError):
+        step = parse_duration(str(value))
+    if step <= 0:
+        raise PromQLError("步长必须大于0")
+    return step
+
+
+# 自动放大步长时使用的候选步长（秒）
+_NICE_STEPS = (1, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+
+
+class QueryPlan:
+    """校验后的查询计划"""
+
+    def __init__(self, query: str, node: Node, cost: float, step: Optional[float] = None,
+                 requested_step: Optional[float] = None):
+        self.query = query
+        self.node = node
+        self.cost = cost
+        self.step = step
+        self.requested_step = requested_step
+
+    @property
+    def coarsened(self) -> bool:
+        return self.step is not None and self.step != self.requested_step
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "estimated_samples": int(self.cost),
+            "step": self.step,
+            "requested_step": self.requested_step,
+            "coarsened": self.coarsened
+        }
+
+
+def plan_query(query: str, start: Any = None, end: Any = None, step: Any = None,
+               max_samples: Optional[float] = None) -> QueryPlan:
+    """解析、校验并估算查询成本
+
+    单个求值点（回溯窗口）的成本超过预算时直接拒绝；范围查询总成本超过预算时
+    按候选步长逐级放大步长（同时保证每条序列的点数不超过上限），仍超过预算时抛出QueryTooExpensive。
+    """
+    budget = max_samples or settings.PROMQL_MAX_SAMPLES
+    node = parse(query)
+    validate(node)
+
+    cost = check_lookback(node, budget)
+    if start is None or end is None:
+        return QueryPlan(query, node, cost)
+
+    start_ts, end_ts = parse_time(start), parse_time(end)
+    if end_ts < start_ts:
+        raise PromQLError("结束时间不能早于开始时间")
+    duration = end_ts - start_ts
+    requested_step = parse_step(step or '15s')
+
+    # 每条序列的点数上限决定了最小步长
+    min_step = requested_step
+    if duration / requested_step > settings.PROMQL_MAX_POINTS:
+        min_step = next((s for s in _NICE_STEPS if duration / s <= settings.PROMQL_MAX_POINTS),
+                        duration / settings.PROMQL_MAX_POINTS)
+    candidates = [min_step] + [s for s in _NICE_STEPS if s > min_step] + [max(duration, min_step)]
+    for candidate in candidates:
+        cost = estimate_cost(node, math.floor(duration / candidate) + 1)
+        if cost <= budget:
+            return QueryPlan(query, node, cost, candidate, requested_step)
+    raise QueryTooExpensive(
+        f"查询即使按最大步长执行也需读取 {int(cost)} 个样本，超过上限 {int(budget)}，请缩小时间范围或回溯窗口"
+    )
+
+
+def cap_result(result: Dict[str, Any], max_series: Optional[int] = None,
+               max_points: Optional[int] = None) -> Dict[str, Any]:
+    """限制返回的序列数和每条序列的点数，被截断时在结果中标记truncated"""
+    max_series = max_series or settings.PROMQL_MAX_SERIES
+    max_points = max_points or settings.PROMQL_MAX_POINTS
+    data = result.get("data")
+    if not isinstance(data, dict) or not isinstance(data.get("result"), list):
+        return result
+
+    series = data["result"]
+    truncated = len(series) > max_series
+    if truncated:
+        data["result"] = series = series[:max_series]
+    for item in series:
+        values = item.get("values")
+        if values is not None and len(values) > max_points:
+            item["values"] = values[-max_points:]
+            truncated = True
+    if truncated:
+        result["truncated"] = True
+        result.setdefault("warnings", []).append(
+            f"结果已截断：最多返回 {max_series} 条序列、每条 {max_points} 个点"
+        )
+    return result
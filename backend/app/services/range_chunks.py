@@ -0,0 +1,137 @@
+"""
+长范围查询的分块与缓存
+- 求值点对齐到步长的整数倍，时间范围按整点小时/天切分为块，重叠的时间窗口得到相同的块
+- 已完全落在过去（超过写入延迟）的块内容不再变化，缓存较长时间；包含当前时间的块只短暂缓存
+- 各块结果按序列拼接回一个矩阵
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# (查询, 步长, 首个求值点序号, 最后一个求值点序号)
+ChunkKey = Tuple[str, float, int, int]
+
+# 判断求值点是否落在请求范围内时容许的浮点误差（秒）
+_EPSILON = 1e-3
+
+
+class RangeChunk:
+    """一个子范围：求值点为 step * [first, last]"""
+
+    def __init__(self, first: int, last: int, immutable: bool):
+        self.first = first
+        self.last = last
+        self.immutable = immutable
+
+    def key(self, query: str, step: float) -> ChunkKey:
+        return (query, step, self.first, self.last)
+
+
+def chunk_seconds(duration: float, step: float) -> Optional[float]:
+    """按时间范围选择块大小（小时或天）；范围较短或步长不小于块大小时不分块，返回None"""
+    if duration <= settings.PROMETHEUS_RANGE_CHUNK_THRESHOLD:
+        return None
+    size = 3600.0 if duration <= settings.PROMETHEUS_RANGE_HOUR_CHUNK_MAX else 86400.0
+    if step >= size:
+        return None
+    return size
+
+
+def plan_chunks(start: float, end: float, step: float, size: float,
+                now: Optional[float] = None) -> Tuple[int, int, List[RangeChunk]]:
+    """把请求范围切分为块，返回（首个求值点序号, 最后一个求值点序号, 块列表）
+
+    不可变的块总是取完整的整点范围（便于不同请求复用），拼接时再截取到请求范围；
+    尚可能变化的块只查询请求范围内的部分。
+    """
+    now = time.time() if now is None else now
+    mutable_after = now - settings.PROMETHEUS_RANGE_IMMUTABLE_AFTER
+    first, last = math.ceil(start / step), math.floor(end / step)
+    chunks = []
+    boundary = math.floor(first * step / size) * size
+    while boundary <= last * step:
+        chunk_first = math.ceil(boundary / step)
+        chunk_last = math.ceil((boundary + size) / step) - 1
+        if boundary + size <= mutable_after:
+            chunks.append(RangeChunk(chunk_first, chunk_last, True))
+        else:
+            chunks.append(RangeChunk(max(chunk_first, first), min(chunk_last, last), False))
+        boundary += size
+    return first, last, chunks
+
+
+def _sample_count(result: Dict[str, Any]) -> int:
+    return sum(len(series.get("values", [])) for series in result.get("data", {}).get("result", []))
+
+
+def stitch(results: List[Dict[str, Any]], start: float, end: float) -> Dict[str, Any]:
+    """按时间顺序拼接各块结果，只保留[start, end]内的点"""
+    merged: Dict[Tuple, Dict[str, Any]] = {}
+    warnings: List[str] = []
+    low, high = start - _EPSILON, end + _EPSILON
+    for result in results:
+        warnings.extend(w for w in result.get("warnings", []) if w not in warnings)
+        for series in result.get("data", {}).get("result", []):
+            metric = series.get("metric", {})
+            values = [point for point in series.get("values", []) if low <= point[0] <= high]
+            if not values:
+                continue
+            key = tuple(sorted(metric.items()))
+            target = merged.get(key)
+            if target is None:
+                merged[key] = {"metric": metric, "values": values}
+            else:
+                target["values"].extend(values)
+    stitched = {"status": "success", "data": {"resultType": "matrix", "result": list(merged.values())}}
+    if warnings:
+        stitched["warnings"] = warnings
+    return stitched
+
+
+class RangeChunkCache:
+    """块结果的LRU缓存，按缓存的样本总数限制大小
+
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, max_samples: Optional[int] = None):
+        self.max_samples = max_samples or settings.PROMETHEUS_RANGE_CACHE_MAX_SAMPLES
+        self.samples = 0
+        # 键 -> (过期时间, 结果, 样本数)
+        self._entries: "OrderedDict[ChunkKey, Tuple[float, Dict[str, Any], int]]" = OrderedDict()
+
+    def get(self, key: ChunkKey) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result, samples = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.samples -= samples
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: ChunkKey, result: Dict[str, Any], ttl: float):
+        samples = _sample_count(result)
+        if samples > self.max_samples:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.samples -= previous[2]
+        self._entries[key] = (time.monotonic() + ttl, result, samples)
+        self.samples += samples
+        while self.samples > self.max_samples:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.samples -= evicted
+
+    def clear(self):
+        self._entries.clear()
+        self.samples = 0
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "samples": self.samples, "max_samples": self.max_samples}
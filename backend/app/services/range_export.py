@@ -0,0 +1,117 @@
+"""
+长时间范围查询的流式导出
+时间范围按步长对齐切分为若干块，逐块（有限并发、按顺序输出）向Prometheus查询，
+每块结果转换为NDJSON或CSV行后立即写出并释放，内存占用只与块大小和并发数有关，与总时间范围无关。
+"""
+
+import asyncio
+import csv
+import io
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.api.responses import dumps
+from app.core.config import settings
+from app.services.promql import cap_result
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+# 按块查询的协程函数：(start, end, step) -> Prometheus范围查询结果
+ChunkFetcher = Callable[[float, float, float], Awaitable[Dict[str, Any]]]
+
+
+def split_range(start: float, end: float, step: float, points: int) -> List[Tuple[float, float]]:
+    """把[start, end]切分为每块最多points个求值点的子范围，各块的求值点与整体一致且不重叠"""
+    span = step * max(points - 1, 0)
+    chunks = []
+    cursor = start
+    while cursor <= end:
+        chunk_end = min(cursor + span, end)
+        chunks.append((cursor, chunk_end))
+        cursor = chunk_end + step
+    return chunks
+
+
+def format_labels(metric: Dict[str, str]) -> str:
+    """标签集格式化为PromQL风格的 name{k="v",...}"""
+    labels = {k: v for k, v in metric.items() if k != "__name__"}
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f'{metric.get("__name__", "")}{{{inner}}}'
+
+
+def encode_ndjson(result: Dict[str, Any]) -> bytes:
+    """每个样本一行：{"metric": {...}, "timestamp": ..., "value": ...}"""
+    lines = []
+    for series in result.get("data", {}).get("result", []):
+        metric = dumps(series.get("metric", {}))
+        for timestamp, value in series.get("values", []):
+            lines.append(b'{"metric":' + metric + b',"timestamp":' + dumps(timestamp)
+                         + b',"value":' + dumps(value) + b'}\n')
+    return b"".join(lines)
+
+
+def encode_csv(result: Dict[str, Any]) -> bytes:
+    """每个样本一行：series,timestamp,value"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for series in result.get("data", {}).get("result", []):
+        name = format_labels(series.get("metric", {}))
+        writer.writerows((name, timestamp, value) for timestamp, value in series.get("values", []))
+    return buffer.getvalue().encode()
+
+
+def _encode_notice(format: str, kind: str, message: str) -> bytes:
+    """导出过程中的警告或错误（已开始输出后无法再改HTTP状态码，以行的形式告知客户端）"""
+    if format == "csv":
+        return f"# {kind}: {message}\n".encode()
+    return dumps({kind: message}) + b"\n"
+
+
+async def stream_export(fetch: ChunkFetcher, start: float, end: float, step: float, format: str,
+                        chunk_points: Optional[int] = None,
+                        concurrency: Optional[int] = None) -> AsyncIterator[bytes]:
+    """按块查询并逐块输出导出内容
+
+    最多concurrency个块同时查询，但严格按时间顺序输出；客户端断开时取消尚未完成的块查询。
+    某一块查询失败时输出错误行并结束导出。
+    """
+    chunk_points = chunk_points or settings.PROMQL_EXPORT_CHUNK_POINTS
+    concurrency = concurrency or settings.PROMQL_EXPORT_CONCURRENCY
+    encode = encode_csv if format == "csv" else encode_ndjson
+    chunks = iter(split_range(start, end, step, chunk_points))
+    pending: Deque[asyncio.Task] = deque()
+    warned = False
+
+    def schedule():
+        chunk = next(chunks, None)
+        if chunk is not None:
+            pending.append(asyncio.create_task(fetch(chunk[0], chunk[1], step)))
+
+    if format == "csv":
+        yield b"series,timestamp,value\n"
+    try:
+        for _ in range(concurrency):
+            schedule()
+        while pending:
+            try:
+                result = await pending.popleft()
+            except Exception as e:
+                yield _encode_notice(format, "error", f"导出中断: {str(e)}")
+                return
+            if result.get("status") != "success":
+                yield _encode_notice(format, "error", f"导出中断: {result.get('error', '查询失败')}")
+                return
+            schedule()
+            result = cap_result(result)
+            if result.get("truncated") and not warned:
+                warned = True
+                yield _encode_notice(format, "warning", result["warnings"][-1])
+            yield encode(result)
+            # 当前块编码完成后不再持有其结果
+            del result
+    finally:
+        for task in pending:
+            task.cancel()
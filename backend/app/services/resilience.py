@@ -0,0 +1,110 @@
+"""
+外部依赖调用的容错工具
+- 熔断器：连续失败达到阈值后打开，冷却后半开放行少量探测请求，成功则关闭
+- 请求截止时间：组合接口的所有子查询共享同一个时间预算（通过contextvars在协程间传递）
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class DeadlineExceeded(Exception):
+    """请求的时间预算已用完"""
+
+
+class CircuitBreaker:
+    """熔断器（closed / open / half_open）
+
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._half_open_calls = 0
+
+    def allow(self) -> bool:
+        """是否放行请求；半开状态下放行的请求必须以record_*之一结束"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                return False
+            self._half_open_calls += 1
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """请求被取消（如对冲请求落败），不影响熔断状态，只归还半开探测名额"""
+        if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def retry_after(self) -> Optional[float]:
+        """打开状态下距离进入半开还剩的秒数"""
+        if self.state != self.OPEN:
+            return None
+        return max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after_seconds": self.retry_after()
+        }
+
+
+# 当前请求的截止时间（time.monotonic()），None表示不限制
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """为当前请求设置时间预算；嵌套时取更早的截止时间
+
+    asyncio.gather/create_task创建的子任务会复制当前上下文，子查询自动共享同一预算。
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """当前请求剩余的时间预算（秒），未设置截止时间时返回None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
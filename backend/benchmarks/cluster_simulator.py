@@ -0,0 +1,525 @@
+"""
+大规模集群Prometheus模拟器
+用带种子的模型生成数千节点、十万级Pod规模集群的 kube_node_info、kube_node_status_condition、
+kube_pod_info、kube_pod_status_phase、up 与 node_* 序列：
+- 节点按各自寿命被替换（新节点名不同，启动期间没有序列），偶发NotReady与压力状态
+- Pod持续重建：服务Pod滚动更新、Job运行后变为Succeeded/Failed，少量Pod无法调度或失联
+- CPU、内存、网络与磁盘按日周期叠加短周期波动，计数器从节点启动时开始累计
+所有序列都是时间的解析函数，不保存样本；查询由 promql_eval 按列求值，
+返回与Prometheus HTTP API结构一致的vector/matrix结果，用于离线分析后端在集群规模数据下的内存与延迟。
+
+用法（在backend目录下）：
+    python -m benchmarks.cluster_simulator --nodes 5000 --pods 100000 --port 9090
+    PROMETHEUS_URL=http://127.0.0.1:9090 uvicorn main:app
+    python -m benchmarks.harness --simulator --nodes 5000 --pods 100000
+"""
+
+import argparse
+import math
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.promql import Matcher, PromQLError, VectorSelector, parse_step, parse_time
+from benchmarks.fake_prometheus import FakePrometheus
+from benchmarks.promql_eval import Evaluator, LazyColumn, Storage, Vector, Window, constant_column
+
+DAY = 86400.0
+GIB = 1024.0 ** 3
+# 静态实体（churn=0或无法调度的Pod）使用的寿命，远大于任何查询时间
+_FOREVER = 1e12
+
+CPU_MODES = ["idle", "iowait", "irq", "nice", "softirq", "steal", "system", "user"]
+# 非idle时间在各模式间的分配比例（与CPU_MODES对应）
+_BUSY_SHARES = np.array([0.0, 0.04, 0.01, 0.03, 0.03, 0.02, 0.25, 0.62])
+CONDITIONS = ["Ready", "MemoryPressure", "DiskPressure", "PIDPressure"]
+STATUSES = ["true", "false", "unknown"]
+PHASES = ["Pending", "Running", "Succeeded", "Failed", "Unknown"]
+# Pod类型：服务、Job、无法调度、失联
+_SERVICE, _JOB, _UNSCHEDULABLE, _LOST = range(4)
+
+
+def _mix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两个整数数组的确定性哈希（splitmix64）"""
+    with np.errstate(over="ignore"):
+        x = np.asarray(a).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.asarray(b).astype(np.uint64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _ones(rows: np.ndarray, t: np.ndarray) -> np.ndarray:
+    return np.ones(np.broadcast(rows, t).shape)
+
+
+def _categorical(values: List[str], codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.array(values, dtype=object), codes
+
+
+class Wave:
+    """每个槽位一条 base + Σ amp·sin(ωt + φ) 曲线，积分有解析解（用于生成计数器）"""
+
+    def __init__(self, base: np.ndarray, amplitudes: np.ndarray, periods: List[float], rng: np.random.Generator):
+        self.base = base
+        self.amplitudes = amplitudes
+        self.periods = np.array(periods)
+        self.omega = 2 * math.pi / self.periods
+        self.phase = rng.uniform(0, 2 * math.pi, amplitudes.shape)
+
+    def _angle(self, slots: np.ndarray, t: np.ndarray) -> np.ndarray:
+        # 先对周期取模：Unix时间戳量级的参数会让三角函数既慢又损失精度
+        return self.omega * (t[..., None] % self.periods) + self.phase[slots]
+
+    def at(self, slots: np.ndarray, t: np.ndarray) -> np.ndarray:
+        return self.base[slots] + (self.amplitudes[slots] * np.sin(self._angle(slots, t))).sum(axis=-1)
+
+    def integral(self, slots: np.ndarray, since: np.ndarray, t: np.ndarray) -> np.ndarray:
+        waves = np.cos(self._angle(slots, since)) - np.cos(self._angle(slots, t))
+        return self.base[slots] * (t - since) + (self.amplitudes[slots] / self.omega * waves).sum(axis=-1)
+
+
+class Lifecycle:
+    """一组槽位的生命周期：每个槽位按自身寿命被新实体替换，新实体启动startup秒后开始有序列"""
+
+    def __init__(self, lifetime: np.ndarray, offset: np.ndarray, startup: np.ndarray):
+        self.lifetime = lifetime
+        self.offset = offset
+        self.startup = startup
+
+    def state(self, slots: np.ndarray, t: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回（代数, 创建时间, 序列开始时间）"""
+        lifetime, offset = self.lifetime[slots], self.offset[slots]
+        generation = np.floor((t + offset) / lifetime)
+        born = generation * lifetime - offset
+        return generation.astype(np.int64), born, born + self.startup[slots]
+
+
+class Family:
+    """一个指标族：行数固定，每行属于一个槽位，标签与取值由时间决定
+
+    static为不随时间变化的标签（类别值 + 每行的编码），dynamic为随实体代数变化的标签（如节点名），
+    value(rows, t)按广播规则计算样本值（rows形如(R, 1)，t形如(R, S)或(1, S)）。
+    """
+
+    def __init__(self, name: str, lifecycle: Lifecycle, slots: np.ndarray,
+                 static: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 dynamic: Dict[str, Callable[[np.ndarray, float], np.ndarray]],
+                 value: Callable[[np.ndarray, np.ndarray], np.ndarray]):
+        self.name = name
+        self.lifecycle = lifecycle
+        self.slots = slots
+        self.static = static
+        self.dynamic = dynamic
+        self.value = value
+        self._masks: Dict[Tuple[str, str, str], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def static_mask(self, matcher: Matcher) -> np.ndarray:
+        """静态标签的匹配结果按匹配器缓存（只需对类别值做一次匹配）"""
+        key = (matcher.label, matcher.op, matcher.value)
+        mask = self._masks.get(key)
+        if mask is None:
+            categories, codes = self.static[matcher.label]
+            matched = np.array([matcher.matches(value) for value in categories], dtype=bool)
+            mask = self._masks[key] = matched[codes]
+        return mask
+
+    def labels(self, rows: np.ndarray, t: float) -> Dict[str, Any]:
+        labels: Dict[str, Any] = {"__name__": constant_column(self.name, len(rows))}
+        for label, (categories, codes) in self.static.items():
+            labels[label] = LazyColumn(lambda r, categories=categories, codes=codes: categories[codes[r]], rows)
+        for label, fn in self.dynamic.items():
+            labels[label] = LazyColumn(lambda r, fn=fn: fn(r, t), rows)
+        return labels
+
+
+class ClusterWindow(Window):
+    """模拟集群的范围向量：样本位于抓取间隔的整数倍时刻，只包含当前代的序列"""
+
+    def __init__(self, parts: List[Tuple[Family, np.ndarray, np.ndarray]], labels: Dict[str, Any],
+                 start: float, end: float, scrape_interval: float):
+        super().__init__(labels, start, end)
+        self.parts = parts
+        self.scrape_interval = scrape_interval
+        self.last_t = math.floor(end / scrape_interval) * scrape_interval
+        self.first_t = (math.floor(start / scrape_interval) + 1) * scrape_interval
+
+    def __len__(self) -> int:
+        return sum(len(rows) for _, rows, _ in self.parts)
+
+    def samples(self):
+        times = np.arange(self.first_t, self.last_t + self.scrape_interval / 2, self.scrape_interval)
+        values, valid = [], []
+        for family, rows, since in self.parts:
+            values.append(family.value(rows[:, None], times[None, :]))
+            valid.append(times[None, :] >= since[:, None])
+        if not values:
+            return times, np.empty((0, len(times))), np.empty((0, len(times)), dtype=bool)
+        return times, np.concatenate(values), np.concatenate(valid)
+
+    def endpoints(self):
+        scrape = self.scrape_interval
+        parts = {"count": [], "first_t": [], "first_v": [], "prev_t": [], "prev_v": [], "last_t": [], "last_v": []}
+        for family, rows, since in self.parts:
+            first = np.maximum(self.first_t, np.ceil(since / scrape) * scrape)
+            last = np.full(len(rows), self.last_t)
+            previous = np.maximum(last - scrape, first)
+            values = family.value(rows[:, None], np.stack([first, previous, last], axis=1))
+            parts["count"].append(np.round((last - first) / scrape).astype(np.int64) + 1)
+            for i, name in enumerate(("first", "prev", "last")):
+                parts[f"{name}_t"].append((first, previous, last)[i])
+                parts[f"{name}_v"].append(values[:, i])
+        return {key: np.concatenate(arrays) if arrays else np.empty(0) for key, arrays in parts.items()}
+
+
+class ClusterModel(Storage):
+    """带种子的大规模集群模型
+
+    churn为实体替换速度的倍数（0表示节点与Pod都不替换）；同一seed下任意时刻的数据完全相同。
+    """
+
+    def __init__(self, nodes: int = 5000, pods: int = 100000, seed: int = 42, churn: float = 1.0,
+                 scrape_interval: float = 15.0):
+        self.node_count = nodes
+        self.pod_count = pods
+        self.scrape_interval = scrape_interval
+        self._node_names: Tuple[Optional[float], np.ndarray] = (None, np.empty(0, dtype=object))
+        rng = np.random.default_rng(seed)
+        self._build_nodes(rng, churn)
+        self._build_pods(rng, churn)
+        self.families: Dict[str, Family] = {}
+        self._add_node_families()
+        self._add_pod_families()
+
+    # 节点
+    def _build_nodes(self, rng: np.random.Generator, churn: float):
+        n = self.node_count
+        lifetime = rng.uniform(3, 30, n) * DAY / churn if churn > 0 else np.full(n, _FOREVER)
+        self.nodes = Lifecycle(lifetime, rng.uniform(0, 1, n) * lifetime, rng.uniform(120, 600, n))
+        self.node_cpus = rng.choice([4, 8, 16, 32, 64], n, p=[0.1, 0.25, 0.35, 0.2, 0.1])
+        self.node_memory = rng.choice([16, 32, 64, 128, 256], n, p=[0.1, 0.3, 0.3, 0.2, 0.1]) * GIB
+        self.node_disk = np.stack([np.full(n, 100 * GIB), rng.choice([200, 500, 1000], n) * GIB], axis=1)
+
+        # 状态窗口：Ready条件偶发故障，其余条件偶发压力
+        self.condition_period = np.column_stack([rng.uniform(2, 20, n)] + [rng.uniform(5, 50, n)] * 3) * DAY
+        self.condition_duration = np.column_stack([rng.uniform(60, 900, n)] + [rng.uniform(300, 3600, n)] * 3)
+        self.condition_offset = rng.uniform(0, 1, (n, 4)) * self.condition_period
+
+        cpu_base = rng.beta(2, 5, n) * 0.7 + 0.05
+        cpu_swing = np.minimum(cpu_base - 0.01, 0.9 - cpu_base) * rng.uniform(0.3, 0.9, n)
+        self.cpu_wave = Wave(cpu_base, np.column_stack([cpu_swing * 0.7, cpu_swing * 0.3]), [DAY, 1020.0], rng)
+        memory_base = rng.uniform(0.3, 0.8, n)
+        memory_swing = np.minimum(memory_base - 0.05, 0.95 - memory_base) * 0.5
+        self.memory_wave = Wave(memory_base, np.column_stack([memory_swing * 0.8, memory_swing * 0.2]),
+                                [DAY, 2700.0], rng)
+        disk_base = rng.uniform(0.3, 0.9, n)
+        self.disk_wave = Wave(disk_base, np.column_stack([np.minimum(disk_base - 0.05, 0.05)]), [3 * DAY], rng)
+        receive = np.exp(rng.normal(math.log(2e6), 1.0, n))
+        self.receive_wave = Wave(receive, np.column_stack([receive * 0.4, receive * 0.1]), [DAY, 600.0], rng)
+        transmit = receive * rng.uniform(0.3, 1.2, n)
+        self.transmit_wave = Wave(transmit, np.column_stack([transmit * 0.4, transmit * 0.1]), [DAY, 600.0], rng)
+
+        self.node_ips = [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(n)]
+        self.node_kernel = rng.integers(0, 3, n)
+        self.node_kubelet = rng.integers(0, 2, n)
+
+    def node_names(self, slots: np.ndarray, t: float) -> np.ndarray:
+        # 同一求值时刻的多个选择器（如二元运算两侧）共用全部节点名
+        cached_t, names = self._node_names
+        if cached_t != t:
+            all_slots = np.arange(self.node_count)
+            generation, _, _ = self.nodes.state(all_slots, t)
+            suffixes = (_mix(all_slots, generation) & np.uint64(0xFFFFF)).tolist()
+            names = np.array([f"node-{slot:05d}-{suffix:05x}" for slot, suffix in enumerate(suffixes)], dtype=object)
+            self._node_names = (t, names)
+        return names[slots]
+
+    def condition_status(self, slots: np.ndarray, conditions: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """各节点条件的当前状态（STATUSES中的下标）"""
+        period = self.condition_period[slots, conditions]
+        shifted = t + self.condition_offset[slots, conditions]
+        active = shifted % period < self.condition_duration[slots, conditions]
+        # Ready故障时交替报告false与unknown；压力条件正常时为false
+        outage = 1 + (np.floor(shifted / period).astype(np.int64) % 2)
+        return np.where(conditions == 0, np.where(active, outage, 0), np.where(active, 0, 1))
+
+    def _node_counter(self, wave: Wave, slots: np.ndarray, t: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """节点级计数器（自启动以来的积分）与启动以来的秒数
+
+        同一节点的多行（各CPU核、各网卡）在rows中相邻且求值时间相同，按节点去重后只计算一次。
+        """
+        t = np.broadcast_to(t, np.broadcast(slots, t).shape)
+        flat = slots[:, 0]
+        starts = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1]]) if len(flat) else np.empty(0, np.int64)
+        inverse = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(flat)]))
+        unique_slots, unique_t = slots[starts], t[starts]
+        _, _, since = self.nodes.state(unique_slots, unique_t)
+        counter = np.maximum(wave.integral(unique_slots, since, unique_t), 0.0)
+        return counter[inverse], np.maximum(unique_t - since, 0.0)[inverse]
+
+    def _add_node_families(self):
+        n = self.node_count
+        slots = np.arange(n)
+        instances = _categorical([f"{ip}:9100" for ip in self.node_ips], slots)
+        node_exporter = {"instance": instances, "job": _categorical(["node-exporter"], np.zeros(n, dtype=np.int64))}
+
+        def add(name, family_slots, static, value):
+            dynamic = {"node": lambda rows, t: self.node_names(family_slots[rows], t)}
+            self.families[name] = Family(name, self.nodes, family_slots, static, dynamic, value)
+
+        add("up", slots, node_exporter, _ones)
+        add("kube_node_info", slots, {
+            "internal_ip": _categorical(self.node_ips, slots),
+            "kernel_version": _categorical(["5.10.205", "5.15.148", "6.1.79"], self.node_kernel),
+            "kubelet_version": _categorical(["v1.28.9", "v1.29.4"], self.node_kubelet),
+            "os_image": _categorical(["Ubuntu 22.04.4 LTS"], np.zeros(n, dtype=np.int64)),
+            "job": _categorical(["kube-state-metrics"], np.zeros(n, dtype=np.int64))
+        }, _ones)
+
+        # 每个节点每个条件各有true/false/unknown三条序列，当前状态为1，其余为0
+        condition_slots = np.repeat(slots, 12)
+        condition_codes = np.tile(np.repeat(np.arange(4), 3), n)
+        status_codes = np.tile(np.arange(3), 4 * n)
+        add("kube_node_status_condition", condition_slots, {
+            "condition": _categorical(CONDITIONS, condition_codes),
+            "status": _categorical(STATUSES, status_codes),
+            "job": _categorical(["kube-state-metrics"], np.zeros(len(condition_slots), dtype=np.int64))
+        }, lambda rows, t: (self.condition_status(condition_slots[rows], condition_codes[rows], t)
+                            == status_codes[rows]).astype(float))
+
+        # CPU：每个核8个模式；同一节点各核的负载有±10%的差异
+        cpu_node = np.repeat(slots, self.node_cpus)
+        cpu_index = np.concatenate([np.arange(count) for count in self.node_cpus]) if n else np.empty(0, np.int64)
+        cpu_factor = 0.9 + 0.2 * (_mix(cpu_node, cpu_index) % np.uint64(1000)).astype(float) / 1000
+        mode_slots = np.repeat(cpu_node, len(CPU_MODES))
+        mode_cpu = np.repeat(cpu_index, len(CPU_MODES))
+        mode_factor = np.repeat(cpu_factor, len(CPU_MODES))
+        mode_codes = np.tile(np.arange(len(CPU_MODES)), len(cpu_node))
+
+        def cpu_seconds(rows, t):
+            busy, elapsed = self._node_counter(self.cpu_wave, mode_slots[rows], t)
+            busy = busy * mode_factor[rows]
+            mode = mode_codes[rows]
+            return np.where(mode == 0, elapsed - busy, _BUSY_SHARES[mode] * busy)
+
+        add("node_cpu_seconds_total", mode_slots, {
+            "cpu": _categorical([str(i) for i in range(int(self.node_cpus.max(initial=1)))], mode_cpu),
+            "mode": _categorical(CPU_MODES, mode_codes),
+            "instance": (instances[0], mode_slots),
+            "job": (node_exporter["job"][0], np.zeros(len(mode_slots), dtype=np.int64))
+        }, cpu_seconds)
+
+        add("node_memory_MemTotal_bytes", slots, node_exporter,
+            lambda rows, t: np.broadcast_to(self.node_memory[rows], np.broadcast(rows, t).shape).astype(float))
+        add("node_memory_MemAvailable_bytes", slots, node_exporter,
+            lambda rows, t: self.node_memory[rows] * (1 - self.memory_wave.at(rows, t)))
+
+        # 文件系统：根分区与kubelet数据盘
+        fs_slots = np.repeat(slots, 2)
+        fs_codes = np.tile(np.arange(2), n)
+        fs_static = {
+            "device": _categorical(["/dev/nvme0n1p1", "/dev/nvme1n1"], fs_codes),
+            "fstype": _categorical(["ext4", "xfs"], fs_codes),
+            "mountpoint": _categorical(["/", "/var/lib/kubelet"], fs_codes),
+            "instance": (instances[0], fs_slots),
+            "job": (node_exporter["job"][0], np.zeros(len(fs_slots), dtype=np.int64))
+        }
+        add("node_filesystem_size_bytes", fs_slots, fs_static,
+            lambda rows, t: np.broadcast_to(self.node_disk[fs_slots[rows], fs_codes[rows]],
+                                            np.broadcast(rows, t).shape).astype(float))
+        add("node_filesystem_avail_bytes", fs_slots, fs_static,
+            lambda rows, t: np.floor(self.node_disk[fs_slots[rows], fs_codes[rows]]
+                                     * (1 - self.disk_wave.at(fs_slots[rows], t))))
+
+        # 网络：eth0与lo（lo的流量为eth0接收量的5%）
+        net_slots = np.repeat(slots, 2)
+        net_codes = np.tile(np.arange(2), n)
+        net_static = {
+            "device": _categorical(["eth0", "lo"], net_codes),
+            "instance": (instances[0], net_slots),
+            "job": (node_exporter["job"][0], np.zeros(len(net_slots), dtype=np.int64))
+        }
+        for name, wave in (("receive", self.receive_wave), ("transmit", self.transmit_wave)):
+            def network_bytes(rows, t, wave=wave):
+                node = net_slots[rows]
+                loopback = self._node_counter(self.receive_wave, node, t)[0] * 0.05
+                return np.floor(np.where(net_codes[rows] == 0, self._node_counter(wave, node, t)[0], loopback))
+            add(f"node_network_{name}_bytes_total", net_slots, net_static, network_bytes)
+
+    # Pod
+    def _build_pods(self, rng: np.random.Generator, churn: float):
+        p = self.pod_count
+        self.pod_kind = rng.choice(4, p, p=[0.8, 0.17, 0.02, 0.01])
+        lifetime = np.where(self.pod_kind == _SERVICE, rng.uniform(0.5, 7, p) * DAY, rng.uniform(600, 7200, p))
+        lifetime = lifetime / churn if churn > 0 else np.full(p, _FOREVER)
+        lifetime = np.where(self.pod_kind >= _UNSCHEDULABLE, _FOREVER, lifetime)
+        self.pods = Lifecycle(lifetime, rng.uniform(0, 1, p) * lifetime, np.zeros(p))
+        self.pod_pending = np.where(self.pod_kind == _JOB, rng.uniform(2, 30, p), rng.uniform(5, 60, p))
+        # 每8个槽位属于同一个工作负载，工作负载分布在150个命名空间
+        workload = np.arange(p) // 8
+        self.pod_namespace = (workload * 7919) % 150
+        prefixes = np.where(self.pod_kind == _JOB, "job", "svc")
+        self.pod_prefix = np.array([f"{prefix}-{index:05d}" for prefix, index in zip(prefixes, workload)],
+                                   dtype=object)
+
+    def pod_phase(self, slots: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """各Pod的当前阶段（PHASES中的下标）"""
+        generation, born, _ = self.pods.state(slots, t)
+        kind = self.pod_kind[slots]
+        age = t - born
+        phase = np.where(age < self.pod_pending[slots], 0, 1)
+        # Job在生命周期的70%处结束，约10%失败；结束后的Pod对象保留到被替换
+        failed = _mix(slots, generation) % np.uint64(10) == 0
+        finished = (kind == _JOB) & (age >= 0.7 * self.pods.lifetime[slots])
+        phase = np.where(finished, np.where(failed, 3, 2), phase)
+        phase = np.where(kind == _UNSCHEDULABLE, 0, phase)
+        return np.where(kind == _LOST, 4, phase)
+
+    def pod_names(self, slots: np.ndarray, t: float) -> np.ndarray:
+        generation, _, _ = self.pods.state(slots, t)
+        suffixes = (_mix(slots, generation) & np.uint64(0xFFFFFFFFFF)).tolist()
+        return np.array([f"{prefix}-{suffix >> 20:05x}-{suffix & 0xFFFFF:05x}"
+                         for prefix, suffix in zip(self.pod_prefix[slots].tolist(), suffixes)], dtype=object)
+
+    def pod_nodes(self, slots: np.ndarray, t: float) -> np.ndarray:
+        generation, _, _ = self.pods.state(slots, t)
+        nodes = (_mix(generation, slots) % np.uint64(max(self.node_count, 1))).astype(np.int64)
+        names = self.node_names(nodes, t) if self.node_count else constant_column("", len(slots))
+        names[self.pod_kind[slots] == _UNSCHEDULABLE] = ""
+        return names
+
+    def _add_pod_families(self):
+        p = self.pod_count
+        slots = np.arange(p)
+        namespaces = [f"team-{i:03d}" for i in range(150)]
+        ksm = _categorical(["kube-state-metrics"], np.zeros(p, dtype=np.int64))
+        self.families["kube_pod_info"] = Family("kube_pod_info", self.pods, slots, {
+            "namespace": _categorical(namespaces, self.pod_namespace),
+            "created_by_kind": _categorical(["ReplicaSet", "Job"], (self.pod_kind == _JOB).astype(np.int64)),
+            "job": ksm
+        }, {
+            "pod": lambda rows, t: self.pod_names(slots[rows], t),
+            "node": lambda rows, t: self.pod_nodes(slots[rows], t)
+        }, _ones)
+
+        # 每个Pod每个阶段一条序列，当前阶段为1，其余为0
+        phase_slots = np.repeat(slots, len(PHASES))
+        phase_codes = np.tile(np.arange(len(PHASES)), p)
+        self.families["kube_pod_status_phase"] = Family("kube_pod_status_phase", self.pods, phase_slots, {
+            "namespace": _categorical(namespaces, self.pod_namespace[phase_slots]),
+            "phase": _categorical(PHASES, phase_codes),
+            "job": (ksm[0], np.zeros(len(phase_slots), dtype=np.int64))
+        }, {
+            "pod": lambda rows, t: self.pod_names(phase_slots[rows], t)
+        }, lambda rows, t: (self.pod_phase(phase_slots[rows], t) == phase_codes[rows]).astype(float))
+
+    # 选择
+    def _matching_families(self, selector: VectorSelector) -> List[Family]:
+        if selector.name:
+            family = self.families.get(selector.name)
+            return [family] if family is not None else []
+        name_matchers = [m for m in selector.matchers if m.label == "__name__"]
+        return [family for name, family in self.families.items() if all(m.matches(name) for m in name_matchers)]
+
+    def _select_rows(self, family: Family, matchers: List[Matcher], t: float) -> Tuple[np.ndarray, np.ndarray]:
+        """匹配且在t时刻已被抓取过的行，以及这些行当前序列的开始时间"""
+        mask = None
+        dynamic = []
+        for matcher in matchers:
+            if matcher.label == "__name__":
+                continue
+            if matcher.label in family.static:
+                matched = family.static_mask(matcher)
+                mask = matched if mask is None else mask & matched
+            elif matcher.label in family.dynamic:
+                dynamic.append(matcher)
+            elif not matcher.matches(""):
+                return np.empty(0, dtype=np.int64), np.empty(0)
+        rows = np.arange(len(family)) if mask is None else np.flatnonzero(mask)
+
+        _, _, since = family.lifecycle.state(family.slots[rows], t)
+        scraped = since <= math.floor(t / self.scrape_interval) * self.scrape_interval
+        rows, since = rows[scraped], since[scraped]
+        for matcher in dynamic:
+            values = family.dynamic[matcher.label](rows, t)
+            keep = np.fromiter((matcher.matches(value) for value in values), dtype=bool, count=len(values))
+            rows, since = rows[keep], since[keep]
+        return rows, since
+
+    def select(self, selector: VectorSelector, t: float) -> Vector:
+        sample_t = math.floor(t / self.scrape_interval) * self.scrape_interval
+        vectors = []
+        for family in self._matching_families(selector):
+            rows, _ = self._select_rows(family, selector.matchers, t)
+            values = family.value(rows[:, None], np.array([[sample_t]]))[:, 0] if len(rows) else np.empty(0)
+            vectors.append(Vector(family.labels(rows, t), values))
+        if len(vectors) == 1:
+            return vectors[0]
+        return Vector.concat(vectors)
+
+    def window(self, selector: VectorSelector, t: float, range_: float) -> Window:
+        parts, labels = [], []
+        for family in self._matching_families(selector):
+            rows, since = self._select_rows(family, selector.matchers, t)
+            parts.append((family, rows, since))
+            labels.append(Vector(family.labels(rows, t), np.zeros(len(rows))))
+        merged = labels[0].labels if len(labels) == 1 else Vector.concat(labels).labels
+        return ClusterWindow(parts, merged, t - range_, t, self.scrape_interval)
+
+    def describe(self, t: float) -> Dict[str, int]:
+        """t时刻的集群规模摘要"""
+        series = {name: len(self._select_rows(family, [], t)[0]) for name, family in self.families.items()}
+        return {"nodes": series["kube_node_info"], "pods": series["kube_pod_info"], "series": sum(series.values())}
+
+
+class ClusterResponder:
+    """FakePrometheus的responder：在ClusterModel上执行查询"""
+
+    def __init__(self, model: ClusterModel):
+        self.model = model
+        self.evaluator = Evaluator(model)
+
+    def __call__(self, path: str, params: Dict[str, str]) -> Dict[str, Any]:
+        query = params.get("query")
+        if not query:
+            raise PromQLError("缺少query参数")
+        if path.endswith("/query_range"):
+            return self.evaluator.query_range(query, parse_time(params["start"]), parse_time(params["end"]),
+                                              parse_step(params.get("step", "15s")))
+        if path.endswith("/query"):
+            return self.evaluator.query(query, parse_time(params["time"]) if "time" in params else time.time())
+        raise PromQLError(f"模拟器不支持的接口: {path}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="大规模集群Prometheus模拟器")
+    parser.add_argument("--nodes", type=int, default=5000, help="节点数")
+    parser.add_argument("--pods", type=int, default=100000, help="Pod数")
+    parser.add_argument("--churn", type=float, default=1.0, help="节点与Pod替换速度的倍数，0表示不替换")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="每个请求额外的固定延迟（毫秒）")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    model = ClusterModel(args.nodes, args.pods, args.seed, args.churn)
+    counts = model.describe(time.time())
+    fake = FakePrometheus(ClusterResponder(model), delay=args.delay_ms / 1000, seed=args.seed,
+                          host=args.host, port=args.port).start()
+    print(f"🚀 模拟Prometheus已启动: {fake.url}（{counts['nodes']} 节点，{counts['pods']} Pod，"
+          f"{counts['series']} 条序列，建模耗时 {time.perf_counter() - started:.1f}s）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+本地模拟Prometheus HTTP服务
+在后台线程中监听（默认127.0.0.1的随机端口），应答 /api/v1/query 与 /api/v1/query_range。
+响应内容由可替换的responder生成；默认的CannedResponder按后端实际使用的几类查询返回固定结构的数据，
+节点数、Pod数与响应延迟可配置，同一seed下结果完全确定。
+"""
+
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import orjson
+
+from app.services.promql import parse_step, parse_time
+
+PHASES = ["Running"] * 16 + ["Pending", "Succeeded", "Failed", "Unknown"]
+
+# (path, 参数) -> Prometheus响应
+Responder = Callable[[str, Dict[str, str]], Dict[str, Any]]
+
+
+def vector(result: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"status": "success", "data": {"resultType": "vector", "result": result}}
+
+
+def matrix(result: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+
+class CannedResponder:
+    """按查询语句的形式返回确定性的模拟数据"""
+
+    def __init__(self, nodes: int = 50, pods: int = 1000, seed: int = 42):
+        rng = random.Random(seed)
+        self.nodes = [f"node-{i:05d}" for i in range(nodes)]
+        self.node_ready = {name: rng.random() > 0.02 for name in self.nodes}
+        self.pods = [
+            {
+                "namespace": f"ns-{i % 40:02d}",
+                "pod": f"app-{i:06d}-{rng.getrandbits(32):08x}",
+                "node": self.nodes[i % nodes] if nodes else "",
+                "phase": rng.choice(PHASES)
+            }
+            for i in range(pods)
+        ]
+
+    def _count(self, query: str) -> Optional[int]:
+        if query == "count(kube_node_info)":
+            return len(self.nodes)
+        if query == "count(kube_pod_info)":
+            return len(self.pods)
+        for phase in ("Running", "Failed", "Pending", "Succeeded", "Unknown"):
+            if query in (f'count(kube_pod_status_phase{{phase="{phase}"}})', f'sum(kube_pod_status_phase{{phase="{phase}"}})'):
+                return sum(1 for pod in self.pods if pod["phase"] == phase)
+        return None
+
+    def instant(self, query: str, at: float) -> Dict[str, Any]:
+        count = self._count(query)
+        if count is not None:
+            return vector([{"metric": {}, "value": [at, str(count)]}])
+        if query.startswith("kube_node_status_condition"):
+            return vector([
+                {
+                    "metric": {"__name__": "kube_node_status_condition", "condition": "Ready", "node": node,
+                               "status": "true" if self.node_ready[node] else "false"},
+                    "value": [at, "1"]
+                }
+                for node in self.nodes
+            ])
+        if query.startswith("kube_pod_status_phase"):
+            return vector([
+                {"metric": {"__name__": "kube_pod_status_phase", **pod}, "value": [at, "1"]}
+                for pod in self.pods
+            ])
+        # 其他查询：每个节点一条序列
+        return vector([
+            {"metric": {"instance": f"{node}:9100", "job": "node"}, "value": [at, "1"]}
+            for node in self.nodes
+        ])
+
+    def range(self, query: str, start: float, end: float, step: float) -> Dict[str, Any]:
+        # 以聚合开头的查询只有一条序列，否则每个节点一条
+        aggregated = query.lstrip("( 0123456789.-").startswith(("avg", "sum", "count", "max", "min"))
+        instances = [None] if aggregated else self.nodes
+        first, last = math.ceil(start / step), math.floor(end / step)
+        result = []
+        for index, node in enumerate(instances):
+            values = [
+                [i * step, f"{50 + 30 * math.sin(i / 60 + index):.4f}"]
+                for i in range(first, last + 1)
+            ]
+            metric = {} if node is None else {"instance": f"{node}:9100", "job": "node"}
+            result.append({"metric": metric, "values": values})
+        return matrix(result)
+
+    def __call__(self, path: str, params: Dict[str, str]) -> Dict[str, Any]:
+        query = params.get("query", "")
+        if path.endswith("/query_range"):
+            return self.range(query, parse_time(params["start"]), parse_time(params["end"]),
+                              parse_step(params.get("step", "15s")))
+        return self.instant(query, parse_time(params["time"]) if "time" in params else time.time())
+
+
+class FakePrometheus:
+    """模拟Prometheus服务
+
+    delay为每个请求的固定延迟（秒），jitter为额外的随机延迟上限（秒）；port为0时监听随机端口。
+    """
+
+    def __init__(self, responder: Optional[Responder] = None, delay: float = 0.0, jitter: float = 0.0,
+                 seed: int = 42, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder or CannedResponder(seed=seed)
+        self.delay = delay
+        self.jitter = jitter
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _sleep_time(self) -> float:
+        with self._lock:
+            self.requests += 1
+            return self.delay + (self._rng.random() * self.jitter if self.jitter else 0.0)
+
+    def start(self) -> "FakePrometheus":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头与响应体分两次写出，关闭Nagle避免与延迟ACK叠加产生约40ms的额外延迟
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                time.sleep(fake._sleep_time())
+                try:
+                    body = orjson.dumps(fake.responder(url.path, params))
+                    status = 200
+                except Exception as e:
+                    body = orjson.dumps({"status": "error", "errorType": "bad_data", "error": str(e)})
+                    status = 400
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-prometheus", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
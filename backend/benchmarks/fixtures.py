@@ -0,0 +1,182 @@
+"""
+确定性的主机数据夹具
+在临时目录中生成 /proc/stat、mountinfo、sockstat 等文件，并替换收集器使用的psutil接口，
+使系统收集器在任何机器上都产出规模可配置、同一seed下完全相同的快照（计数器随tick()确定性递增）。
+"""
+
+import os
+import random
+import shutil
+import tempfile
+from collections import namedtuple
+from contextlib import ExitStack
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from unittest import mock
+
+import psutil
+
+from app.monitoring.collectors import socket_collector as socket_module
+from app.monitoring.collectors.cpu_collector import CpuTimesCollector
+from app.monitoring.collectors.disk_collector import DiskUsageCollector, MountTable
+from app.monitoring.collectors.system_collector import SystemCollector
+
+VirtualMemory = namedtuple("svmem", "total available percent used free")
+SwapMemory = namedtuple("sswap", "total used free percent sin sout")
+DiskUsage = namedtuple("sdiskusage", "total used free percent")
+DiskIO = namedtuple("sdiskio", "read_count write_count read_bytes write_bytes read_time write_time busy_time")
+NetIO = namedtuple("snetio", "bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout")
+Uname = namedtuple("uname_result", "sysname nodename release version machine")
+Address = namedtuple("addr", "ip port")
+Connection = namedtuple("sconn", "fd family type laddr raddr status pid")
+
+_STATUSES = [psutil.STATUS_SLEEPING] * 8 + [psutil.STATUS_RUNNING, psutil.STATUS_ZOMBIE]
+
+
+class FakeHost:
+    """规模可配置的模拟主机"""
+
+    def __init__(self, cpus: int = 16, disks: int = 4, interfaces: int = 4, processes: int = 300,
+                 connections: int = 500, seed: int = 42):
+        self.cpus = cpus
+        self.disks = [f"sd{chr(ord('a') + i)}" for i in range(disks)]
+        self.interfaces = ["lo"] + [f"eth{i}" for i in range(interfaces - 1)]
+        self.connections = connections
+        self.ticks = 0
+        self._rng = random.Random(seed)
+        # 每核每个CPU模式每tick增加的jiffies
+        self._cpu_rates = [[self._rng.randint(1, 40) for _ in range(8)] for _ in range(cpus)]
+        self._processes = [
+            {"pid": 1000 + i, "name": f"proc-{i}", "status": self._rng.choice(_STATUSES),
+             "cpu_percent": round(self._rng.random() * 20, 1)}
+            for i in range(processes)
+        ]
+        self.root = tempfile.mkdtemp(prefix="bench-proc-")
+        self._write_static_files()
+        self._write_stat()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _write(self, name: str, content: str):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def _write_static_files(self):
+        lines = ["22 1 8:0 / / rw,relatime shared:1 - ext4 /dev/sda1 rw"]
+        for i, disk in enumerate(self.disks[1:], start=2):
+            lines.append(f"{22 + i} 22 8:{i * 16} / /data{i - 1} rw,relatime shared:{i} - xfs /dev/{disk}1 rw")
+        self._write("self/mountinfo", "\n".join(lines) + "\n")
+        self._write("net/sockstat", (
+            "sockets: used 812\n"
+            f"TCP: inuse {self.connections} orphan 0 tw 40 alloc {self.connections + 20} mem 12\n"
+            "UDP: inuse 12 mem 4\nUDPLITE: inuse 0\nRAW: inuse 0\nFRAG: inuse 0 memory 0\n"
+        ))
+        self._write("net/sockstat6", "TCP6: inuse 20\nUDP6: inuse 4\nUDPLITE6: inuse 0\nRAW6: inuse 0\n")
+
+    def _write_stat(self):
+        totals = [[rate * self.ticks * 10 for rate in rates] for rates in self._cpu_rates]
+        cpu_lines = [f"cpu{i} " + " ".join(str(v) for v in values) + " 0 0" for i, values in enumerate(totals)]
+        aggregate = [sum(values[mode] for values in totals) for mode in range(8)]
+        self._write("stat", "cpu  " + " ".join(str(v) for v in aggregate) + " 0 0\n" + "\n".join(cpu_lines) + "\n")
+
+    def tick(self):
+        """推进一个采集周期：所有计数器按固定速率增长"""
+        self.ticks += 1
+        self._write_stat()
+
+    # psutil替身
+    def virtual_memory(self):
+        total = 64 * 1024 ** 3
+        used = int(total * (0.4 + 0.01 * (self.ticks % 10)))
+        return VirtualMemory(total, total - used, round(used / total * 100, 1), used, total - used)
+
+    def swap_memory(self):
+        return SwapMemory(8 * 1024 ** 3, 1024 ** 3, 8 * 1024 ** 3 - 1024 ** 3, 12.5, 0, 0)
+
+    def disk_usage(self, mountpoint: str):
+        total = 500 * 1024 ** 3
+        used = total // 3 + len(mountpoint) * 1024 ** 3
+        return DiskUsage(total, used, total - used, round(used / total * 100, 1))
+
+    def disk_io_counters(self, perdisk: bool = False):
+        t = self.ticks
+        counters = {disk: DiskIO(100 * t, 80 * t, 4096 * 100 * t, 4096 * 80 * t, 5 * t, 7 * t, 300 * t)
+                    for disk in self.disks}
+        return counters if perdisk else next(iter(counters.values()))
+
+    def net_io_counters(self, pernic: bool = False):
+        t = self.ticks
+        counters = {nic: NetIO(1500 * 1000 * t, 1500 * 2000 * t, 1000 * t, 2000 * t, 0, 0, 0, 0)
+                    for nic in self.interfaces}
+        if pernic:
+            return counters
+        return NetIO(*(sum(values) for values in zip(*counters.values())))
+
+    def process_iter(self, attrs=None):
+        return [SimpleNamespace(info=dict(process)) for process in self._processes]
+
+    def net_connections(self, kind: str = "inet"):
+        import socket
+        return [
+            Connection(10 + i, socket.AF_INET, socket.SOCK_STREAM, Address("10.0.0.1", 8000),
+                       Address("10.0.1.%d" % (i % 250), 40000 + i), "ESTABLISHED", 1000 + i % 50)
+            for i in range(self.connections)
+        ]
+
+    def install(self, collector: SystemCollector) -> ExitStack:
+        """替换psutil接口与收集器的数据源，返回的ExitStack关闭时还原"""
+        stack = ExitStack()
+        patches: Dict[str, Any] = {
+            "virtual_memory": self.virtual_memory,
+            "swap_memory": self.swap_memory,
+            "disk_usage": self.disk_usage,
+            "disk_io_counters": self.disk_io_counters,
+            "net_io_counters": self.net_io_counters,
+            "process_iter": self.process_iter,
+            "net_connections": self.net_connections,
+            "getloadavg": lambda: (1.5, 1.2, 1.0),
+            "cpu_count": lambda logical=True: self.cpus,
+            "boot_time": lambda: 1700000000.0,
+        }
+        for name, fake in patches.items():
+            stack.enter_context(mock.patch.object(psutil, name, fake))
+        uname = Uname("Linux", "bench-host", "6.1.0", "#1 SMP", "x86_64")
+        stack.enter_context(mock.patch.object(psutil.os, "uname", lambda: uname))
+        stack.enter_context(mock.patch.object(
+            socket_module, "SOCKSTAT_PATHS", (self.path("net/sockstat"), self.path("net/sockstat6"))
+        ))
+
+        disk_collector = DiskUsageCollector()
+        disk_collector.mount_table = MountTable(self.path("self/mountinfo"))
+        stack.enter_context(mock.patch.multiple(
+            collector,
+            cpu_collector=CpuTimesCollector(self.path("stat")),
+            _disk_collector=disk_collector,
+            cgroup_collector=None
+        ))
+        collector.socket_collector.use_netlink = False
+        stack.callback(shutil.rmtree, self.root, True)
+        return stack
+
+    def collect(self, collector: SystemCollector, cycles: int = 2) -> Dict[str, Any]:
+        """执行若干个采集周期（第二个周期起才有速率），发布快照并导出指标"""
+        snapshot: Dict[str, Any] = {}
+        for _ in range(cycles):
+            self.tick()
+            snapshot = collector.collect_snapshot()
+            collector._publish_snapshot(snapshot)
+            collector._update_metrics(snapshot)
+        return snapshot
+
+
+def summarize_snapshot(snapshot: Dict[str, Any]) -> List[str]:
+    """快照规模摘要（打印在基准报告开头）"""
+    return [
+        f"cpus={len(snapshot.get('cpu', {}).get('cpus', []))}",
+        f"partitions={len(snapshot.get('disk', {}).get('partitions', []))}",
+        f"interfaces={len(snapshot.get('network', {}).get('interfaces', {}))}",
+        f"processes={snapshot.get('processes', {}).get('count', 0)}"
+    ]
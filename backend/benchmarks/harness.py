@@ -0,0 +1,305 @@
+"""
+API基准测试
+在进程内启动FastAPI应用（httpx ASGI传输，不经过网络），Prometheus指向本地模拟服务，主机数据来自确定性夹具，
+按指定并发逐个压测 /api/v1 下的接口，报告 p50/p95/p99 延迟、吞吐量与单请求内存分配峰值。
+结果可保存为JSON基线，之后的运行与基线比较，超出容差时以非0状态退出。
+基线与运行机器相关，不随代码提交；CI中先在同一环境生成基线，再以 --check 运行（缺少基线同样失败）。
+
+用法（在backend目录下）：
+    python -m benchmarks.harness --nodes 500 --pods 10000 --concurrency 8 --requests 200
+    python -m benchmarks.harness --simulator --nodes 5000 --pods 100000  # 集群规模的模拟数据
+    python -m benchmarks.harness --save-baseline                # 写入/更新基线
+    python -m benchmarks.harness --baseline benchmarks/baselines/default.json  # 与基线比较
+    python -m benchmarks.harness --check                        # 与基线比较，缺少基线时失败
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+import httpx
+import orjson
+from fastapi.routing import APIRoute
+
+from benchmarks.cluster_simulator import ClusterModel, ClusterResponder
+from benchmarks.fake_prometheus import CannedResponder, FakePrometheus
+from benchmarks.fixtures import FakeHost, summarize_snapshot
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "default.json")
+
+# 需要数据库的接口、调试接口（采样期间阻塞或结果依赖运行状态）以及结果依赖本机连接数的接口不参与压测
+SKIP_PATHS = {
+    "/api/v1/auth/login", "/api/v1/auth/register", "/api/v1/auth/users",
+    "/api/v1/monitoring/system/connections"
+}
+SKIP_PREFIXES = ("/api/v1/debug/",)
+
+_HOUR = 3600
+
+
+def request_specs(app, pattern: Optional[str]) -> List[Dict[str, Any]]:
+    """/api/v1 下所有可压测的接口：GET接口直接请求，POST接口使用示例请求体"""
+    now = int(time.time())
+    bodies = {
+        "/api/v1/prometheus/query": {"query": "up"},
+        "/api/v1/prometheus/query/batch": {"queries": [
+            {"id": "up", "query": "up"},
+            {"id": "nodes", "query": "count(kube_node_info)"},
+            {"id": "pods", "query": "count(kube_pod_info)"},
+            {"id": "cpu", "query": "avg(rate(node_cpu_seconds_total{mode=\"idle\"}[5m]))",
+             "start": str(now - _HOUR), "end": str(now), "step": "60s"}
+        ]},
+        "/api/v1/prometheus/query/export": {
+            "query": "node_memory_MemAvailable_bytes", "start": str(now - 6 * _HOUR), "end": str(now), "step": "60s"
+        },
+        "/api/v1/monitoring/alerts/test": None
+    }
+    specs = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or not route.path.startswith("/api/v1") or "{" in route.path:
+            continue
+        if route.path in SKIP_PATHS or route.path.startswith(SKIP_PREFIXES) or (pattern and not re.search(pattern, route.path)):
+            continue
+        for method in sorted(route.methods):
+            if method == "GET":
+                specs.append({"name": f"GET {route.path}", "method": "GET", "path": route.path})
+            elif route.path in bodies:
+                specs.append({"name": f"{method} {route.path}", "method": method, "path": route.path,
+                              "json": bodies[route.path]})
+    return specs
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def send(client: httpx.AsyncClient, spec: Dict[str, Any]) -> int:
+    """发送请求并读完响应体，返回状态码"""
+    async with client.stream(spec["method"], spec["path"], json=spec.get("json")) as response:
+        async for _ in response.aiter_raw():
+            pass
+        return response.status_code
+
+
+async def run_load(client: httpx.AsyncClient, spec: Dict[str, Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    """以固定并发发送requests个请求"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status = await send(client, spec)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_rps": requests / elapsed
+    }
+
+
+async def measure_allocations(client: httpx.AsyncClient, spec: Dict[str, Any], samples: int) -> float:
+    """逐个发送请求，取单个请求期间Python内存分配峰值的中位数（KB）
+
+    tracemalloc会显著拖慢执行，因此与延迟测量分开进行。
+    """
+    peaks = []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await send(client, spec)
+            peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return peaks[len(peaks) // 2]
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回回退项说明
+
+    延迟和内存允许超出 tolerance 比例（另加少量绝对余量以容忍计时噪声），吞吐量允许下降同样比例。
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: 错误数 {previous.get('errors', 0)} -> {current['errors']}")
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = previous[key] * (1 + tolerance) + 1.0
+            if current[key] > limit:
+                regressions.append(f"{name}: {key} {previous[key]:.2f} -> {current[key]:.2f}（上限 {limit:.2f}）")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: 吞吐量 {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s"
+            )
+        limit = previous["alloc_peak_kb"] * (1 + tolerance) + 64
+        if current["alloc_peak_kb"] > limit:
+            regressions.append(
+                f"{name}: 内存分配峰值 {previous['alloc_peak_kb']:.0f} -> {current['alloc_peak_kb']:.0f} KB"
+            )
+    return regressions
+
+
+def configure_app(app, fake_url: str):
+    """接入模拟Prometheus，并绕过鉴权、数据库与准入限速"""
+    from app.api.api_v1.endpoints import auth as auth_endpoints
+    from app.core import security
+    from app.core.database import get_db
+    from app.services.admission import query_admission
+    from app.services.prometheus_service import PrometheusBackend, prometheus_service
+
+    prometheus_service.backends = [PrometheusBackend("fake", fake_url)]
+    prometheus_service.range_cache.clear()
+
+    user = SimpleNamespace(id=1, username="bench", email=None, is_active=True)
+    app.dependency_overrides[security.get_current_user] = lambda: user
+    app.dependency_overrides[get_db] = lambda: None
+    query_admission.user_rate = query_admission.user_burst = 1e9
+    query_admission.user_concurrency = query_admission.global_concurrency = 10 ** 6
+
+    patches = [
+        mock.patch.object(security, "get_user_roles", lambda db, user_id: ["admin"]),
+        mock.patch.object(auth_endpoints, "get_user_roles", lambda db, user_id: ["admin"])
+    ]
+    for patch in patches:
+        patch.start()
+    return patches
+
+
+async def run(args) -> int:
+    from main import app
+    from app.monitoring.collectors.system_collector import system_collector
+    from app.services.materialized_views import materializer
+    from app.services.prometheus_service import prometheus_service
+
+    if args.simulator:
+        responder = ClusterResponder(ClusterModel(args.nodes, args.pods, args.seed, args.churn))
+    else:
+        responder = CannedResponder(args.nodes, args.pods, args.seed)
+    fake = FakePrometheus(responder, delay=args.delay_ms / 1000, jitter=args.jitter_ms / 1000, seed=args.seed).start()
+    host = FakeHost(cpus=args.cpus, processes=args.processes, seed=args.seed)
+    patches = configure_app(app, fake.url)
+    results: Dict[str, Dict[str, Any]] = {}
+    with host.install(system_collector):
+        snapshot = host.collect(system_collector)
+        # 物化视图与生产环境一样在后台刷新
+        materializer.start()
+        try:
+            for name in materializer.views:
+                await materializer.refresh(name)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                specs = request_specs(app, args.endpoints)
+                print(f"🏁 {len(specs)} 个接口，并发 {args.concurrency}，每个接口 {args.requests} 次请求；"
+                      f"模拟集群 {args.nodes} 节点/{args.pods} Pod；主机 {', '.join(summarize_snapshot(snapshot))}")
+                for spec in specs:
+                    for _ in range(args.warmup):
+                        await send(client, spec)
+                    result = await run_load(client, spec, args.requests, args.concurrency)
+                    result["alloc_peak_kb"] = await measure_allocations(client, spec, args.alloc_samples)
+                    results[spec["name"]] = result
+                    print(f"  {spec['name']:<48} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  "
+                          f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s  "
+                          f"alloc {result['alloc_peak_kb']:8.0f} KB  errors {result['errors']}")
+        finally:
+            await materializer.stop()
+            await prometheus_service.close()
+            for patch in patches:
+                patch.stop()
+            app.dependency_overrides.clear()
+            fake.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("baseline", "save_baseline", "output", "tolerance", "check")},
+        "environment": {"python": platform.python_version(), "machine": platform.machine(),
+                        "cpu_count": os.cpu_count()},
+        "created_at": time.time(),
+        "endpoints": results
+    }
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        print(f"💾 基线已保存: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        if args.check:
+            print(f"❌ 基线文件不存在（{args.baseline}），无法检查回退；先在同一环境用 --save-baseline 生成")
+            return 2
+        print(f"ℹ️ 基线文件不存在（{args.baseline}），跳过比较；使用 --save-baseline 生成")
+        return 0
+    with open(args.baseline, "rb") as f:
+        baseline = orjson.loads(f.read())
+    if baseline.get("config") != report["config"]:
+        print("⚠️ 基线的压测参数与本次不同，比较结果仅供参考")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"❌ 与基线相比有 {len(regressions)} 项回退：")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("✅ 未发现性能回退")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="运维平台API基准测试")
+    parser.add_argument("--nodes", type=int, default=100, help="模拟集群节点数")
+    parser.add_argument("--pods", type=int, default=2000, help="模拟集群Pod数")
+    parser.add_argument("--simulator", action="store_true",
+                        help="使用集群模拟器（按模型求值PromQL，节点与Pod持续变化）代替固定响应")
+    parser.add_argument("--churn", type=float, default=1.0, help="集群模拟器中节点与Pod替换速度的倍数")
+    parser.add_argument("--delay-ms", type=float, default=2.0, help="模拟Prometheus的固定响应延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="模拟Prometheus的随机额外延迟上限（毫秒）")
+    parser.add_argument("--cpus", type=int, default=16, help="模拟主机CPU核数")
+    parser.add_argument("--processes", type=int, default=300, help="模拟主机进程数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="每个接口的请求数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个接口的预热请求数")
+    parser.add_argument("--alloc-samples", type=int, default=5, help="测量内存分配的请求数")
+    parser.add_argument("--endpoints", help="只压测路径匹配该正则的接口")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写为基线")
+    parser.add_argument("--check", action="store_true", help="必须与基线比较：基线不存在时以非0状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的回退比例")
+    parser.add_argument("--output", help="本次结果另存为JSON")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+/prometheus/query/kubernetes 响应体积与CPU开销基准
+在进程内启动应用，Prometheus由内存中的模拟后端代替（按指定的节点数、Pod数生成响应），
+分别测量不压缩、gzip、brotli下每个请求的传输字节数、延迟和CPU时间，
+并对比标准库json与orjson在同一份数据上的序列化/解析耗时。
+
+用法（在backend目录下）：
+    python -m benchmarks.kubernetes_payload --pods 10000 --nodes 500 --requests 50
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.api.compression import brotli
+from app.api.responses import dumps
+from app.services.prometheus_service import prometheus_service
+
+PHASES = ["Running"] * 16 + ["Pending", "Succeeded", "Failed", "Unknown"]
+
+
+def build_prometheus_replies(nodes: int, pods: int, seed: int = 42):
+    """生成两个Kubernetes查询的Prometheus响应字节"""
+    rng = random.Random(seed)
+    now = time.time()
+    node_result = [
+        {
+            "metric": {
+                "__name__": "kube_node_status_condition", "condition": "Ready",
+                "node": f"node-{i:05d}", "status": "True" if rng.random() > 0.02 else "False",
+                "job": "kube-state-metrics", "instance": "kube-state-metrics:8080"
+            },
+            "value": [now, "1"]
+        }
+        for i in range(nodes)
+    ]
+    pod_result = [
+        {
+            "metric": {
+                "__name__": "kube_pod_status_phase", "namespace": f"ns-{i % 40:02d}",
+                "pod": f"app-{i:06d}-{rng.getrandbits(32):08x}", "phase": rng.choice(PHASES),
+                "uid": f"{rng.getrandbits(128):032x}",
+                "job": "kube-state-metrics", "instance": "kube-state-metrics:8080"
+            },
+            "value": [now, "1"]
+        }
+        for i in range(pods)
+    ]
+
+    def reply(result):
+        return orjson.dumps({"status": "success", "data": {"resultType": "vector", "result": result}})
+
+    return {"kube_node_status_condition": reply(node_result), "kube_pod_status_phase": reply(pod_result)}
+
+
+def fake_prometheus(replies):
+    def handler(request: httpx.Request) -> httpx.Response:
+        query = request.url.params.get("query", "")
+        for metric, body in replies.items():
+            if query.startswith(metric):
+                return httpx.Response(200, content=body, headers={"Content-Type": "application/json"})
+        return httpx.Response(200, json={"status": "success", "data": {"resultType": "vector", "result": []}})
+    return httpx.MockTransport(handler)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def measure_endpoint(client: httpx.AsyncClient, encoding: str, requests: int):
+    """逐个发起请求，读取未解压的原始字节，统计字节数、延迟与进程CPU时间"""
+    latencies, sizes = [], []
+    cpu_start = time.process_time()
+    for _ in range(requests):
+        start = time.perf_counter()
+        async with client.stream("GET", "/api/v1/prometheus/query/kubernetes",
+                                 headers={"Accept-Encoding": encoding}) as response:
+            size = 0
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(size)
+    cpu = (time.process_time() - cpu_start) / requests
+    return {
+        "encoding": encoding,
+        "bytes": int(statistics.mean(sizes)),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "cpu_ms": cpu * 1000
+    }
+
+
+def time_call(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def main(args):
+    from main import app
+
+    replies = build_prometheus_replies(args.nodes, args.pods)
+    prometheus_service.transport = fake_prometheus(replies)
+    await prometheus_service.close()
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热（建立连接池、导入路径上的惰性初始化）
+        await client.get("/api/v1/prometheus/query/kubernetes")
+        rows = [await measure_endpoint(client, encoding, args.requests) for encoding in encodings]
+
+    print(f"\n📦 /prometheus/query/kubernetes（{args.nodes} 节点，{args.pods} Pod，每种编码 {args.requests} 次请求）")
+    print(f"{'编码':<10}{'字节/请求':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'CPU(ms)/请求':>14}")
+    for row in rows:
+        print(f"{row['encoding']:<10}{row['bytes']:>14,}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['cpu_ms']:>14.1f}")
+
+    # 同一份数据上标准库与orjson的对比
+    pod_reply = replies["kube_pod_status_phase"]
+    metrics = await prometheus_service.get_kubernetes_metrics()
+    content = {"status": "success", "data": metrics}
+    print("\n⏱️ 序列化/解析耗时（取5次最小值，ms）")
+    print(f"  Prometheus响应解析  json.loads: {time_call(lambda: json.loads(pod_reply.decode())):8.1f}"
+          f"   orjson.loads: {time_call(lambda: orjson.loads(pod_reply)):8.1f}")
+    print(f"  响应序列化  jsonable_encoder+json.dumps: "
+          f"{time_call(lambda: json.dumps(jsonable_encoder(content), ensure_ascii=False).encode()):8.1f}"
+          f"   orjson: {time_call(lambda: dumps(content)):8.1f}")
+    await prometheus_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kubernetes清单接口基准")
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--pods", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
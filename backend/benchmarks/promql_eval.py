@@ -0,0 +1,571 @@
+"""
+基于NumPy的PromQL求值器（供集群模拟器使用）
+复用 app.services.promql 的语法树，覆盖后端与常见面板使用的子集：
+选择器与标签匹配、offset、rate/irate/increase/delta、*_over_time、常用数学函数、
+sum/avg/count/min/max/group/stddev/stdvar/topk/bottomk 聚合（by/without）、
+算术/比较（含bool）/集合运算及 on/ignoring/group_left/group_right 向量匹配。
+数据来源由Storage提供，求值按列进行，标签只在输出时才生成字符串。
+"""
+
+import math
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from app.services.promql import (
+    Aggregate, Binary, Call, NumberLiteral, Paren, PromQLError, StringLiteral, Subquery, Unary,
+    VectorSelector, parse
+)
+
+# ---------------------------------------------------------------------------
+# 数据结构
+# ---------------------------------------------------------------------------
+
+
+class LazyColumn:
+    """按需生成的标签列：fn(rows)返回对应行的标签值（object数组）"""
+
+    __slots__ = ("fn", "rows")
+
+    def __init__(self, fn: Callable[[np.ndarray], np.ndarray], rows: np.ndarray):
+        self.fn = fn
+        self.rows = rows
+
+    def take(self, index: np.ndarray) -> "LazyColumn":
+        return LazyColumn(self.fn, self.rows[index])
+
+    def materialize(self) -> np.ndarray:
+        return self.fn(self.rows)
+
+
+Column = Union[np.ndarray, LazyColumn]
+
+
+def constant_column(value: str, length: int) -> np.ndarray:
+    column = np.empty(length, dtype=object)
+    column[:] = value
+    return column
+
+
+class Vector:
+    """即时向量：标签按列保存（缺失的标签值为空字符串），values为对应的样本值"""
+
+    __slots__ = ("labels", "values")
+
+    def __init__(self, labels: Dict[str, Column], values: np.ndarray):
+        self.labels = labels
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def column(self, name: str) -> np.ndarray:
+        column = self.labels.get(name)
+        if column is None:
+            return constant_column("", len(self))
+        return column.materialize() if isinstance(column, LazyColumn) else column
+
+    def take(self, index: np.ndarray) -> "Vector":
+        return Vector({name: column.take(index) if isinstance(column, LazyColumn) else column[index]
+                       for name, column in self.labels.items()}, self.values[index])
+
+    def with_values(self, values: np.ndarray) -> "Vector":
+        return Vector(self.labels, values)
+
+    def drop(self, *names: str) -> "Vector":
+        return Vector({name: column for name, column in self.labels.items() if name not in names}, self.values)
+
+    def keep(self, names: List[str]) -> "Vector":
+        return Vector({name: column for name, column in self.labels.items() if name in names}, self.values)
+
+    def metrics(self) -> List[Dict[str, str]]:
+        """逐行生成标签字典（省略空值）"""
+        names = list(self.labels)
+        if not names:
+            return [{} for _ in range(len(self))]
+        columns = [self.column(name) for name in names]
+        return [{name: value for name, value in zip(names, row) if value} for row in zip(*columns)]
+
+    @staticmethod
+    def empty() -> "Vector":
+        return Vector({}, np.empty(0))
+
+    @staticmethod
+    def concat(vectors: List["Vector"]) -> "Vector":
+        vectors = [vector for vector in vectors if len(vector)]
+        if not vectors:
+            return Vector.empty()
+        if len(vectors) == 1:
+            return vectors[0]
+        names = {name for vector in vectors for name in vector.labels}
+        labels = {name: np.concatenate([vector.column(name) for vector in vectors]) for name in names}
+        return Vector(labels, np.concatenate([vector.values for vector in vectors]))
+
+
+class Window:
+    """范围向量：每行一条序列在(t - range, t]内的样本
+
+    子类至少实现samples()；rate等只需要首尾样本的函数使用endpoints()，子类可以提供更快的实现。
+    """
+
+    def __init__(self, labels: Dict[str, Column], start: float, end: float):
+        self.labels = labels
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def samples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回（样本时间 (S,)，样本值 (R, S)，有效标记 (R, S)）"""
+        raise NotImplementedError
+
+    def endpoints(self) -> Dict[str, np.ndarray]:
+        """每行的首个、倒数第二个与最后一个样本（时间与值）及样本数"""
+        times, values, valid = self.samples()
+        count = valid.sum(axis=1)
+        columns = np.arange(valid.shape[1])
+        first = np.where(valid, columns, valid.shape[1]).min(axis=1).clip(max=max(valid.shape[1] - 1, 0))
+        last = np.where(valid, columns, -1).max(axis=1).clip(min=0)
+        previous = np.where(valid & (columns < last[:, None]), columns, -1).max(axis=1).clip(min=0)
+        rows = np.arange(len(values))
+        return {
+            "count": count,
+            "first_t": times[first], "first_v": values[rows, first],
+            "prev_t": times[previous], "prev_v": values[rows, previous],
+            "last_t": times[last], "last_v": values[rows, last]
+        }
+
+    def result(self, keep: np.ndarray, values: np.ndarray) -> Vector:
+        """范围向量函数的结果：保留keep对应的行，去掉指标名"""
+        return Vector(self.labels, np.zeros(len(self))).take(keep).drop("__name__").with_values(values)
+
+
+class Storage:
+    """求值器的数据来源"""
+
+    def select(self, selector: VectorSelector, t: float) -> Vector:
+        """即时向量选择：t时刻（回溯窗口内）每条匹配序列的最新样本"""
+        raise NotImplementedError
+
+    def window(self, selector: VectorSelector, t: float, range_: float) -> Window:
+        """范围向量选择"""
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------------
+# 工具函数
+# ---------------------------------------------------------------------------
+
+_ARITHMETIC = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide,
+    '%': np.fmod, '^': np.power, 'atan2': np.arctan2
+}
+_COMPARISON = {
+    '==': np.equal, '!=': np.not_equal, '>': np.greater, '<': np.less,
+    '>=': np.greater_equal, '<=': np.less_equal
+}
+
+_MATH = {
+    'abs': np.abs, 'ceil': np.ceil, 'floor': np.floor, 'exp': np.exp, 'sqrt': np.sqrt,
+    'ln': np.log, 'log2': np.log2, 'log10': np.log10, 'sgn': np.sign
+}
+_OVER_TIME = {'avg_over_time', 'min_over_time', 'max_over_time', 'sum_over_time', 'count_over_time',
+              'last_over_time', 'present_over_time', 'stddev_over_time', 'stdvar_over_time'}
+
+
+def format_value(value: float) -> str:
+    """按Prometheus的习惯格式化样本值"""
+    return format_values(np.array([value]))[0]
+
+
+def format_values(values: np.ndarray) -> List[str]:
+    """批量格式化样本值：整数不带小数点，NaN/Inf使用Prometheus的写法"""
+    formatted = [repr(value) for value in values.tolist()]
+    with np.errstate(invalid="ignore"):
+        integral = np.flatnonzero((values == np.floor(values)) & (np.abs(values) < 1e15))
+    for i in integral.tolist():
+        formatted[i] = str(int(values[i]))
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        value = values[i]
+        formatted[i] = "NaN" if np.isnan(value) else ("+Inf" if value > 0 else "-Inf")
+    return formatted
+
+
+def factorize(columns: List[np.ndarray], length: int) -> np.ndarray:
+    """把多列标签值的组合编码为从0开始的整数（相同组合得到相同编码）"""
+    ids = np.zeros(length, dtype=np.int64)
+    for column in columns:
+        # 字符串列用字典编码（对object数组排序很慢），多列的组合再用整数去重
+        values = column.tolist()
+        index = {value: i for i, value in enumerate(dict.fromkeys(values))}
+        codes = np.fromiter(map(index.__getitem__, values), dtype=np.int64, count=length)
+        _, ids = np.unique(ids * len(index) + codes, return_inverse=True)
+        ids = ids.reshape(-1)
+    return ids
+
+
+def _signature_labels(lhs: Vector, rhs: Vector, on: bool, labels: List[str]) -> List[str]:
+    if on:
+        return list(labels)
+    return sorted((set(lhs.labels) | set(rhs.labels)) - set(labels) - {"__name__"})
+
+
+def _signature_ids(lhs: Vector, rhs: Vector, labels: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """两侧各行的匹配签名编码（在两侧之间可比较）"""
+    columns = [np.concatenate([lhs.column(label), rhs.column(label)]) for label in labels]
+    ids = factorize(columns, len(lhs) + len(rhs))
+    return ids[:len(lhs)], ids[len(lhs):]
+
+
+# ---------------------------------------------------------------------------
+# 求值器
+# ---------------------------------------------------------------------------
+
+Value = Union[float, str, Vector, Window]
+
+
+class Evaluator:
+    """在Storage上对PromQL语法树求值，输出与Prometheus HTTP API一致的结构"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    # 入口
+    def query(self, query: str, t: float) -> Dict[str, Any]:
+        node = parse(query)
+        value = self.evaluate(node, t)
+        if isinstance(value, Vector):
+            result = [{"metric": metric, "value": [t, v]}
+                      for metric, v in zip(value.metrics(), format_values(value.values))]
+            return self._success("vector", result)
+        if isinstance(value, Window):
+            times, values, valid = value.samples()
+            result = []
+            metrics = Vector(value.labels, np.zeros(len(value))).metrics()
+            for metric, row, mask in zip(metrics, values, valid.tolist()):
+                points = [[ts, v] for ts, v, ok in zip(times.tolist(), format_values(row), mask) if ok]
+                if points:
+                    result.append({"metric": metric, "values": points})
+            return self._success("matrix", result)
+        if isinstance(value, str):
+            return self._success("string", [t, value])
+        return self._success("scalar", [t, format_value(value)])
+
+    def query_range(self, query: str, start: float, end: float, step: float) -> Dict[str, Any]:
+        node = parse(query)
+        series: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], Dict[str, Any]] = {}
+        steps = int(math.floor((end - start) / step + 1e-9)) + 1
+        for i in range(max(steps, 0)):
+            t = start + i * step
+            value = self.evaluate(node, t)
+            if isinstance(value, (Window, str)):
+                raise PromQLError("范围查询的表达式必须是标量或即时向量")
+            if isinstance(value, float):
+                entry = series.setdefault(((), ()), {"metric": {}, "values": []})
+                entry["values"].append([t, format_value(value)])
+                continue
+            # 以（标签名, 各行标签值）作为序列的键，只在序列第一次出现时生成标签字典
+            names = tuple(sorted(value.labels))
+            columns = [value.column(name) for name in names]
+            rows = zip(*columns) if names else [()] * len(value)
+            for row, v in zip(rows, format_values(value.values)):
+                entry = series.get((names, row))
+                if entry is None:
+                    metric = {name: label for name, label in zip(names, row) if label}
+                    entry = series[(names, row)] = {"metric": metric, "values": []}
+                entry["values"].append([t, v])
+        return self._success("matrix", list(series.values()))
+
+    @staticmethod
+    def _success(result_type: str, result: Any) -> Dict[str, Any]:
+        return {"status": "success", "data": {"resultType": result_type, "result": result}}
+
+    # 语法树
+    def evaluate(self, node, t: float) -> Value:
+        if isinstance(node, NumberLiteral):
+            return float(node.value)
+        if isinstance(node, StringLiteral):
+            return node.value
+        if isinstance(node, Paren):
+            return self.evaluate(node.expr, t)
+        if isinstance(node, VectorSelector):
+            at = self._selector_time(node, t)
+            if node.range is not None:
+                return self.storage.window(node, at, node.range)
+            return self.storage.select(node, at)
+        if isinstance(node, Unary):
+            value = self.evaluate(node.expr, t)
+            if node.op == '+':
+                return value
+            if isinstance(value, Vector):
+                return value.drop("__name__").with_values(-value.values)
+            return -value
+        if isinstance(node, Call):
+            return self.call(node, t)
+        if isinstance(node, Aggregate):
+            return self.aggregate(node, t)
+        if isinstance(node, Binary):
+            return self.binary(node, t)
+        if isinstance(node, Subquery):
+            raise PromQLError("模拟器不支持子查询")
+        raise PromQLError(f"模拟器不支持的表达式: {type(node).__name__}")
+
+    @staticmethod
+    def _selector_time(node: VectorSelector, t: float) -> float:
+        if node.at is not None:
+            if isinstance(node.at, str):
+                raise PromQLError("模拟器不支持 @ start()/end()")
+            t = node.at
+        return t - node.offset
+
+    # 函数
+    def call(self, node: Call, t: float) -> Value:
+        name = node.func
+        if name == 'time':
+            return float(t)
+        args = [self.evaluate(arg, t) for arg in node.args]
+        if name in ('rate', 'increase', 'delta'):
+            return self._extrapolated(args[0], counter=name != 'delta', per_second=name == 'rate')
+        if name in ('irate', 'idelta'):
+            return self._instant_delta(args[0], per_second=name == 'irate')
+        if name in _OVER_TIME:
+            return self._over_time(name, args[0])
+        if name in _MATH:
+            vector = args[0]
+            with np.errstate(all="ignore"):
+                return vector.drop("__name__").with_values(_MATH[name](vector.values))
+        if name == 'round':
+            vector = args[0]
+            # 与Prometheus相同，乘以倒数再除，避免0.1这类步长产生的浮点误差
+            inverse = 1.0 / (args[1] if len(args) > 1 else 1.0)
+            return vector.drop("__name__").with_values(np.floor(vector.values * inverse + 0.5) / inverse)
+        if name in ('clamp', 'clamp_min', 'clamp_max'):
+            vector = args[0]
+            low = args[1] if name in ('clamp', 'clamp_min') else -np.inf
+            high = args[-1] if name in ('clamp', 'clamp_max') else np.inf
+            if low > high:
+                return Vector.empty()
+            return vector.drop("__name__").with_values(np.clip(vector.values, low, high))
+        if name == 'vector':
+            return Vector({}, np.array([args[0]]))
+        if name == 'scalar':
+            vector = args[0]
+            return float(vector.values[0]) if len(vector) == 1 else math.nan
+        if name in ('sort', 'sort_desc'):
+            vector = args[0]
+            order = np.argsort(vector.values, kind="stable")
+            return vector.take(order[::-1] if name == 'sort_desc' else order)
+        if name == 'absent':
+            if len(args[0]):
+                return Vector.empty()
+            selector = node.args[0]
+            labels = {}
+            if isinstance(selector, VectorSelector):
+                labels = {m.label: np.array([m.value], dtype=object)
+                          for m in selector.matchers if m.op == '=' and m.label != '__name__'}
+            return Vector(labels, np.ones(1))
+        raise PromQLError(f"模拟器不支持函数 {name}")
+
+    @staticmethod
+    def _extrapolated(window: Window, counter: bool, per_second: bool) -> Vector:
+        """与Prometheus相同的外推算法（模拟数据的计数器在同一序列内不会重置）"""
+        points = window.endpoints()
+        keep = points["count"] >= 2
+        first_t, last_t = points["first_t"][keep], points["last_t"][keep]
+        first_v, last_v = points["first_v"][keep], points["last_v"][keep]
+        delta = last_v - first_v
+        sampled = last_t - first_t
+        average = sampled / (points["count"][keep] - 1)
+        to_start = first_t - window.start
+        to_end = window.end - last_t
+        if counter:
+            with np.errstate(all="ignore"):
+                to_zero = np.where((delta > 0) & (first_v >= 0), sampled * first_v / delta, np.inf)
+            to_start = np.minimum(to_start, to_zero)
+        threshold = average * 1.1
+        interval = sampled + np.where(to_start < threshold, to_start, average / 2) \
+            + np.where(to_end < threshold, to_end, average / 2)
+        with np.errstate(all="ignore"):
+            result = delta * (interval / sampled)
+        if per_second:
+            result = result / (window.end - window.start)
+        return window.result(np.flatnonzero(keep), result)
+
+    @staticmethod
+    def _instant_delta(window: Window, per_second: bool) -> Vector:
+        points = window.endpoints()
+        keep = points["count"] >= 2
+        result = points["last_v"][keep] - points["prev_v"][keep]
+        if per_second:
+            result = result / (points["last_t"][keep] - points["prev_t"][keep])
+        return window.result(np.flatnonzero(keep), result)
+
+    @staticmethod
+    def _over_time(name: str, window: Window) -> Vector:
+        _, values, valid = window.samples()
+        count = valid.sum(axis=1)
+        keep = np.flatnonzero(count > 0)
+        values, valid, count = values[keep], valid[keep], count[keep]
+        masked = np.where(valid, values, np.nan)
+        with np.errstate(all="ignore"):
+            if name == 'avg_over_time':
+                result = np.nansum(masked, axis=1) / count
+            elif name == 'sum_over_time':
+                result = np.nansum(masked, axis=1)
+            elif name == 'min_over_time':
+                result = np.nanmin(masked, axis=1)
+            elif name == 'max_over_time':
+                result = np.nanmax(masked, axis=1)
+            elif name == 'count_over_time':
+                result = count.astype(float)
+            elif name == 'present_over_time':
+                result = np.ones(len(keep))
+            elif name == 'last_over_time':
+                last = np.where(valid, np.arange(valid.shape[1]), -1).max(axis=1)
+                result = values[np.arange(len(keep)), last]
+            else:
+                result = np.nanvar(masked, axis=1)
+                if name == 'stddev_over_time':
+                    result = np.sqrt(result)
+        return window.result(keep, result)
+
+    # 聚合
+    def aggregate(self, node: Aggregate, t: float) -> Vector:
+        vector = self.evaluate(node.expr, t)
+        if node.op in ('quantile', 'count_values'):
+            raise PromQLError(f"模拟器不支持聚合 {node.op}")
+        if not len(vector):
+            return Vector.empty()
+        if node.without:
+            labels = sorted(set(vector.labels) - set(node.grouping) - {"__name__"})
+        else:
+            labels = list(node.grouping)
+        columns = [vector.column(label) for label in labels]
+        ids = factorize(columns, len(vector))
+
+        if node.op in ('topk', 'bottomk'):
+            k = int(self.evaluate(node.param, t))
+            values = -vector.values if node.op == 'topk' else vector.values
+            order = np.lexsort((values, ids))
+            sorted_ids = ids[order]
+            starts = np.searchsorted(sorted_ids, sorted_ids, side="left")
+            return vector.take(order[np.arange(len(order)) - starts < k])
+
+        groups = int(ids.max()) + 1
+        values = vector.values
+        count = np.bincount(ids, minlength=groups).astype(float)
+        if node.op == 'sum':
+            result = np.bincount(ids, weights=values, minlength=groups)
+        elif node.op == 'avg':
+            result = np.bincount(ids, weights=values, minlength=groups) / count
+        elif node.op == 'count':
+            result = count
+        elif node.op == 'group':
+            result = np.ones(groups)
+        elif node.op == 'min':
+            result = np.full(groups, np.inf)
+            np.minimum.at(result, ids, values)
+        elif node.op == 'max':
+            result = np.full(groups, -np.inf)
+            np.maximum.at(result, ids, values)
+        elif node.op in ('stddev', 'stdvar'):
+            mean = np.bincount(ids, weights=values, minlength=groups) / count
+            result = np.maximum(np.bincount(ids, weights=values * values, minlength=groups) / count - mean ** 2, 0)
+            if node.op == 'stddev':
+                result = np.sqrt(result)
+        else:
+            raise PromQLError(f"模拟器不支持聚合 {node.op}")
+        # 每组取第一行的分组标签
+        first = np.unique(ids, return_index=True)[1]
+        return Vector({label: column[first] for label, column in zip(labels, columns)}, result)
+
+    # 二元运算
+    def binary(self, node: Binary, t: float) -> Value:
+        lhs = self.evaluate(node.lhs, t)
+        rhs = self.evaluate(node.rhs, t)
+        op = node.op
+        if op in ('and', 'or', 'unless'):
+            return self._set_operation(op, lhs, rhs, node)
+
+        lhs_vector, rhs_vector = isinstance(lhs, Vector), isinstance(rhs, Vector)
+        if not lhs_vector and not rhs_vector:
+            if op in _COMPARISON:
+                if not node.return_bool:
+                    raise PromQLError("标量之间的比较必须使用bool修饰符")
+                return float(_COMPARISON[op](lhs, rhs))
+            with np.errstate(all="ignore"):
+                return float(_ARITHMETIC[op](np.float64(lhs), np.float64(rhs)))
+
+        if lhs_vector and rhs_vector:
+            return self._vector_binary(op, lhs, rhs, node)
+
+        vector = lhs if lhs_vector else rhs
+        left = vector.values if lhs_vector else np.float64(lhs)
+        right = np.float64(rhs) if lhs_vector else vector.values
+        with np.errstate(all="ignore"):
+            if op in _COMPARISON:
+                passed = _COMPARISON[op](left, right)
+                if node.return_bool:
+                    return vector.drop("__name__").with_values(passed.astype(float))
+                return vector.take(np.flatnonzero(passed))
+            return vector.drop("__name__").with_values(_ARITHMETIC[op](left, right))
+
+    def _vector_binary(self, op: str, lhs: Vector, rhs: Vector, node: Binary) -> Vector:
+        matching = node.matching
+        labels = _signature_labels(lhs, rhs, matching.on, matching.labels)
+        group_right = matching.card == 'one-to-many'
+        many, one = (rhs, lhs) if group_right else (lhs, rhs)
+
+        lhs_ids, rhs_ids = _signature_ids(lhs, rhs, labels)
+        many_ids, one_ids = (rhs_ids, lhs_ids) if group_right else (lhs_ids, rhs_ids)
+        size = int(max(lhs_ids.max(initial=-1), rhs_ids.max(initial=-1))) + 1
+        one_count = np.bincount(one_ids, minlength=size)
+        if (one_count[many_ids] > 1).any():
+            side = "左" if group_right else "右"
+            raise PromQLError(f"{side}侧存在标签相同的重复序列，无法匹配")
+        lookup = np.full(size, -1, dtype=np.int64)
+        lookup[one_ids] = np.arange(len(one_ids))
+        matched = lookup[many_ids]
+        many_rows = np.flatnonzero(matched >= 0)
+        one_rows = matched[many_rows]
+        if matching.card == 'one-to-one' and (np.bincount(many_ids[many_rows], minlength=size) > 1).any():
+            raise PromQLError("多对多匹配不被允许：匹配标签在一侧必须唯一")
+        lhs_rows, rhs_rows = (one_rows, many_rows) if group_right else (many_rows, one_rows)
+        left, right = lhs.values[lhs_rows], rhs.values[rhs_rows]
+
+        with np.errstate(all="ignore"):
+            if op in _COMPARISON:
+                passed = _COMPARISON[op](left, right)
+                if node.return_bool:
+                    keep, values = np.arange(len(left)), passed.astype(float)
+                else:
+                    # 过滤型比较保留左侧的样本值
+                    keep = np.flatnonzero(passed)
+                    values = left[keep]
+            else:
+                keep, values = np.arange(len(left)), _ARITHMETIC[op](left, right)
+
+        result = many.take(many_rows[keep])
+        if op not in _COMPARISON or node.return_bool:
+            result = result.drop("__name__")
+        if matching.card == 'one-to-one':
+            result = result.keep(matching.labels) if matching.on else result.drop(*matching.labels)
+        else:
+            other = one.take(one_rows[keep])
+            labels = dict(result.labels)
+            for label in matching.include:
+                labels[label] = other.column(label)
+            result = Vector(labels, result.values)
+        return result.with_values(values)
+
+    def _set_operation(self, op: str, lhs: Value, rhs: Value, node: Binary) -> Vector:
+        if not isinstance(lhs, Vector) or not isinstance(rhs, Vector):
+            raise PromQLError(f"{op} 的两侧都必须是即时向量")
+        labels = _signature_labels(lhs, rhs, node.matching.on, node.matching.labels)
+        lhs_ids, rhs_ids = _signature_ids(lhs, rhs, labels)
+        if op == 'and':
+            return lhs.take(np.flatnonzero(np.isin(lhs_ids, rhs_ids)))
+        if op == 'unless':
+            return lhs.take(np.flatnonzero(~np.isin(lhs_ids, rhs_ids)))
+        return Vector.concat([lhs, rhs.take(np.flatnonzero(~np.isin(rhs_ids, lhs_ids)))])
@@ -11,8 +11,13 @@ from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.core.database import init_db
 from app.api.api_v1.api import api_router
+from app.api.compression import CompressionMiddleware
+from app.api.responses import JSONResponse
 from app.monitoring.metrics import setup_metrics
-from app.monitoring.collectors import SystemCollector
+from app.monitoring.collectors.system_collector import system_collector
+from app.monitoring.loop_monitor import loop_monitor
+from app.services.prometheus_service import prometheus_service
+from app.services.materialized_views import materializer
 
 
 @asynccontextmanager
@@ -23,15 +28,23 @@ async def lifespan(app: FastAPI):
     await init_db()
     setup_metrics()
     
-    # 启动系统指标收集器
-    collector = SystemCollector()
-    collector.start()
+    # 启动系统指标收集器（多worker部署时仅主收集器实际采集）
+    system_collector.start()
+    
+    # 启动仪表盘物化视图的后台刷新
+    materializer.start()
+    
+    # 启动事件循环延迟探针（调试模式下记录阻塞事件循环的调用栈）
+    loop_monitor.start()
     
     yield
     
     # 关闭时执行
     print("🛑 关闭监控服务...")
-    collector.stop()
+    await loop_monitor.stop()
+    await materializer.stop()
+    system_collector.stop()
+    await prometheus_service.close()
 
 
 # 创建FastAPI应用
@@ -39,7 +52,8 @@ app = FastAPI(
     title="运维平台监控服务",
     description="基于Prometheus的服务器资源监控系统",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=JSONResponse
 )
 
 # 配置CORS
@@ -51,6 +65,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（brotli优先，其次gzip）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+)
+
 # 注册API路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -75,10 +97,16 @@ async def health_check():
 
 
 if __name__ == "__main__":
+    if settings.WORKERS > 1:
+        # 多worker：worker启动前准备好prometheus多进程指标目录
+        from app.monitoring.multiprocess import prepare_multiprocess_dir
+        prepare_multiprocess_dir(settings.PROMETHEUS_MULTIPROC_DIR)
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=settings.WORKERS <= 1,
+        workers=settings.WORKERS,
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+PromQL查询准入控制：令牌桶、排队上限与超时、按用户轮转分配、取消时归还名额
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+def _controller(**overrides):
+    options = dict(global_concurrency=1, user_concurrency=1, user_rate=1000, user_burst=1000,
+                   queue_timeout=5, user_queue_limit=10)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+async def _hold(controller, user, entered, release):
+    async with controller.admit(user):
+        entered.append(user)
+        await release.wait()
+
+
+def test_token_bucket_reports_wait_time():
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.5, abs=0.01)
+
+
+async def test_burst_over_rate_limit_gets_429():
+    controller = _controller(user_rate=0.001, user_burst=2)
+    for _ in range(2):
+        async with controller.admit("alice"):
+            pass
+
+    with pytest.raises(AdmissionRejected) as exc:
+        async with controller.admit("alice"):
+            pass
+    assert (exc.value.reason, exc.value.status_code) == ("rate_limited", 429)
+    assert exc.value.retry_after > 0
+    # 其他用户有自己的令牌桶
+    async with controller.admit("bob"):
+        pass
+
+
+async def test_full_queue_gets_429():
+    controller = _controller(user_queue_limit=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, "alice", [], release))
+    queued = asyncio.create_task(_hold(controller, "alice", [], release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        async with controller.admit("alice"):
+            pass
+    assert (exc.value.reason, exc.value.status_code) == ("queue_full", 429)
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert controller.inflight == 0
+
+
+async def test_queue_timeout_gets_503():
+    controller = _controller(queue_timeout=0.05)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, "alice", [], release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        async with controller.admit("bob"):
+            pass
+    assert (exc.value.reason, exc.value.status_code) == ("queue_timeout", 503)
+
+    release.set()
+    await holder
+    assert controller.inflight == 0
+    assert controller.status()["queued"] == 0
+
+
+async def test_freed_slots_rotate_between_users():
+    controller = _controller()
+    entered = []
+    releases = {name: asyncio.Event() for name in ("first", "a1", "a2", "a3", "b1")}
+    first = asyncio.create_task(_hold(controller, "first", entered, releases["first"]))
+    await asyncio.sleep(0.01)
+    # alice先排满三个，bob随后排一个
+    tasks = [asyncio.create_task(_hold(controller, "alice", entered, releases[name])) for name in ("a1", "a2", "a3")]
+    await asyncio.sleep(0.01)
+    tasks.append(asyncio.create_task(_hold(controller, "bob", entered, releases["b1"])))
+    await asyncio.sleep(0.01)
+
+    for name in ("first", "a1", "b1", "a2", "a3"):
+        releases[name].set()
+        await asyncio.sleep(0.01)
+    await asyncio.gather(first, *tasks)
+
+    # bob不必等alice的全部请求执行完
+    assert entered == ["first", "alice", "bob", "alice", "alice"]
+    assert controller.inflight == 0
+    assert controller.status()["queued_users"] == 0
+
+
+async def test_cancelled_waiter_does_not_leak_inflight():
+    controller = _controller()
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, "alice", [], release))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(_hold(controller, "bob", [], release))
+    await asyncio.sleep(0.01)
+
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    release.set()
+    await holder
+    assert controller.inflight == 0
+
+
+async def test_waiter_cancelled_after_grant_returns_the_slot():
+    controller = _controller()
+    release = asyncio.Event()
+    entered = []
+    holder = asyncio.create_task(_hold(controller, "alice", entered, release))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(_hold(controller, "bob", entered, asyncio.Event()))
+    await asyncio.sleep(0.01)
+
+    # 名额在holder退出时分配给bob，bob恢复执行之前被取消
+    release.set()
+    await holder
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    assert entered == ["alice"]
+    assert controller.inflight == 0
+    async with controller.admit("carol"):
+        assert controller.inflight == 1
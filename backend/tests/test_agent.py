@@ -0,0 +1,101 @@
+"""
+推送agent：轻量采集与HTTP客户端
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+from app.agent.collector import ProcStatCpu
+from app.agent.push_agent import HttpConnection
+
+PROC_STAT = """cpu  {total}
+cpu0 {cpu0} 0 0 0
+cpu1 {cpu1} 0 0 0
+intr 1 2 3
+"""
+
+
+def _write_stat(path, cpu0, cpu1):
+    path.write_text(PROC_STAT.format(total="0 " * 10, cpu0=cpu0, cpu1=cpu1))
+
+
+def test_cpu_usage_from_proc_stat_deltas(tmp_path):
+    stat = tmp_path / "stat"
+    _write_stat(stat, "100 0 100 800 0 0", "0 0 0 1000 0 0")
+    cpu = ProcStatCpu(str(stat))
+    cpu.collect()
+    # cpu0: user+50 system+50 idle+100；cpu1: 完全空闲，iowait计入空闲
+    _write_stat(stat, "150 0 150 900 0 0", "0 0 0 1050 50 0")
+
+    result = cpu.collect()
+
+    assert result['cpus'] == ['cpu0', 'cpu1']
+    assert result['per_cpu'] == [50.0, 0.0]
+    assert result['per_cpu_modes']['user'] == [25.0, 0.0]
+    assert result['modes']['idle'] == 50.0 and result['modes']['iowait'] == 16.7
+    assert result['usage_percent'] == 25.0
+
+
+def test_cpu_counter_going_backwards_counts_as_zero(tmp_path):
+    stat = tmp_path / "stat"
+    _write_stat(stat, "100 0 0 100 50 0", "0 0 0 0 0 0")
+    cpu = ProcStatCpu(str(stat))
+    cpu.collect()
+    _write_stat(stat, "200 0 0 100 40 0", "0 0 0 0 0 0")
+
+    assert cpu.collect()['per_cpu'] == [100.0, 0.0]
+
+
+def test_http_connection_keep_alive_chunked_and_close():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    responses = [
+        b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n{\"ack\": 1}",
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n4\r\n{\"ac\r\n6\r\nk\": 2}\r\n0\r\n\r\n",
+        b"HTTP/1.1 403 Forbidden\r\nConnection: close\r\nContent-Length: 2\r\n\r\nno",
+    ]
+    requests = []
+
+    def serve():
+        conn, _ = server.accept()
+        stream = conn.makefile("rb")
+        for response in responses:
+            head = []
+            while (line := stream.readline()) != b"\r\n":
+                head.append(line)
+            requests.append((head, stream.read(3)))
+            conn.sendall(response)
+        conn.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    conn = HttpConnection("http", f"127.0.0.1:{server.getsockname()[1]}", timeout=5)
+
+    assert conn.post("/ingest", b"abc", {"X-Agent-Token": "t"}) == (200, b'{"ack": 1}')
+    assert conn.post("/ingest", b"abc", {}) == (200, b'{"ack": 2}')
+    assert conn.connected
+    assert conn.post("/ingest", b"abc", {}) == (403, b"no")
+    assert not conn.connected
+
+    thread.join(5)
+    server.close()
+    assert requests[0][0][0] == b"POST /ingest HTTP/1.1\r\n"
+    assert b"X-Agent-Token: t\r\n" in requests[0][0]
+    assert all(body == b"abc" for _, body in requests)
+
+
+def test_agent_does_not_import_backend_dependencies():
+    code = (
+        "import sys, app.agent.push_agent; "
+        "print(','.join(m for m in ('loguru', 'pydantic_settings', 'numpy', 'ssl', 'http.client', "
+        "'prometheus_client', 'app.core.config') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,95 @@
+"""
+推送agent协议：快照增量与批次编解码
+"""
+
+import httpx
+import msgpack
+import pytest
+from fastapi import FastAPI
+
+from app.agent.protocol import (
+    DELTA, KEYFRAME, TOKEN_HEADER, apply, decode_batch, diff, encode_batch, encode_frame, encode_header
+)
+from app.api.api_v1.api import api_router
+from app.api.api_v1.endpoints import agents
+from app.core.config import settings
+from app.services.fleet import FleetStore
+
+
+def test_diff_apply_roundtrip():
+    old = {"cpu": {"usage": 1.0, "load": [1, 2, 3]}, "disk": {"root": {"percent": 10}}, "gone": 1}
+    new = {"cpu": {"usage": 2.0, "load": [1, 2, 3]}, "disk": {"root": {"percent": 10}}, "added": {"x": 1}}
+
+    delta = diff(old, new)
+
+    assert apply(old, delta) == new
+    # 未变化的子树不出现在增量中
+    assert "disk" not in delta.get("d", {}) and "disk" not in delta.get("s", {})
+    assert delta["r"] == ["gone"]
+
+
+def test_apply_does_not_modify_base():
+    base = {"a": {"b": 1}}
+    apply(base, diff(base, {"a": {"b": 2}}))
+    assert base == {"a": {"b": 1}}
+
+
+def test_identical_snapshots_produce_empty_delta():
+    snapshot = {"a": {"b": [1, 2]}, "c": 3}
+    assert diff(snapshot, dict(snapshot)) == {}
+
+
+def test_batch_roundtrip():
+    frames = [
+        encode_frame(1, KEYFRAME, 10.0, {"load_avg": (0.1, 0.2, 0.3)}),
+        encode_frame(2, DELTA, 11.0, {"s": {"x": 1}}),
+    ]
+    header, decoded = decode_batch(encode_batch(encode_header("node-1", "abc", 5.0, rss=123), frames))
+
+    assert header["host"] == "node-1" and header["session"] == "abc" and header["rss"] == 123
+    assert list(decoded) == [(1, KEYFRAME, 10.0, {"load_avg": [0.1, 0.2, 0.3]}), (2, DELTA, 11.0, {"s": {"x": 1}})]
+
+
+@pytest.mark.parametrize("body", [b"", b"\xc1", encode_frame(1, KEYFRAME, 0.0, {})])
+def test_decode_rejects_invalid_header(body):
+    with pytest.raises(ValueError):
+        decode_batch(body)
+
+
+def test_decode_rejects_malformed_frame():
+    _, frames = decode_batch(encode_header("h", "s", 1.0) + encode_header("h", "s", 1.0))
+    with pytest.raises(ValueError):
+        list(frames)
+
+
+@pytest.mark.parametrize("frame", [
+    ["x", KEYFRAME, 0.0, {}], [0, KEYFRAME, 0.0, {}], [True, KEYFRAME, 0.0, {}],
+    [1, 7, 0.0, {}], [1, KEYFRAME, "now", {}],
+])
+def test_decode_rejects_invalid_frame_fields(frame):
+    _, frames = decode_batch(encode_header("h", "s", 1.0) + msgpack.packb(frame))
+    with pytest.raises(ValueError):
+        list(frames)
+
+
+@pytest.mark.parametrize("delta", [{"s": [1, 2, 3]}, {"d": {"a": 1}}, {"d": [1]}, {"r": "a"}, {"r": [[1]]}])
+def test_apply_rejects_malformed_delta(delta):
+    with pytest.raises(ValueError):
+        apply({"a": {"b": 1}}, delta)
+
+
+async def test_ingest_returns_400_for_malformed_frames(monkeypatch):
+    monkeypatch.setattr(settings, "AGENT_INGEST_TOKEN", "token")
+    monkeypatch.setattr(agents, "fleet_store", FleetStore(None, 10))
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api/v1")
+    bodies = [
+        encode_batch(encode_header("h", "s", 1.0), [msgpack.packb(["x", KEYFRAME, 0.0, {}])]),
+        encode_batch(encode_header("h", "s", 1.0), [
+            encode_frame(1, KEYFRAME, 0.0, {"a": 1}), encode_frame(2, DELTA, 0.0, {"s": [1, 2, 3]})
+        ]),
+    ]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for body in bodies:
+            response = await client.post("/api/v1/agents/ingest", content=body, headers={TOKEN_HEADER: "token"})
+            assert response.status_code == 400
@@ -0,0 +1,54 @@
+"""
+基准测试harness冒烟测试：对模拟Prometheus跑一遍小规模压测，检查报告、基线比较与 --check
+"""
+
+import orjson
+
+from benchmarks import harness
+
+# 小规模、少量请求，只验证流程
+SMALL_RUN = [
+    "--nodes", "5", "--pods", "20", "--cpus", "2", "--processes", "10",
+    "--requests", "4", "--warmup", "1", "--alloc-samples", "1", "--concurrency", "2",
+    "--delay-ms", "0", "--endpoints", r"^/api/v1/(monitoring/system/(overview|cpu)|summary/summary|prometheus/query)$"
+]
+
+
+def test_run_against_fake_prometheus_writes_report(tmp_path):
+    output = tmp_path / "report.json"
+    code = harness.main(SMALL_RUN + ["--baseline", str(tmp_path / "missing.json"), "--output", str(output)])
+
+    assert code == 0
+    report = orjson.loads(output.read_bytes())
+    assert report["endpoints"]
+    for name, result in report["endpoints"].items():
+        assert result["errors"] == 0, name
+        assert result["requests"] == 4
+        assert result["p50_ms"] <= result["p99_ms"]
+
+
+def test_check_fails_without_baseline(tmp_path):
+    assert harness.main(SMALL_RUN + ["--baseline", str(tmp_path / "missing.json"), "--check"]) != 0
+
+
+def test_check_passes_against_fresh_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert harness.main(SMALL_RUN + ["--baseline", str(baseline), "--save-baseline"]) == 0
+    # 计时噪声较大，这里只验证比较流程，容差放宽
+    assert harness.main(SMALL_RUN + ["--baseline", str(baseline), "--check", "--tolerance", "100"]) == 0
+
+
+def test_compare_reports_regressions():
+    baseline = {"endpoints": {"GET /x": {
+        "errors": 0, "p50_ms": 1.0, "p95_ms": 2.0, "p99_ms": 3.0, "throughput_rps": 1000.0, "alloc_peak_kb": 100.0
+    }}}
+    current = {"GET /x": {
+        "errors": 1, "p50_ms": 10.0, "p95_ms": 2.0, "p99_ms": 3.0, "throughput_rps": 100.0, "alloc_peak_kb": 100.0
+    }}
+
+    regressions = harness.compare(current, baseline, tolerance=0.25)
+
+    assert any("错误数" in line for line in regressions)
+    assert any("p50_ms" in line for line in regressions)
+    assert any("吞吐量" in line for line in regressions)
+    assert harness.compare(baseline["endpoints"], baseline, tolerance=0.25) == []
@@ -0,0 +1,136 @@
+"""
+指标标签基数守卫：白名单/黑名单、溢出序列、过期移除与多进程模式
+"""
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+from app.monitoring import cardinality
+from app.monitoring.cardinality import OVERFLOW_VALUE, CardinalityGuard
+
+
+def _guard(**overrides) -> CardinalityGuard:
+    options = dict(default_max_series=10, max_series={}, allow={}, deny={}, stale_cycles=2, evict=True)
+    options.update(overrides)
+    return CardinalityGuard(**options)
+
+
+def _gauge(name="test_iface_bytes"):
+    return Gauge(name, "test", ["host", "interface"], registry=CollectorRegistry())
+
+
+def _series(metric):
+    return set(metric._metrics)
+
+
+def test_deny_pattern_drops_series():
+    guard = _guard(deny={"interface": r"^veth"})
+    gauge = _gauge()
+    guard.set(gauge, 1, host="a", interface="veth1234")
+    guard.set(gauge, 2, host="a", interface="eth0")
+    assert _series(gauge) == {("a", "eth0")}
+
+
+def test_allow_pattern_keeps_only_matching_series():
+    guard = _guard(allow={"interface": r"^(eth|ens)"})
+    gauge = _gauge()
+    guard.set(gauge, 1, host="a", interface="docker0")
+    guard.set(gauge, 2, host="a", interface="ens3")
+    assert _series(gauge) == {("a", "ens3")}
+
+
+def test_filters_apply_only_to_guarded_labels():
+    # host不是受限标签，与模式匹配也不会被过滤
+    guard = _guard(deny={"host": r".*", "interface": r"^lo$"})
+    counter = Counter("test_iface_packets", "test", ["host", "interface"], registry=CollectorRegistry())
+    assert guard.inc(counter, 1, host="veth", interface="eth0") == (("veth", "eth0"), False)
+    assert guard.inc(counter, 1, host="a", interface="lo") is None
+
+
+def test_series_over_limit_route_to_overflow():
+    guard = _guard(default_max_series=2)
+    gauge = _gauge()
+    for name, value in (("eth0", 1), ("eth1", 2), ("veth1", 3), ("veth2", 4)):
+        guard.set(gauge, value, host="a", interface=name)
+    # 溢出Gauge在周期结束时才写入
+    assert ("a", OVERFLOW_VALUE) not in _series(gauge)
+    guard.end_cycle()
+
+    assert _series(gauge) == {("a", "eth0"), ("a", "eth1"), ("a", OVERFLOW_VALUE)}
+    assert gauge.labels("a", OVERFLOW_VALUE)._value.get() == 7
+    # 已接纳的序列继续写入原序列
+    guard.set(gauge, 5, host="a", interface="eth0")
+    assert gauge.labels("a", "eth0")._value.get() == 5
+
+
+def test_non_additive_overflow_takes_max():
+    guard = _guard(default_max_series=1)
+    gauge = _gauge("test_iface_percent")
+    guard.configure(gauge, additive=False)
+    for name, value in (("eth0", 10), ("veth1", 30), ("veth2", 20)):
+        guard.set(gauge, value, host="a", interface=name)
+    guard.end_cycle()
+    assert gauge.labels("a", OVERFLOW_VALUE)._value.get() == 30
+
+
+def test_counter_overflow_reports_written_labels():
+    guard = _guard(default_max_series=1)
+    counter = Counter("test_iface_errors", "test", ["host", "interface"], registry=CollectorRegistry())
+    assert guard.inc(counter, 1, host="a", interface="eth0") == (("a", "eth0"), False)
+    assert guard.inc(counter, 2, host="a", interface="veth1") == (("a", OVERFLOW_VALUE), True)
+    assert counter.labels("a", OVERFLOW_VALUE)._value.get() == 2
+
+
+def test_stale_series_are_evicted_and_free_the_slot():
+    guard = _guard(default_max_series=1, stale_cycles=2)
+    gauge = _gauge()
+    guard.set(gauge, 1, host="a", interface="veth1")
+    assert guard.end_cycle() == []
+    # veth1消失，连续两个周期未出现后移除
+    assert guard.end_cycle() == []
+    assert guard.end_cycle() == [(gauge._name, ("a", "veth1"))]
+    assert _series(gauge) == set()
+
+    guard.set(gauge, 2, host="a", interface="veth2")
+    guard.end_cycle()
+    assert _series(gauge) == {("a", "veth2")}
+
+
+def test_series_seen_again_are_not_evicted():
+    guard = _guard(stale_cycles=2)
+    gauge = _gauge()
+    for _ in range(5):
+        guard.set(gauge, 1, host="a", interface="eth0")
+        assert guard.end_cycle() == []
+    assert _series(gauge) == {("a", "eth0")}
+
+
+def test_configure_stale_cycles_per_family():
+    guard = _guard(stale_cycles=5)
+    gauge = _gauge()
+    guard.configure(gauge, stale_cycles=1)
+    guard.set(gauge, 1, host="a", interface="veth1")
+    guard.end_cycle()
+    assert guard.end_cycle() == [(gauge._name, ("a", "veth1"))]
+
+
+def test_multiprocess_mode_skips_eviction(monkeypatch):
+    monkeypatch.setattr(cardinality, "is_multiprocess_mode", lambda: True)
+    assert CardinalityGuard.from_settings().evict is False
+
+    guard = _guard(evict=False)
+    gauge = _gauge()
+    guard.configure(gauge, max_series=1, stale_cycles=1)
+    guard.set(gauge, 1, host="a", interface="veth1")
+    for _ in range(3):
+        assert guard.end_cycle() == []
+    assert _series(gauge) == {("a", "veth1")}
+
+    # 过期序列仍占用上限，新序列汇入溢出序列
+    guard.set(gauge, 2, host="a", interface="veth2")
+    guard.end_cycle()
+    assert _series(gauge) == {("a", "veth1"), ("a", OVERFLOW_VALUE)}
+
+
+def test_from_settings_evicts_in_single_process_mode(monkeypatch):
+    monkeypatch.setattr(cardinality, "is_multiprocess_mode", lambda: False)
+    assert CardinalityGuard.from_settings().evict is True
@@ -0,0 +1,157 @@
+"""
+Kubernetes清单的条件请求与增量：If-None-Match命中返回304，since=只返回变化的条目，代数不可用时返回完整清单
+"""
+
+import httpx
+from fastapi import FastAPI, Response
+from starlette.requests import Request
+
+from app.api.api_v1.api import api_router
+from app.api.api_v1.endpoints import summary
+from app.api.conditional import check_etag, make_etag
+from app.services.kubernetes_inventory import KubernetesInventory
+from app.services.prometheus_service import prometheus_service
+
+
+def _request(if_none_match=None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def _node(name, ready=True):
+    return {"name": name, "status": "true" if ready else "false", "ready": ready}
+
+
+def _pod(name, phase="Running", namespace="default"):
+    return {"name": name, "namespace": namespace, "phase": phase}
+
+
+def _metrics(nodes, pods, errors=None):
+    return {"nodes": nodes, "pods": pods, "errors": errors or {}}
+
+
+def test_check_etag_returns_304_on_matching_if_none_match():
+    etag = make_etag("k8s", 42, "ok")
+    response = Response()
+
+    not_modified = check_etag(_request(etag), response, etag)
+
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+
+def test_check_etag_matches_weakly_within_a_list():
+    etag = make_etag("snap", 7)
+
+    assert check_etag(_request('"other", "snap-7"'), Response(), etag).status_code == 304
+    assert check_etag(_request("*"), Response(), etag).status_code == 304
+
+
+def test_check_etag_sets_header_when_stale():
+    response = Response()
+
+    assert check_etag(_request(make_etag("k8s", 41, "ok")), response, make_etag("k8s", 42, "ok")) is None
+    assert response.headers["etag"] == make_etag("k8s", 42, "ok")
+    assert check_etag(_request(), Response(), None) is None
+
+
+def test_generation_only_advances_when_inventory_changes():
+    inventory = KubernetesInventory(history_size=5)
+    first = inventory.update(_metrics([_node("n1")], [_pod("a")]))
+
+    assert inventory.update(_metrics([_node("n1")], [_pod("a")])) == first
+    assert inventory.update(_metrics([_node("n1")], [_pod("a", "Failed")])) > first
+
+
+def test_delta_reports_added_removed_and_changed():
+    inventory = KubernetesInventory(history_size=5)
+    since = inventory.update(_metrics([_node("n1"), _node("n2")], [_pod("a"), _pod("b"), _pod("c")]))
+    inventory.update(_metrics([_node("n1", ready=False), _node("n2")], [_pod("a"), _pod("b", "Failed"), _pod("d")]))
+
+    changes = inventory.delta(since)
+
+    assert changes["nodes"] == {"added": [], "removed": [], "changed": [_node("n1", ready=False)]}
+    assert changes["pods"]["added"] == [_pod("d")]
+    assert changes["pods"]["removed"] == ["default/c"]
+    assert changes["pods"]["changed"] == [_pod("b", "Failed")]
+
+
+def test_failed_section_keeps_previous_inventory():
+    inventory = KubernetesInventory(history_size=5)
+    since = inventory.update(_metrics([_node("n1")], [_pod("a")]))
+    inventory.update(_metrics([], [_pod("a"), _pod("b")], errors={"nodes": "unavailable"}))
+
+    changes = inventory.delta(since)
+
+    assert inventory.degraded
+    assert changes["nodes"] == {"added": [], "removed": [], "changed": []}
+    assert changes["pods"]["added"] == [_pod("b")]
+
+
+def test_delta_is_none_once_generation_leaves_history():
+    inventory = KubernetesInventory(history_size=2)
+    oldest = inventory.update(_metrics([], [_pod("a")]))
+    inventory.update(_metrics([], [_pod("b")]))
+    inventory.update(_metrics([], [_pod("c")]))
+
+    assert inventory.delta(oldest) is None
+    assert inventory.delta(12345) is None
+
+
+async def _client(monkeypatch, responses):
+    """挂载API路由，Prometheus依次返回responses中的清单，物化视图视为未就绪"""
+    async def get_kubernetes_metrics():
+        return responses.pop(0)
+
+    async def no_view(name):
+        return None
+
+    monkeypatch.setattr(prometheus_service, "get_kubernetes_metrics", get_kubernetes_metrics)
+    monkeypatch.setattr(summary, "kubernetes_inventory", KubernetesInventory(history_size=2))
+    monkeypatch.setattr(summary.materializer, "aget", no_view)
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api/v1")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_overview_returns_304_when_inventory_unchanged(monkeypatch):
+    same = _metrics([_node("n1")], [_pod("a")])
+    async with await _client(monkeypatch, [same, dict(same)]) as client:
+        first = await client.get("/api/v1/summary/kubernetes/overview")
+        etag = first.headers["etag"]
+        second = await client.get("/api/v1/summary/kubernetes/overview", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+
+
+async def test_overview_since_returns_only_changes(monkeypatch):
+    responses = [
+        _metrics([_node("n1")], [_pod("a"), _pod("b")]),
+        _metrics([_node("n1")], [_pod("a", "Failed"), _pod("c")])
+    ]
+    async with await _client(monkeypatch, responses) as client:
+        since = (await client.get("/api/v1/summary/kubernetes/overview")).json()["generation"]
+        response = await client.get("/api/v1/summary/kubernetes/overview", params={"since": since})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["full"] is False and body["since"] == since and body["generation"] > since
+    pods = body["kubernetes"]["pods"]
+    assert pods == {"added": [_pod("c")], "removed": ["default/b"], "changed": [_pod("a", "Failed")]}
+    assert body["kubernetes"]["pod_count"] == 2
+
+
+async def test_overview_since_falls_back_to_full_listing(monkeypatch):
+    responses = [_metrics([], [_pod("a")]), _metrics([], [_pod("b")]), _metrics([], [_pod("c")])]
+    async with await _client(monkeypatch, responses) as client:
+        since = (await client.get("/api/v1/summary/kubernetes/overview")).json()["generation"]
+        await client.get("/api/v1/summary/kubernetes/overview")
+        # history_size=2：第三次更新后最早的代数已被淘汰
+        response = await client.get("/api/v1/summary/kubernetes/overview", params={"since": since})
+
+    body = response.json()
+    assert body["full"] is True
+    assert body["kubernetes"]["pods"] == [_pod("c")]
+    assert body["kubernetes"]["nodes"] == []
@@ -0,0 +1,72 @@
+"""
+物化视图共享目录：非主进程在线程池中加载主进程写入的视图
+"""
+
+import os
+import threading
+
+from app.services.materialized_views import MaterializationEngine
+
+
+def _engines(tmp_path, on_load=None):
+    """同一共享目录下的主进程与非主进程引擎，均注册名为overview的视图"""
+    async def build():
+        return {"nodes": ["n1", "n2"]}
+
+    leader, follower = MaterializationEngine(str(tmp_path)), MaterializationEngine(str(tmp_path))
+    leader.register("overview", build, 10)
+    follower.register("overview", build, 10, on_load)
+    assert leader.election.try_acquire()
+    return leader, follower
+
+
+async def test_follower_loads_view_off_the_event_loop(tmp_path, monkeypatch):
+    loaded = []
+    leader, follower = _engines(tmp_path, lambda data: loaded.append((data, threading.get_ident())))
+    read_threads = []
+    read = follower._read
+    monkeypatch.setattr(follower, "_read", lambda view: read_threads.append(threading.get_ident()) or read(view))
+    try:
+        await leader.refresh("overview")
+        view = await follower.aget("overview")
+    finally:
+        leader.election.release()
+
+    assert view is not None and not follower.is_leader
+    assert view.payload == leader.views["overview"].payload
+    assert view.generation == leader.views["overview"].generation
+    # 文件读取与解析在线程池中执行，on_load回调回到事件循环线程
+    assert read_threads and read_threads[0] != threading.get_ident()
+    assert loaded == [({"nodes": ["n1", "n2"]}, threading.get_ident())]
+
+
+async def test_follower_skips_unchanged_file(tmp_path):
+    loaded = []
+    leader, follower = _engines(tmp_path, loaded.append)
+    try:
+        await leader.refresh("overview")
+        await follower.aget("overview")
+        await follower.aget("overview")
+    finally:
+        leader.election.release()
+
+    assert len(loaded) == 1
+
+
+async def test_follower_without_shared_file_returns_none(tmp_path):
+    leader, follower = _engines(tmp_path)
+    leader.election.release()
+
+    assert not os.path.exists(follower._path("overview"))
+    assert await follower.aget("overview") is None
+    assert await follower.aget("missing") is None
+
+
+async def test_follower_ignores_corrupt_file(tmp_path):
+    leader, follower = _engines(tmp_path)
+    leader.election.release()
+    with open(follower._path("overview"), "wb") as f:
+        f.write(b"not json\n{}")
+
+    assert await follower.aget("overview") is None
+    assert follower.views["overview"].payload is None
@@ -0,0 +1,78 @@
+"""
+PromQL解析、白名单校验与成本估算
+"""
+
+import pytest
+
+from app.services.promql import (
+    Aggregate, Call, PromQLError, QueryTooExpensive, Subquery, VectorSelector,
+    cap_result, parse, parse_duration, plan_query, validate
+)
+
+DAY = 86400
+
+
+def test_parse_aggregation_over_range_vector():
+    node = parse('sum by (pod) (rate(node_cpu_seconds_total{mode="idle", cpu=~"1|2"}[5m]))')
+
+    assert isinstance(node, Aggregate)
+    assert node.op == "sum" and node.grouping == ["pod"]
+    call = node.expr
+    assert isinstance(call, Call) and call.func == "rate"
+    selector = call.args[0]
+    assert isinstance(selector, VectorSelector)
+    assert selector.name == "node_cpu_seconds_total"
+    assert selector.range == 300
+    assert [(m.label, m.op, m.value) for m in selector.matchers] == [("mode", "=", "idle"), ("cpu", "=~", "1|2")]
+
+
+def test_parse_subquery_and_durations():
+    node = parse("max_over_time(up[1h:30s])")
+
+    subquery = node.args[0]
+    assert isinstance(subquery, Subquery)
+    assert (subquery.range, subquery.step) == (3600, 30)
+    assert parse_duration("1h30m") == 5400
+
+
+@pytest.mark.parametrize("query", [
+    "sum(", "rate(up)", "unknown_function(up)", 'up{job="a"', "sum by (pod",
+])
+def test_parse_rejects_invalid_queries(query):
+    with pytest.raises(PromQLError):
+        validate(parse(query))
+
+
+def test_validate_uses_allowlist_rather_than_substrings():
+    # 旧的子串白名单会放行任何包含 "sum(" 的查询
+    with pytest.raises(PromQLError):
+        validate(parse("sum(secret_metric)"))
+    with pytest.raises(PromQLError):
+        validate(parse('{__name__=~".+"}'))
+    validate(parse("sum(up)"), allowlist=["up"])
+    validate(parse("system_cpu_usage_percent"), allowlist=["system_*"])
+
+
+def test_lookback_heavy_query_is_rejected_not_coarsened():
+    with pytest.raises(QueryTooExpensive):
+        plan_query("sum by (pod) (rate(node_cpu_seconds_total[30d]))", 0, DAY, "1s", max_samples=5_000_000)
+
+
+def test_step_driven_cost_is_coarsened():
+    plan = plan_query("sum(rate(node_cpu_seconds_total[5m]))", 0, DAY, "1s", max_samples=5_000_000)
+
+    assert plan.coarsened
+    assert plan.step > 1
+    assert plan.cost <= 5_000_000
+
+
+def test_cap_result_truncates_series_and_points():
+    result = {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": {"i": str(i)}, "values": [[t, "1"] for t in range(10)]} for i in range(5)
+    ]}}
+
+    capped = cap_result(result, max_series=2, max_points=3)
+
+    assert capped["truncated"] is True
+    assert len(capped["data"]["result"]) == 2
+    assert [point[0] for point in capped["data"]["result"][0]["values"]] == [7, 8, 9]
@@ -0,0 +1,71 @@
+"""
+范围查询分块、拼接与块缓存
+"""
+
+from app.core.config import settings
+from app.services.range_chunks import RangeChunkCache, chunk_seconds, plan_chunks, stitch
+
+HOUR = 3600
+
+
+def _matrix(metric, points):
+    return {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": metric, "values": [[t, str(t)] for t in points]}
+    ]}}
+
+
+def test_short_ranges_are_not_chunked():
+    assert chunk_seconds(HOUR, 15) is None
+    assert chunk_seconds(6 * HOUR, 15) == HOUR
+    assert chunk_seconds(6 * HOUR, HOUR) is None
+
+
+def test_chunks_align_to_hours_and_cover_the_range():
+    now = 100 * HOUR
+    first, last, chunks = plan_chunks(10 * HOUR + 120, 13 * HOUR + 60, 60, HOUR, now=now)
+
+    assert (first, last) == (10 * 60 + 2, 13 * 60 + 1)
+    # 过去的块取完整整点范围，便于不同请求复用
+    assert [(c.first, c.last) for c in chunks] == [
+        (600, 659), (660, 719), (720, 779), (780, 839)
+    ]
+    assert all(c.immutable for c in chunks)
+
+
+def test_recent_chunk_is_mutable_and_clipped():
+    now = 13 * HOUR + settings.PROMETHEUS_RANGE_IMMUTABLE_AFTER + 90
+    _, last, chunks = plan_chunks(12 * HOUR, now, 60, HOUR, now=now)
+
+    assert chunks[0].immutable
+    assert not chunks[-1].immutable
+    assert chunks[-1].last == last
+
+
+def test_stitch_merges_series_and_clips_to_range():
+    stitched = stitch([_matrix({"a": "1"}, range(0, 60, 15)), _matrix({"a": "1"}, range(60, 120, 15))], 15, 90)
+
+    series = stitched["data"]["result"]
+    assert len(series) == 1
+    assert [point[0] for point in series[0]["values"]] == [15, 30, 45, 60, 75, 90]
+
+
+def test_cache_evicts_least_recently_used_by_samples():
+    cache = RangeChunkCache(max_samples=10)
+    cache.put("a", _matrix({}, range(4)), ttl=60)
+    cache.put("b", _matrix({}, range(4)), ttl=60)
+    assert cache.get("a") is not None
+    cache.put("c", _matrix({}, range(4)), ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.samples == 8
+
+
+def test_cache_skips_oversized_and_expired_entries():
+    cache = RangeChunkCache(max_samples=3)
+    cache.put("big", _matrix({}, range(4)), ttl=60)
+    cache.put("old", _matrix({}, range(2)), ttl=-1)
+
+    assert cache.get("big") is None
+    assert cache.get("old") is None
+    assert cache.samples == 0
@@ -0,0 +1,40 @@
+"""
+内核计数器增量与速率
+"""
+
+from app.monitoring.collectors.rates import CounterRateTracker, counter_delta
+
+
+def test_counter_delta_increasing():
+    assert counter_delta(100, 150) == 50
+    assert counter_delta(7, 7) == 0
+
+
+def test_counter_delta_handles_32_and_64_bit_wrap():
+    assert counter_delta(2 ** 32 - 10, 5) == 15
+    assert counter_delta(2 ** 64 - 10, 5) == 15
+
+
+def test_counter_delta_treats_large_drop_as_reset():
+    # 回绕解释下的增量超过回绕宽度一半，视为计数器重置
+    assert counter_delta(2 ** 31 + 10, 100) == 100
+    assert counter_delta(5_000_000, 42) == 42
+
+
+def test_tracker_builds_baseline_before_reporting():
+    tracker = CounterRateTracker()
+    deltas, elapsed = tracker.update({"eth0": {"bytes": 100}}, timestamp=10.0)
+    assert deltas == {} and elapsed == 0.0
+
+    deltas, elapsed = tracker.update({"eth0": {"bytes": 350}, "eth1": {"bytes": 5}}, timestamp=12.0)
+    assert deltas == {"eth0": {"bytes": 250}}
+    assert elapsed == 2.0
+
+
+def test_tracker_forgets_removed_devices():
+    tracker = CounterRateTracker()
+    tracker.update({"sda": {"reads": 10}}, timestamp=1.0)
+    tracker.update({}, timestamp=2.0)
+
+    deltas, _ = tracker.update({"sda": {"reads": 20}}, timestamp=3.0)
+    assert deltas == {}
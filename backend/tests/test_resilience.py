@@ -0,0 +1,146 @@
+"""
+熔断器状态转换与请求时间预算
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import resilience
+from app.services.prometheus_service import PrometheusService
+from app.services.resilience import CircuitBreaker, DeadlineExceeded, deadline_scope, remaining_budget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("p", failure_threshold=3, recovery_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.retry_after() == pytest.approx(20)
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("p", failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_limits_probes_and_closes_on_success(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, recovery_timeout=30, half_open_max_calls=1)
+    breaker.record_failure()
+    clock.now += 30
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = CircuitBreaker("p", failure_threshold=5, recovery_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_cancelled_probe_returns_half_open_slot(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_cancelled()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+async def test_nested_deadline_keeps_earlier_deadline():
+    assert remaining_budget() is None
+    with deadline_scope(1):
+        with deadline_scope(10):
+            assert remaining_budget() <= 1
+
+        async def child():
+            return remaining_budget()
+
+        # 子任务复制上下文，共享同一预算
+        assert await asyncio.create_task(child()) <= 1
+    assert remaining_budget() is None
+
+
+def _service(handler):
+    service = PrometheusService(
+        backends=[{"name": "p", "url": "http://prometheus"}], mode="ha",
+        transport=httpx.MockTransport(handler)
+    )
+    service.backends[0].breaker = CircuitBreaker("p", failure_threshold=1, recovery_timeout=30)
+    return service
+
+
+async def test_exhausted_deadline_is_not_a_breaker_failure():
+    calls = []
+    service = _service(lambda request: calls.append(request) or httpx.Response(200, json={"status": "success"}))
+    breaker = service.backends[0].breaker
+
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            await service._request(service.backends[0], "/api/v1/query", {"query": "up"})
+
+    assert calls == []
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+async def test_timeout_shortened_by_deadline_is_not_a_breaker_failure():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json={"status": "success"})
+
+    service = _service(slow)
+    breaker = service.backends[0].breaker
+
+    with deadline_scope(0.05):
+        with pytest.raises(asyncio.TimeoutError):
+            await service._request(service.backends[0], "/api/v1/query", {"query": "up"})
+
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+async def test_server_error_counts_as_breaker_failure():
+    service = _service(lambda request: httpx.Response(503))
+    breaker = service.backends[0].breaker
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await service._request(service.backends[0], "/api/v1/query", {"query": "up"})
+
+    assert breaker.state == CircuitBreaker.OPEN
@@ -0,0 +1,68 @@
+"""
+共享内存seqlock快照缓冲区
+"""
+
+import struct
+
+import pytest
+
+from app.monitoring.collectors.process_collector import SeqlockSnapshotBuffer
+
+
+@pytest.fixture
+def buffers():
+    reader = SeqlockSnapshotBuffer.create(4096)
+    writer = SeqlockSnapshotBuffer.attach(reader.name)
+    yield reader, writer
+    writer.close()
+    reader.close()
+
+
+def test_empty_buffer_reads_empty_snapshot(buffers):
+    reader, _ = buffers
+    assert reader.read() == {}
+    assert reader.generation() == 0
+
+
+def test_write_then_read(buffers):
+    reader, writer = buffers
+    writer.write({"timestamp": 1.0, "cpu": {"load": (1, 2)}})
+
+    assert reader.generation() == 1
+    assert reader.read() == {"timestamp": 1.0, "cpu": {"load": [1, 2]}}
+
+
+def test_same_generation_is_parsed_once(buffers):
+    reader, writer = buffers
+    writer.write({"timestamp": 1.0})
+    first = reader.read()
+
+    assert reader.read() is first
+    writer.write({"timestamp": 2.0})
+    assert reader.read() == {"timestamp": 2.0}
+
+
+def test_reader_keeps_last_snapshot_while_writer_is_mid_write(buffers):
+    reader, writer = buffers
+    writer.write({"timestamp": 1.0})
+    reader.read()
+    # 模拟写者在临界区内（seq为奇数）时写入了新generation
+    seq = struct.unpack_from('<Q', writer.shm.buf, 0)[0]
+    struct.pack_into('<QQ', writer.shm.buf, 0, seq + 1, 2)
+
+    assert reader.read() == {"timestamp": 1.0}
+
+
+def test_writer_recovers_from_interrupted_write(buffers):
+    reader, writer = buffers
+    struct.pack_into('<Q', writer.shm.buf, 0, 1)
+    writer.write({"timestamp": 3.0})
+
+    assert struct.unpack_from('<Q', writer.shm.buf, 0)[0] % 2 == 0
+    assert reader.read() == {"timestamp": 3.0}
+
+
+def test_oversized_snapshot_is_not_published(buffers):
+    reader, writer = buffers
+    writer.write({"blob": "x" * 8192})
+    assert reader.generation() == 0
@@ -0,0 +1,66 @@
+"""
+时间序列响应格式：列式/msgpack转换与查询失败时的错误传递
+"""
+
+import httpx
+import msgpack
+import numpy as np
+import orjson
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from app.api.api_v1.api import api_router
+from app.api.series_format import series_response, to_columnar
+from app.services.prometheus_service import prometheus_service
+
+MATRIX = {"status": "success", "data": {"resultType": "matrix", "result": [
+    {"metric": {"instance": "a"}, "values": [[1.0, "0.5"], [2.0, "NaN"], [3.0, "+Inf"]]}
+]}}
+UNREACHABLE = {"status": "error", "errorType": "unavailable", "error": "connection refused", "data": {"result": []}}
+
+
+def test_columnar_keeps_nan_and_inf():
+    series = to_columnar(MATRIX)
+
+    assert series[0]["labels"] == {"instance": "a"}
+    assert series[0]["timestamps"].tolist() == [1.0, 2.0, 3.0]
+    values = series[0]["values"]
+    assert values[0] == 0.5 and np.isnan(values[1]) and np.isposinf(values[2])
+
+
+def test_columnar_json_serializes_nan_as_null():
+    body = orjson.loads(series_response("columnar", {"duration": "1h"}, MATRIX).body)
+
+    assert body["status"] == "success"
+    assert body["data"]["duration"] == "1h"
+    assert body["data"]["series"][0]["values"][:2] == [0.5, None]
+
+
+def test_msgpack_values_are_float64_bytes():
+    body = msgpack.unpackb(series_response("msgpack", {}, MATRIX).body, raw=False)
+
+    values = np.frombuffer(body["series"][0]["values"], dtype="<f8")
+    assert values[0] == 0.5 and np.isnan(values[1])
+
+
+@pytest.mark.parametrize("format", ["columnar", "msgpack"])
+def test_failed_query_is_not_reported_as_empty_success(format):
+    with pytest.raises(HTTPException) as exc:
+        series_response(format, {}, UNREACHABLE)
+
+    assert exc.value.status_code == 502
+    assert "unavailable" in exc.value.detail and "connection refused" in exc.value.detail
+
+
+async def test_trend_endpoint_returns_502_when_prometheus_is_unreachable(monkeypatch):
+    async def unreachable(metric, duration="1h"):
+        return UNREACHABLE
+
+    monkeypatch.setattr(prometheus_service, "get_usage_range", unreachable)
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api/v1")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/v1/prometheus/query/cpu-trend", params={"format": "columnar"})
+
+    assert response.status_code == 502
+    assert "unavailable" in response.json()["detail"]
@@ -0,0 +1,58 @@
+"""
+系统快照读取：收集器负责采集时请求不现场采集，尚无快照时返回503
+"""
+
+import threading
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.api_v1.api import api_router
+from app.monitoring.collectors.system_collector import system_collector
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api/v1")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.fixture
+def no_snapshot(monkeypatch):
+    monkeypatch.setattr(system_collector, "_snapshot", {})
+    monkeypatch.setattr(system_collector, "collector_process", None)
+    monkeypatch.setattr(system_collector, "snapshot_store", None)
+    collected = []
+    monkeypatch.setattr(system_collector, "collect_snapshot", lambda: collected.append(threading.get_ident()) or {
+        "generation": 1, "timestamp": 1.0, "cpu": {"usage_percent": 7}
+    })
+    return collected
+
+
+async def test_running_collector_is_not_duplicated_by_requests(client, no_snapshot, monkeypatch):
+    monkeypatch.setattr(system_collector, "running", True)
+    async with client:
+        response = await client.get("/api/v1/monitoring/system/cpu")
+
+    assert response.status_code == 503
+    assert no_snapshot == []
+
+
+async def test_non_leader_worker_waits_for_shared_snapshot(client, no_snapshot, monkeypatch):
+    monkeypatch.setattr(system_collector, "running", False)
+    monkeypatch.setattr(system_collector, "multiprocess", True)
+    assert await system_collector.current_metrics() == {}
+    assert no_snapshot == []
+
+
+async def test_standalone_collection_runs_in_threadpool(client, no_snapshot, monkeypatch):
+    monkeypatch.setattr(system_collector, "running", False)
+    monkeypatch.setattr(system_collector, "multiprocess", False)
+    async with client:
+        response = await client.get("/api/v1/monitoring/system/cpu")
+
+    assert response.status_code == 200
+    assert response.json()["cpu"]["usage_percent"] == 7
+    assert no_snapshot and no_snapshot[0] != threading.get_ident()
@@ -70,6 +70,10 @@ export const monitoringAPI = {
   // Prometheus查询
   queryPrometheus: (query: string, start?: string, end?: string, step?: string) => 
     api.post('/api/v1/prometheus/query', { query, start, end, step }),
+  
+  // Prometheus批量查询（结果按id返回）
+  queryPrometheusBatch: (queries: { id: string; query: string; start?: string; end?: string; step?: string }[]) =>
+    api.post('/api/v1/prometheus/query/batch', { queries }),
 };
 
 export default api;
\ No newline at end of file